@@ -0,0 +1,121 @@
+"""Initial schema
+
+Tables as created by `Base.metadata.create_all` before migrations were
+tracked; init_db stamps databases like that with this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 03:14:52.732742
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: str | Sequence[str] | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_limit_tracker',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('bucket', sa.String(length=20), nullable=False),
+    sa.Column('request_count', sa.Integer(), nullable=False),
+    sa.Column('window_start', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_rate_limit_bucket', 'rate_limit_tracker', ['bucket'], unique=True)
+    op.create_table('summoners',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('puuid', sa.String(length=78), nullable=False),
+    sa.Column('summoner_id', sa.String(length=63), nullable=False),
+    sa.Column('riot_id_name', sa.String(length=96), nullable=False),
+    sa.Column('riot_id_tag', sa.String(length=5), nullable=False),
+    sa.Column('summoner_level', sa.Integer(), nullable=False),
+    sa.Column('profile_icon_id', sa.Integer(), nullable=False),
+    sa.Column('solo_tier', sa.String(length=20), nullable=True),
+    sa.Column('solo_rank', sa.String(length=5), nullable=True),
+    sa.Column('solo_lp', sa.Integer(), nullable=True),
+    sa.Column('solo_wins', sa.Integer(), nullable=True),
+    sa.Column('solo_losses', sa.Integer(), nullable=True),
+    sa.Column('flex_tier', sa.String(length=20), nullable=True),
+    sa.Column('flex_rank', sa.String(length=5), nullable=True),
+    sa.Column('flex_lp', sa.Integer(), nullable=True),
+    sa.Column('flex_wins', sa.Integer(), nullable=True),
+    sa.Column('flex_losses', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('ranked_updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('summoner_id')
+    )
+    op.create_index(op.f('ix_summoners_puuid'), 'summoners', ['puuid'], unique=True)
+    op.create_index('ix_summoners_riot_id', 'summoners', ['riot_id_name', 'riot_id_tag'], unique=False)
+    op.create_table('player_match_stats',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('summoner_id', sa.Integer(), nullable=False),
+    sa.Column('match_id', sa.String(length=20), nullable=False),
+    sa.Column('game_duration_seconds', sa.Integer(), nullable=False),
+    sa.Column('game_creation', sa.BigInteger(), nullable=False),
+    sa.Column('queue_id', sa.Integer(), nullable=False),
+    sa.Column('champion_id', sa.Integer(), nullable=False),
+    sa.Column('champion_name', sa.String(length=50), nullable=False),
+    sa.Column('kills', sa.Integer(), nullable=False),
+    sa.Column('deaths', sa.Integer(), nullable=False),
+    sa.Column('assists', sa.Integer(), nullable=False),
+    sa.Column('total_minions_killed', sa.Integer(), nullable=False),
+    sa.Column('gold_earned', sa.Integer(), nullable=False),
+    sa.Column('total_damage_dealt', sa.Integer(), nullable=False),
+    sa.Column('vision_score', sa.Integer(), nullable=False),
+    sa.Column('win', sa.Integer(), nullable=False),
+    sa.Column('kda', sa.Float(), nullable=False),
+    sa.Column('cs_per_min', sa.Float(), nullable=False),
+    sa.Column('gold_per_min', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['summoner_id'], ['summoners.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_player_match_stats_match_id'), 'player_match_stats', ['match_id'], unique=False)
+    op.create_index('ix_player_match_stats_summoner_match', 'player_match_stats', ['summoner_id', 'match_id'], unique=True)
+    op.create_table('smurf_analyses',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('summoner_id', sa.Integer(), nullable=False),
+    sa.Column('total_score', sa.Float(), nullable=False),
+    sa.Column('classification', sa.Enum('LIKELY_SMURF', 'POSSIBLE_SMURF', 'UNLIKELY', 'UNKNOWN', name='smurfclassification'), nullable=False),
+    sa.Column('games_analyzed', sa.Integer(), nullable=False),
+    sa.Column('winrate_score', sa.Float(), nullable=True),
+    sa.Column('account_age_score', sa.Float(), nullable=True),
+    sa.Column('champion_pool_score', sa.Float(), nullable=True),
+    sa.Column('cs_per_min_score', sa.Float(), nullable=True),
+    sa.Column('kda_score', sa.Float(), nullable=True),
+    sa.Column('game_frequency_score', sa.Float(), nullable=True),
+    sa.Column('winrate', sa.Float(), nullable=True),
+    sa.Column('avg_cs_per_min', sa.Float(), nullable=True),
+    sa.Column('avg_kda', sa.Float(), nullable=True),
+    sa.Column('unique_champions', sa.Integer(), nullable=True),
+    sa.Column('games_per_day', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['summoner_id'], ['summoners.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_smurf_analyses_summoner_created', 'smurf_analyses', ['summoner_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_smurf_analyses_summoner_created', table_name='smurf_analyses')
+    op.drop_table('smurf_analyses')
+    op.drop_index('ix_player_match_stats_summoner_match', table_name='player_match_stats')
+    op.drop_index(op.f('ix_player_match_stats_match_id'), table_name='player_match_stats')
+    op.drop_table('player_match_stats')
+    op.drop_index('ix_summoners_riot_id', table_name='summoners')
+    op.drop_index(op.f('ix_summoners_puuid'), table_name='summoners')
+    op.drop_table('summoners')
+    op.drop_index('ix_rate_limit_bucket', table_name='rate_limit_tracker')
+    op.drop_table('rate_limit_tracker')
@@ -0,0 +1,31 @@
+"""Make summoners.summoner_id nullable
+
+Riot no longer returns the encrypted summoner ID everywhere.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 03:20:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: str | Sequence[str] | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("summoners") as batch_op:
+        batch_op.alter_column("summoner_id", existing_type=sa.String(length=63), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("summoners") as batch_op:
+        batch_op.alter_column("summoner_id", existing_type=sa.String(length=63), nullable=False)
@@ -0,0 +1,54 @@
+"""Store one rate limit window per row
+
+Rows of the old per-second/per-2-minute layout can't be carried over and
+are dropped; limiters recreate their windows on first use.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 03:21:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: str | Sequence[str] | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DELETE FROM rate_limit_tracker")
+    with op.batch_alter_table("rate_limit_tracker") as batch_op:
+        batch_op.add_column(sa.Column("limiter", sa.String(length=80), nullable=False))
+        batch_op.add_column(sa.Column("request_limit", sa.Integer(), nullable=False))
+        batch_op.add_column(sa.Column("window_seconds", sa.Float(), nullable=False))
+        batch_op.add_column(sa.Column("backoff_until", sa.DateTime(timezone=True), nullable=True))
+        batch_op.alter_column(
+            "bucket",
+            existing_type=sa.String(length=20),
+            type_=sa.String(length=100),
+            existing_nullable=False,
+        )
+        batch_op.create_index("ix_rate_limit_limiter", ["limiter"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM rate_limit_tracker")
+    with op.batch_alter_table("rate_limit_tracker") as batch_op:
+        batch_op.drop_index("ix_rate_limit_limiter")
+        batch_op.alter_column(
+            "bucket",
+            existing_type=sa.String(length=100),
+            type_=sa.String(length=20),
+            existing_nullable=False,
+        )
+        batch_op.drop_column("backoff_until")
+        batch_op.drop_column("window_seconds")
+        batch_op.drop_column("request_limit")
+        batch_op.drop_column("limiter")
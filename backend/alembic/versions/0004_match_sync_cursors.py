@@ -0,0 +1,45 @@
+"""Add match_sync_cursors
+
+Newest synced match per summoner and queue filter.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 03:22:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: str | Sequence[str] | None = "0003"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "match_sync_cursors",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("summoner_id", sa.Integer(), nullable=False),
+        sa.Column("queue_id", sa.Integer(), nullable=False),
+        sa.Column("newest_game_creation", sa.BigInteger(), nullable=False),
+        sa.Column("synced_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["summoner_id"], ["summoners.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_match_sync_cursors_summoner_queue",
+        "match_sync_cursors",
+        ["summoner_id", "queue_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_match_sync_cursors_summoner_queue", table_name="match_sync_cursors")
+    op.drop_table("match_sync_cursors")
@@ -0,0 +1,44 @@
+"""Key stored analyses by input fingerprint
+
+Analyses stored before fingerprints get a placeholder one of their own
+(so they never match a lookup) and low confidence.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 03:23:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: str | Sequence[str] | None = "0004"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("smurf_analyses") as batch_op:
+        batch_op.add_column(sa.Column("fingerprint", sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column("confidence", sa.String(length=10), nullable=True))
+    op.execute(
+        "UPDATE smurf_analyses SET fingerprint = 'legacy-' || CAST(id AS VARCHAR(20)), confidence = 'low'"
+    )
+    with op.batch_alter_table("smurf_analyses") as batch_op:
+        batch_op.alter_column("fingerprint", existing_type=sa.String(length=64), nullable=False)
+        batch_op.alter_column("confidence", existing_type=sa.String(length=10), nullable=False)
+        batch_op.create_index(
+            "ix_smurf_analyses_summoner_fingerprint", ["summoner_id", "fingerprint"], unique=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("smurf_analyses") as batch_op:
+        batch_op.drop_index("ix_smurf_analyses_summoner_fingerprint")
+        batch_op.drop_column("confidence")
+        batch_op.drop_column("fingerprint")
@@ -0,0 +1,42 @@
+"""Record scoring code and account state on stored analyses
+
+Older analyses get an empty scoring hash, so the rescoring job treats them
+as scored by outdated code.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 03:24:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: str | Sequence[str] | None = "0005"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("smurf_analyses") as batch_op:
+        batch_op.add_column(
+            sa.Column("scoring_hash", sa.String(length=64), nullable=False, server_default="")
+        )
+        batch_op.add_column(sa.Column("summoner_level", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("solo_tier", sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column("solo_rank", sa.String(length=5), nullable=True))
+    with op.batch_alter_table("smurf_analyses") as batch_op:
+        batch_op.alter_column("scoring_hash", existing_type=sa.String(length=64), server_default=None)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("smurf_analyses") as batch_op:
+        batch_op.drop_column("solo_rank")
+        batch_op.drop_column("solo_tier")
+        batch_op.drop_column("summoner_level")
+        batch_op.drop_column("scoring_hash")
@@ -0,0 +1,57 @@
+"""Add indicator_states
+
+Running indicator totals per summoner and queue filter.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 03:25:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: str | Sequence[str] | None = "0006"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "indicator_states",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("summoner_id", sa.Integer(), nullable=False),
+        sa.Column("queue_id", sa.Integer(), nullable=False),
+        sa.Column("window", sa.Integer(), nullable=False),
+        sa.Column("games", sa.Integer(), nullable=False),
+        sa.Column("wins", sa.Integer(), nullable=False),
+        sa.Column("kills", sa.Integer(), nullable=False),
+        sa.Column("deaths", sa.Integer(), nullable=False),
+        sa.Column("assists", sa.Integer(), nullable=False),
+        sa.Column("kda_total", sa.BigInteger(), nullable=False),
+        sa.Column("cs_total", sa.BigInteger(), nullable=False),
+        sa.Column("gold_total", sa.BigInteger(), nullable=False),
+        sa.Column("champion_counts", sa.JSON(), nullable=False),
+        sa.Column("first_game_creation", sa.BigInteger(), nullable=True),
+        sa.Column("last_game_creation", sa.BigInteger(), nullable=True),
+        sa.Column("matches", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["summoner_id"], ["summoners.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_indicator_states_summoner_queue",
+        "indicator_states",
+        ["summoner_id", "queue_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_indicator_states_summoner_queue", table_name="indicator_states")
+    op.drop_table("indicator_states")
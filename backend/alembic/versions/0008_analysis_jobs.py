@@ -0,0 +1,53 @@
+"""Add analysis_jobs
+
+Background analysis jobs and their results.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 03:26:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: str | Sequence[str] | None = "0007"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("kind", sa.String(length=10), nullable=False),
+        sa.Column("puuid", sa.String(length=78), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("QUEUED", "RUNNING", "COMPLETE", "FAILED", name="jobstatus"),
+            nullable=False,
+        ),
+        sa.Column("players_done", sa.Integer(), nullable=True),
+        sa.Column("players_total", sa.Integer(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.String(length=500), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_analysis_jobs_kind_puuid", "analysis_jobs", ["kind", "puuid"], unique=False)
+    op.create_index("ix_analysis_jobs_status", "analysis_jobs", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_analysis_jobs_status", table_name="analysis_jobs")
+    op.drop_index("ix_analysis_jobs_kind_puuid", table_name="analysis_jobs")
+    op.drop_table("analysis_jobs")
+    sa.Enum(name="jobstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,39 @@
+"""Add watched_players
+
+Players checked for live games in the background.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 03:27:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: str | Sequence[str] | None = "0008"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "watched_players",
+        sa.Column("puuid", sa.String(length=78), nullable=False),
+        sa.Column("label", sa.String(length=100), nullable=True),
+        sa.Column("game_id", sa.BigInteger(), nullable=True),
+        sa.Column("last_game_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("hour_counts", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("puuid"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("watched_players")
@@ -0,0 +1,26 @@
+"""Numeric helpers shared by the vectorized stats and scoring code."""
+
+import numpy as np
+
+
+def round_like_python(values: np.ndarray, digits: int) -> np.ndarray:
+    """Round an array exactly like Python's round() would each element.
+
+    np.round scales by 10**digits before rounding, so it can disagree with
+    round() on values that sit (almost) exactly halfway. Those few values
+    are rounded in Python; everything else stays vectorized.
+
+    Args:
+        values: Values to round
+        digits: Decimal places
+
+    Returns:
+        Rounded float64 array
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, digits)
+    scaled = values * 10**digits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(value, digits) for value in values[near_tie].tolist()]
+    return rounded
@@ -0,0 +1,153 @@
+"""Mergeable streaming quantile sketch (KLL).
+
+A KLL sketch estimates quantiles of a stream in memory that grows only
+logarithmically with the stream length. Items sit in a stack of
+compactors; compactor h holds items of weight 2**h, and when one fills up
+it is sorted and every other item moves up a level. Two sketches of
+separate streams merge into a sketch of the combined stream, so shards or
+regions can be sketched independently and combined afterwards.
+
+Rank error is about 1.7 / k of the stream length (~1% for k=200).
+"""
+
+from typing import Any
+
+import numpy as np
+
+DEFAULT_K = 200
+
+# Capacity shrinks by this factor per level below the top compactor
+_CAPACITY_DECAY = 2 / 3
+_MIN_CAPACITY = 8
+
+
+class KLLSketch:
+    """Quantile sketch of a stream of floats."""
+
+    def __init__(self, k: int = DEFAULT_K, seed: int | None = None):
+        """Create an empty sketch.
+
+        Args:
+            k: Accuracy parameter (capacity of the top compactor)
+            seed: Seed for the compaction coin flips
+        """
+        self.k = k
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self._levels: list[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(int(self.k * _CAPACITY_DECAY**depth), _MIN_CAPACITY)
+
+    def _compress(self) -> None:
+        """Compact every compactor that is over capacity, bottom-up."""
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so weights stay exact
+                keep = items[len(items) - len(items) % 2 :]
+                promoted = items[self._rng.integers(2) : len(items) - len(keep) : 2]
+                self._levels[level] = keep
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values: np.ndarray | list[float]) -> None:
+        """Add values to the sketch.
+
+        Args:
+            values: Values to add (NaNs are ignored)
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Fold another sketch's stream into this one.
+
+        Args:
+            other: Sketch built with the same k
+
+        Raises:
+            ValueError: If the sketches use different k
+        """
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with k={self.k} and k={other.k}")
+        if not other.count:
+            return
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    @property
+    def mean(self) -> float | None:
+        """Exact mean of the stream (None if empty)."""
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate a quantile of the stream.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            Estimated value (None if the sketch is empty)
+        """
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        items = np.concatenate(self._levels)
+        weights = np.concatenate(
+            [np.full(len(level), 2**h, dtype=np.float64) for h, level in enumerate(self._levels)]
+        )
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        return float(items[order][min(index, len(items) - 1)])
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize the sketch to JSON-compatible data."""
+        return {
+            "k": self.k,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "levels": [level.tolist() for level in self._levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any], seed: int | None = None) -> "KLLSketch":
+        """Restore a sketch serialized with `to_dict`."""
+        sketch = cls(k=data["k"], seed=seed)
+        sketch.count = data["count"]
+        sketch.total = data["total"]
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        sketch._levels = [np.asarray(level, dtype=np.float64) for level in data["levels"]] or [np.empty(0)]
+        return sketch
@@ -1,9 +1,16 @@
 """Core smurf detection algorithm."""
 
+import json
 import logging
+from bisect import bisect_right
+from collections.abc import Sequence
 from dataclasses import dataclass
 from enum import Enum
+from pathlib import Path
 
+import numpy as np
+
+from app.algorithms.numeric import round_like_python
 from app.algorithms.thresholds import (
     EXPECTED_LEVEL_FOR_TIER,
     INDICATOR_WEIGHTS,
@@ -11,8 +18,10 @@ from app.algorithms.thresholds import (
     SCORE_THRESHOLDS,
     TIER_BENCHMARKS,
 )
+from app.config import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 class SmurfClassification(str, Enum):
@@ -47,9 +56,136 @@ class SmurfAnalysisResult:
     games_analyzed: int
 
 
+# Indicator step tables as (THRESHOLDS, SCORES): a value scores SCORES[i]
+# where i is the number of THRESHOLDS at or below it
+WINRATE_STEPS = ((55, 60, 65, 70, 75), (0, 30, 50, 70, 85, 100))
+# Level ratio against the tier's expected level: lower is more suspicious
+LEVEL_RATIO_STEPS = ((0.3, 0.5, 0.7, 0.9, 1.1), (100, 80, 60, 40, 20, 0))
+# CS/min and KDA above the tier benchmark
+CS_DIFF_STEPS = ((0.5, 1.0, 1.5, 2.0, 2.5), (0, 20, 40, 60, 80, 100))
+KDA_DIFF_STEPS = ((0.25, 0.5, 1.0, 1.5, 2.0), (0, 20, 40, 60, 80, 100))
+GAMES_PER_DAY_STEPS = ((3, 4, 6, 8, 10), (0, 20, 40, 60, 80, 100))
+# Score by unique champion count (index), 4 or more scores 0
+CHAMPION_POOL_SCORES = (0, 100, 60, 30, 0)
+
+# Tier tables as arrays for gathers. The trailing entry is a placeholder
+# for unknown tiers (index -1), which are masked out or replaced.
+_TIER_INDEX = {tier: i for i, tier in enumerate(TIER_BENCHMARKS)}
+_EXPECTED_LEVELS = np.array([EXPECTED_LEVEL_FOR_TIER.get(tier, 1) for tier in TIER_BENCHMARKS] + [1])
+
+
+def load_tier_benchmarks(path: str | Path) -> dict[str, dict[str, float]]:
+    """Load calibrated tier benchmarks over the built-in ones.
+
+    The file is written by app.jobs.calibrate. Tiers or metrics it doesn't
+    cover keep their TIER_BENCHMARKS values.
+
+    Args:
+        path: Benchmarks JSON file
+
+    Returns:
+        Benchmarks for every tier (the built-in ones if the file is missing
+        or malformed)
+    """
+    defaults = {tier: dict(values) for tier, values in TIER_BENCHMARKS.items()}
+    benchmarks = {tier: dict(values) for tier, values in defaults.items()}
+    try:
+        calibrated = json.loads(Path(path).read_text())["tiers"]
+        for tier, values in calibrated.items():
+            if tier in benchmarks:
+                benchmarks[tier].update(
+                    {metric: float(value) for metric, value in values.items() if metric in benchmarks[tier]}
+                )
+    except FileNotFoundError:
+        logger.info(f"No calibrated tier benchmarks at {path}, using defaults")
+        return defaults
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning(f"Malformed tier benchmarks at {path}, using defaults: {e!r}")
+        return defaults
+    logger.info(f"Loaded calibrated tier benchmarks for {len(calibrated)} tiers from {path}")
+    return benchmarks
+
+
+def encode_tiers(tiers: Sequence[str | None]) -> np.ndarray:
+    """Convert tier names to the tier indices used by `analyze_batch`.
+
+    Encoding once up front saves a Python pass when the same players are
+    scored repeatedly.
+
+    Args:
+        tiers: Ranked tier per player (None if unranked)
+
+    Returns:
+        Index into TIER_BENCHMARKS per player, -1 for unranked or unknown
+    """
+    return np.fromiter((_TIER_INDEX.get(tier, -1) for tier in tiers), dtype=np.int64, count=len(tiers))
+
+
+# (thresholds, scores) step table
+Steps = tuple[tuple[float, ...], tuple[int, ...]]
+
+
+def _step_score(value: float, steps: Steps) -> int:
+    """Look up the step score of a value."""
+    thresholds, scores = steps
+    return scores[bisect_right(thresholds, value)]
+
+
+def _step_scores(values: np.ndarray, steps: Steps) -> np.ndarray:
+    """Look up step scores for many values at once."""
+    thresholds, scores = steps
+    return np.asarray(scores)[np.searchsorted(thresholds, values, side="right")]
+
+
+@dataclass
+class BatchAnalysisResult:
+    """Smurf analysis results for many players, one array per field.
+
+    Players with too few games have `analyzed` False and no indicator scores.
+    """
+
+    total_score: np.ndarray
+    classification: np.ndarray  # SmurfClassification per player
+    confidence: np.ndarray
+    indicator_scores: dict[str, np.ndarray]
+    games_analyzed: np.ndarray
+    analyzed: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.total_score)
+
+    def __getitem__(self, index: int) -> SmurfAnalysisResult:
+        """Get one player's result in the format of SmurfDetector.analyze."""
+        if self.analyzed[index]:
+            indicator_scores = IndicatorScores(
+                **{name: int(scores[index]) for name, scores in self.indicator_scores.items()}
+            )
+        else:
+            indicator_scores = IndicatorScores()
+        return SmurfAnalysisResult(
+            total_score=float(self.total_score[index]),
+            classification=self.classification[index],
+            confidence=str(self.confidence[index]),
+            indicator_scores=indicator_scores,
+            games_analyzed=int(self.games_analyzed[index]),
+        )
+
+
 class SmurfDetector:
     """Smurf detection algorithm using weighted scoring."""
 
+    def __init__(self, benchmarks: dict[str, dict[str, float]] | None = None):
+        """Initialize the detector.
+
+        Args:
+            benchmarks: CS/min and KDA benchmarks per tier (defaults to
+                TIER_BENCHMARKS)
+        """
+        self.benchmarks = benchmarks or TIER_BENCHMARKS
+        # Trailing placeholder for unknown tiers, as in _EXPECTED_LEVELS
+        self._benchmark_cs = np.array([self.benchmarks[tier]["cs"] for tier in TIER_BENCHMARKS] + [0.0])
+        self._benchmark_kda = np.array([self.benchmarks[tier]["kda"] for tier in TIER_BENCHMARKS] + [0.0])
+
     def analyze(
         self,
         aggregate_stats: dict,
@@ -124,6 +260,97 @@ class SmurfDetector:
             games_analyzed=games,
         )
 
+    def analyze_batch(
+        self,
+        aggregates: dict[str, np.ndarray],
+        summoner_levels: Sequence[int] | np.ndarray,
+        tiers: Sequence[str | None] | np.ndarray,
+    ) -> BatchAnalysisResult:
+        """Analyze many players at once; same results as `analyze` per player.
+
+        Args:
+            aggregates: Aggregate stat arrays, as from
+                StatsBlock.aggregate_columns(rounded=True)
+            summoner_levels: Account level per player
+            tiers: Current ranked tier per player (None if unranked), or
+                the same already converted with `encode_tiers`
+
+        Returns:
+            BatchAnalysisResult with one entry per player
+        """
+        games = np.asarray(aggregates["games_analyzed"], dtype=np.int64)
+        levels = np.asarray(summoner_levels, dtype=np.int64)
+        analyzed = games >= MIN_GAMES_FOR_ANALYSIS
+
+        # Gather tier benchmarks by tier index (-1 for unranked/unknown tiers)
+        if isinstance(tiers, np.ndarray) and tiers.dtype.kind == "i":
+            tier_index = tiers
+        else:
+            tier_index = encode_tiers(tiers)
+        known_tier = tier_index >= 0
+        expected_level = _EXPECTED_LEVELS[tier_index]
+        # cs/kda benchmarks fall back to Silver
+        benchmark_index = np.where(known_tier, tier_index, _TIER_INDEX["SILVER"])
+        expected_cs = self._benchmark_cs[benchmark_index]
+        expected_kda = self._benchmark_kda[benchmark_index]
+
+        unique = np.asarray(aggregates["unique_champions"], dtype=np.int64)
+        indicator_scores = {
+            "winrate": _step_scores(aggregates["winrate"], WINRATE_STEPS),
+            "account_age": np.where(
+                known_tier, _step_scores(levels / expected_level, LEVEL_RATIO_STEPS), 0
+            ),
+            "champion_pool": np.where(
+                games > 0, np.asarray(CHAMPION_POOL_SCORES)[np.clip(unique, 0, len(CHAMPION_POOL_SCORES) - 1)], 0
+            ),
+            "cs_per_min": _step_scores(aggregates["avg_cs_per_min"] - expected_cs, CS_DIFF_STEPS),
+            "kda": _step_scores(aggregates["avg_kda"] - expected_kda, KDA_DIFF_STEPS),
+            "game_frequency": _step_scores(aggregates["games_per_day"], GAMES_PER_DAY_STEPS),
+        }
+
+        # Same operation order as _calculate_weighted_score, so totals are identical
+        total = np.zeros(len(games))
+        weight_sum = 0
+        for indicator in ("winrate", "account_age", "champion_pool", "cs_per_min", "kda", "game_frequency"):
+            weight = INDICATOR_WEIGHTS[indicator]
+            total = total + indicator_scores[indicator] * weight
+            weight_sum += weight
+        total = total / weight_sum * sum(INDICATOR_WEIGHTS.values())
+
+        classes = np.array(
+            [
+                SmurfClassification.UNKNOWN,
+                SmurfClassification.LIKELY_SMURF,
+                SmurfClassification.POSSIBLE_SMURF,
+                SmurfClassification.UNLIKELY,
+            ],
+            dtype=object,
+        )
+        classification = classes[
+            np.select(
+                [
+                    ~analyzed,
+                    total >= SCORE_THRESHOLDS["LIKELY_SMURF"],
+                    total >= SCORE_THRESHOLDS["POSSIBLE_SMURF"],
+                ],
+                [0, 1, 2],
+                default=3,
+            )
+        ]
+        confidence = np.where(
+            analyzed & (games >= 20), "high", np.where(analyzed & (games >= 10), "medium", "low")
+        )
+        total_score = round_like_python(total, 1)
+
+        return BatchAnalysisResult(
+            total_score=np.where(analyzed, total_score, 0),
+            classification=classification,
+            confidence=confidence,
+            indicator_scores=indicator_scores,
+            games_analyzed=games,
+            analyzed=analyzed,
+        )
+
     def _score_winrate(self, winrate: float | None) -> float:
         """Score based on win rate.
 
@@ -132,18 +359,7 @@ class SmurfDetector:
         if winrate is None:
             return 0
 
-        if winrate >= 75:
-            return 100
-        elif winrate >= 70:
-            return 85
-        elif winrate >= 65:
-            return 70
-        elif winrate >= 60:
-            return 50
-        elif winrate >= 55:
-            return 30
-        else:
-            return 0
+        return _step_score(winrate, WINRATE_STEPS)
 
     def _score_account_age(
         self,
@@ -159,23 +375,8 @@ class SmurfDetector:
         if not tier or tier not in EXPECTED_LEVEL_FOR_TIER:
             return 0
 
-        expected_level = EXPECTED_LEVEL_FOR_TIER[tier]
-        level_ratio = level / expected_level
-
-        # If level is much lower than expected for the rank
         # Thresholds are aggressive to catch smurfs
-        if level_ratio < 0.3:
-            return 100
-        elif level_ratio < 0.5:
-            return 80
-        elif level_ratio < 0.7:
-            return 60
-        elif level_ratio < 0.9:
-            return 40
-        elif level_ratio < 1.1:
-            return 20
-        else:
-            return 0
+        return _step_score(level / EXPECTED_LEVEL_FOR_TIER[tier], LEVEL_RATIO_STEPS)
 
     def _score_champion_pool(
         self,
@@ -192,14 +393,7 @@ class SmurfDetector:
 
         # Score based on absolute unique champion count
         # With 5 games, playing 1-2 champs is suspicious
-        if unique_champions == 1:
-            return 100
-        elif unique_champions == 2:
-            return 60
-        elif unique_champions == 3:
-            return 30
-        else:
-            return 0
+        return CHAMPION_POOL_SCORES[min(max(unique_champions, 0), len(CHAMPION_POOL_SCORES) - 1)]
 
     def _score_cs_per_min(
         self,
@@ -214,24 +408,13 @@ class SmurfDetector:
             return 0
 
         # Get benchmark for tier (default to Silver if unknown)
-        benchmark = TIER_BENCHMARKS.get(tier or "SILVER", TIER_BENCHMARKS["SILVER"])
+        benchmark = self.benchmarks.get(tier or "SILVER", self.benchmarks["SILVER"])
         expected_cs = benchmark["cs"]
 
         # Calculate how much above expected
         cs_diff = cs_per_min - expected_cs
 
-        if cs_diff >= 2.5:
-            return 100
-        elif cs_diff >= 2.0:
-            return 80
-        elif cs_diff >= 1.5:
-            return 60
-        elif cs_diff >= 1.0:
-            return 40
-        elif cs_diff >= 0.5:
-            return 20
-        else:
-            return 0
+        return _step_score(cs_diff, CS_DIFF_STEPS)
 
     def _score_kda(self, kda: float | None, tier: str | None) -> float:
         """Score based on KDA compared to tier benchmark.
@@ -241,41 +424,19 @@ class SmurfDetector:
         if kda is None:
             return 0
 
-        benchmark = TIER_BENCHMARKS.get(tier or "SILVER", TIER_BENCHMARKS["SILVER"])
+        benchmark = self.benchmarks.get(tier or "SILVER", self.benchmarks["SILVER"])
         expected_kda = benchmark["kda"]
 
         kda_diff = kda - expected_kda
 
-        if kda_diff >= 2.0:
-            return 100
-        elif kda_diff >= 1.5:
-            return 80
-        elif kda_diff >= 1.0:
-            return 60
-        elif kda_diff >= 0.5:
-            return 40
-        elif kda_diff >= 0.25:
-            return 20
-        else:
-            return 0
+        return _step_score(kda_diff, KDA_DIFF_STEPS)
 
     def _score_game_frequency(self, games_per_day: float) -> float:
         """Score based on games played per day.
 
         Very high game frequency on new accounts is suspicious.
         """
-        if games_per_day >= 10:
-            return 100
-        elif games_per_day >= 8:
-            return 80
-        elif games_per_day >= 6:
-            return 60
-        elif games_per_day >= 4:
-            return 40
-        elif games_per_day >= 3:
-            return 20
-        else:
-            return 0
+        return _step_score(games_per_day, GAMES_PER_DAY_STEPS)
 
     def _calculate_weighted_score(self, scores: IndicatorScores) -> float:
         """Calculate weighted average of all indicator scores."""
@@ -314,4 +475,4 @@ class SmurfDetector:
 
 
 # Global detector instance
-smurf_detector = SmurfDetector()
+smurf_detector = SmurfDetector(load_tier_benchmarks(settings.TIER_BENCHMARKS_PATH))
@@ -0,0 +1,44 @@
+"""Helpers shared by the API endpoints."""
+
+import asyncio
+import logging
+from collections.abc import Awaitable
+from typing import TypeVar
+
+from fastapi import Request
+
+from app.core.exceptions import ClientDisconnected
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """Return once the client has closed the connection."""
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """Await `work`, cancelling it if the client disconnects first.
+
+    Cancellation reaches every task the work started, down to Riot
+    requests queued for rate limit tokens, which are refunded.
+
+    Raises:
+        ClientDisconnected: If the client went away before it finished
+    """
+    task = asyncio.ensure_future(work)
+    disconnect = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    if task.cancelled():
+        logger.info(f"Client disconnected, cancelled {request.url.path}")
+        raise ClientDisconnected()
+    return task.result()
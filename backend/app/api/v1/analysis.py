@@ -1,27 +1,52 @@
 """Smurf analysis API endpoints."""
 
 import asyncio
+import json
 import logging
+import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.algorithms.smurf_detector import smurf_detector
-from app.core.exceptions import SummonerNotFound
+from app.api.deps import cancel_on_disconnect, wait_for_disconnect
+from app.config import get_settings
+from app.core.exceptions import DeadlineExceeded, SummonerNotFound
+from app.core.scheduler import request_context, time_remaining
+from app.models.database import SmurfAnalysis
 from app.schemas.analysis import (
+    AnalysisJobResponse,
+    AnalysisStatus,
     HiddenPlayer,
     IndicatorScores,
+    JobKind,
+    LobbyPlayer,
+    LobbySkeleton,
     MatchAnalysisResponse,
+    PlayerAnalysisError,
+    PlayerBatchRequest,
     Position,
     RawMetrics,
     SmurfAnalysisResponse,
     SmurfClassification,
 )
-from app.services.match_service import match_service
+from app.schemas.summoner import SummonerData
+from app.services.analysis_jobs import ProgressCallback, analysis_jobs
+from app.services.analysis_repository import analysis_fingerprint, analysis_repository
+from app.services.indicator_state import IndicatorState, indicator_state_repository
+from app.services.live_game_watcher import MAX_WAIT, live_game_watcher
+from app.services.lobby_cache import lobby_cache
+from app.services.match_service import PlayerStatsBatch, match_service
+from app.services.player_watcher import player_watcher
 from app.services.position_inference import infer_position, infer_team_positions
 from app.services.riot_api import riot_api
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 router = APIRouter()
 
@@ -45,6 +70,11 @@ QUEUE_NAMES = {
 }
 
 
+# Match history used for each analysis (kept small to respect rate limits)
+ANALYSIS_MATCH_COUNT = 5
+ANALYSIS_QUEUE_ID = 420
+
+
 def get_queue_name(queue_id: int, game_mode: str) -> str:
     """Get human-readable queue name from queue ID."""
     return QUEUE_NAMES.get(queue_id, game_mode)
@@ -56,24 +86,43 @@ async def analyze_player_by_puuid(
     riot_id_tag: str = "",
     champion_id: int | None = None,
     position: Position = Position.UNKNOWN,
+    summoner: SummonerData | None = None,
+    match_ids: list[str] | None = None,
+    load_stats: Callable[[list[str]], Awaitable[list[dict]]] | None = None,
 ) -> SmurfAnalysisResponse:
     """Analyze a single player for smurf indicators.
 
+    If a result computed from the same inputs (newest match, level and
+    rank) by the current scoring code is stored, it is returned without
+    recomputing. Otherwise the player's stored running totals are caught
+    up with any new matches and scored.
+
+    Riot requests give up at the request context's deadline; a result
+    missing some matches is flagged PARTIAL.
+
     Args:
         puuid: Player PUUID
         riot_id_name: Optional Riot ID game name (from live game)
         riot_id_tag: Optional Riot ID tag (from live game)
         champion_id: Optional champion ID (from live game)
         position: Optional inferred position (from live game)
+        summoner: Optional already fetched summoner data
+        match_ids: Optional already synced match IDs
+        load_stats: Optional loader of the player's stats for the given match
+            IDs, used instead of loading them alone (e.g. the lobby's batch)
 
     Returns:
         SmurfAnalysisResponse with analysis results
+
+    Raises:
+        DeadlineExceeded: If the deadline passes before the player's data is in
     """
     # Get account info
-    try:
-        summoner = await riot_api.get_summoner_by_puuid(puuid)
-    except SummonerNotFound:
-        raise HTTPException(status_code=404, detail="Summoner not found")
+    if summoner is None:
+        try:
+            summoner = await riot_api.get_summoner_by_puuid(puuid)
+        except SummonerNotFound as e:
+            raise HTTPException(status_code=404, detail="Summoner not found") from e
 
     # Get ranked data using PUUID
     solo_tier = None
@@ -92,12 +141,72 @@ async def analyze_player_by_puuid(
             solo_losses = entry.losses
             break
 
-    # Fetch match history (limited to 5 to respect rate limits)
-    matches = await match_service.get_recent_matches(puuid, count=5, queue_id=420)
+    player = {
+        "puuid": puuid,
+        "riot_id_name": riot_id_name,
+        "riot_id_tag": riot_id_tag,
+        "summoner_level": summoner.summoner_level,
+        "solo_tier": solo_tier,
+        "solo_rank": solo_rank,
+        "champion_id": champion_id,
+        "position": position,
+    }
+
+    # Match history (limited to 5 to respect rate limits)
+    if match_ids is None:
+        match_ids = (
+            await match_service.get_lobby_match_ids(
+                [summoner], count=ANALYSIS_MATCH_COUNT, queue_id=ANALYSIS_QUEUE_ID
+            )
+        )[puuid]
+    # Past the deadline an empty history means the listing was cut off
+    if not match_ids and deadline_passed():
+        raise DeadlineExceeded()
+
+    fingerprint = analysis_fingerprint(
+        match_ids[0] if match_ids else "",
+        summoner.summoner_level,
+        solo_tier,
+        solo_rank,
+        ANALYSIS_MATCH_COUNT,
+        ANALYSIS_QUEUE_ID,
+    )
+    try:
+        stored = await analysis_repository.get_analysis(puuid, fingerprint)
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning(f"Failed to read stored analysis for {puuid}: {e}")
+        stored = None
+    if stored is not None:
+        return stored_analysis_response(stored, **player)
+
+    # Bring the player's running totals up to date with the synced matches
+    try:
+        state = await indicator_state_repository.get_state(puuid, ANALYSIS_QUEUE_ID, ANALYSIS_MATCH_COUNT)
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning(f"Failed to read indicator state for {puuid}: {e}")
+        state = None
+    new_ids = state.new_match_ids(match_ids) if state is not None else None
+    if new_ids is None:
+        state = IndicatorState(ANALYSIS_MATCH_COUNT, ANALYSIS_QUEUE_ID)
+        new_ids = match_ids
+
+    if not new_ids:
+        new_stats = []
+    elif load_stats is None:
+        new_stats = (
+            await match_service.load_player_stats(
+                [summoner], {puuid: new_ids}, queue_id=ANALYSIS_QUEUE_ID
+            )
+        )[puuid]
+    else:
+        new_stats = await load_stats(new_ids)
+    for stats in reversed(new_stats):
+        state.add(stats)
+    # Matches that failed to load leave no older match standing in for them
+    state.retain(match_ids)
 
-    # Extract and aggregate stats
-    player_stats = match_service.extract_player_stats(matches, puuid)
-    aggregate_stats = match_service.calculate_aggregate_stats(player_stats)
+    # Aggregate stats
+    aggregate_stats = state.aggregate()
 
     # Run smurf detection
     result = smurf_detector.analyze(
@@ -109,15 +218,21 @@ async def analyze_player_by_puuid(
         ranked_losses=solo_losses,
     )
 
+    # Only store results and totals computed from every listed match
+    if len(new_stats) == len(new_ids):
+        try:
+            await indicator_state_repository.save_state(summoner, state)
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning(f"Failed to store indicator state for {puuid}: {e}")
+        try:
+            await analysis_repository.save_analysis(
+                summoner, fingerprint, result, aggregate_stats, solo_tier, solo_rank
+            )
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning(f"Failed to store analysis for {puuid}: {e}")
+
     return SmurfAnalysisResponse(
-        puuid=puuid,
-        riot_id_name=riot_id_name,
-        riot_id_tag=riot_id_tag,
-        summoner_level=summoner.summoner_level,
-        solo_tier=solo_tier,
-        solo_rank=solo_rank,
-        champion_id=champion_id,
-        position=position,
+        **player,
         total_score=result.total_score,
         classification=SmurfClassification(result.classification.value),
         confidence=result.confidence,
@@ -138,43 +253,366 @@ async def analyze_player_by_puuid(
             games_analyzed=aggregate_stats.get("games_analyzed", 0),
         ),
         analyzed_at=datetime.utcnow(),
+        status=AnalysisStatus.COMPLETE if len(new_stats) == len(new_ids) else AnalysisStatus.PARTIAL,
     )
 
 
+def stored_analysis_response(stored: SmurfAnalysis, **player) -> SmurfAnalysisResponse:
+    """Build a response from a memoized analysis row.
+
+    Args:
+        stored: Stored analysis
+        **player: Player identity fields of SmurfAnalysisResponse
+
+    Returns:
+        SmurfAnalysisResponse as it was when the analysis was computed
+    """
+    return SmurfAnalysisResponse(
+        **player,
+        total_score=stored.total_score,
+        classification=SmurfClassification(stored.classification.value),
+        confidence=stored.confidence,
+        indicator_scores=IndicatorScores(
+            winrate=stored.winrate_score,
+            account_age=stored.account_age_score,
+            champion_pool=stored.champion_pool_score,
+            cs_per_min=stored.cs_per_min_score,
+            kda=stored.kda_score,
+            game_frequency=stored.game_frequency_score,
+        ),
+        raw_metrics=RawMetrics(
+            winrate=stored.winrate,
+            avg_cs_per_min=stored.avg_cs_per_min,
+            avg_kda=stored.avg_kda,
+            unique_champions=stored.unique_champions,
+            games_per_day=stored.games_per_day,
+            games_analyzed=stored.games_analyzed,
+        ),
+        analyzed_at=stored.created_at,
+    )
+
+
+def deadline_passed() -> bool:
+    """Whether the current request context's deadline has passed."""
+    remaining = time_remaining()
+    return remaining is not None and remaining <= 0
+
+
+def _deadline_after(seconds: float | None) -> float | None:
+    """Deadline `seconds` from now, for request_context."""
+    return None if seconds is None else time.monotonic() + seconds
+
+
+def _failure_status(error: Exception) -> AnalysisStatus:
+    """Status of a player whose analysis raised `error`."""
+    return AnalysisStatus.TIMED_OUT if isinstance(error, DeadlineExceeded) else AnalysisStatus.FAILED
+
+
+async def _as_finished(
+    request: Request, pending: dict[asyncio.Task, str], deadline: float | None
+) -> AsyncIterator[SmurfAnalysisResponse | PlayerAnalysisError]:
+    """Yield players' analyses, or why they failed, in the order they finish.
+
+    Args:
+        request: Incoming request; if the client disconnects, the remaining
+            analyses are cancelled and iteration stops
+        pending: Analysis tasks, mapped to the PUUID they analyze
+        deadline: time.monotonic() at which analyses still running are
+            cancelled and reported TIMED_OUT
+    """
+    disconnect = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        while pending:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            done, _ = await asyncio.wait(
+                {*pending, disconnect}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnect in done:
+                logger.info(f"Client disconnected, cancelled {len(pending)} analyses")
+                return
+            if not done:
+                break
+            for task in done:
+                puuid = pending.pop(task)
+                try:
+                    outcome = task.result()
+                except Exception as e:
+                    if isinstance(e, HTTPException):
+                        logger.warning(f"Failed to analyze player {puuid}: {e.detail}")
+                    else:
+                        logger.exception(f"Failed to analyze player {puuid}")
+                    outcome = PlayerAnalysisError(
+                        puuid=puuid,
+                        detail=getattr(e, "detail", str(e)),
+                        status=_failure_status(e),
+                    )
+                yield outcome
+
+        # Out of time: report whoever is left
+        for puuid in pending.values():
+            yield PlayerAnalysisError(
+                puuid=puuid,
+                detail=DeadlineExceeded().detail,
+                status=AnalysisStatus.TIMED_OUT,
+            )
+    finally:
+        # Out of time, or the client went away: stop the remaining analyses
+        disconnect.cancel()
+        for task in pending:
+            task.cancel()
+
+
 @router.post("/player", response_model=SmurfAnalysisResponse)
-async def analyze_player(puuid: str) -> SmurfAnalysisResponse:
+async def analyze_player(
+    request: Request,
+    puuid: str,
+    deadline: float | None = Query(default=None, gt=0),
+) -> SmurfAnalysisResponse:
     """Analyze a single player for smurf indicators.
 
     Args:
+        request: Incoming request, watched for client disconnects
         puuid: Player PUUID (passed as query parameter)
+        deadline: Seconds to spend at most; Riot requests still outstanding
+            then are cancelled (504 if the player's data isn't in)
 
     Returns:
         Complete smurf analysis results
     """
-    return await analyze_player_by_puuid(puuid)
+    with request_context(origin=f"player:{puuid}", deadline=_deadline_after(deadline)):
+        return await cancel_on_disconnect(request, analyze_player_by_puuid(puuid))
 
 
 @router.post("/match", response_model=MatchAnalysisResponse)
-async def analyze_match(puuid: str) -> MatchAnalysisResponse:
+async def analyze_match(
+    request: Request,
+    puuid: str,
+    deadline: float | None = Query(default=None, gt=0),
+    wait: float | None = Query(default=None, gt=0, le=MAX_WAIT),
+) -> MatchAnalysisResponse:
     """Analyze all players in a live match.
 
     Args:
+        request: Incoming request, watched for client disconnects
         puuid: PUUID of player to find match for
+        deadline: Seconds to spend at most; analyses still running then are
+            cancelled and left out, see `player_statuses`
+        wait: Seconds to wait for a game to start if the player isn't in one
+            (counts towards the deadline)
 
     Returns:
         Analysis results for all 10 players in the match
     """
+    # All Riot requests for this lobby share one fair-share slot in the scheduler
+    with request_context(origin=f"match:{puuid}", deadline=_deadline_after(deadline)):
+        if wait is not None:
+            game = await cancel_on_disconnect(request, live_game_watcher.wait_for_game(puuid, wait))
+            if game is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Player is not currently in a game",
+                )
+        return await cancel_on_disconnect(request, _analyze_match(puuid))
+
+
+@router.post("/match/stream")
+async def analyze_match_stream(
+    request: Request,
+    puuid: str,
+    deadline: float | None = Query(default=None, gt=0),
+) -> StreamingResponse:
+    """Analyze all players in a live match, streaming results as they finish.
+
+    Sends Server-Sent Events: a `lobby` event (LobbySkeleton) right away,
+    then a `player` event (SmurfAnalysisResponse) or `player_error` event
+    (PlayerAnalysisError) per visible player in the order they finish, and
+    finally a `done` event. If the client disconnects, the analyses still
+    running are cancelled.
+
+    Args:
+        request: Incoming request, watched for client disconnects
+        puuid: PUUID of player to find match for
+        deadline: Seconds to spend at most; players still running then get
+            a TIMED_OUT `player_error`
+
+    Returns:
+        Event stream of the lobby and each player's analysis
+    """
+    deadline_at = _deadline_after(deadline)
+    with request_context(origin=f"match:{puuid}", deadline=deadline_at):
+        lobby = await cancel_on_disconnect(request, get_lobby(puuid))
+    return StreamingResponse(
+        _stream_match(request, puuid, lobby, deadline_at),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/jobs", response_model=AnalysisJobResponse, status_code=202)
+async def submit_analysis_job(puuid: str, kind: JobKind = JobKind.PLAYER) -> AnalysisJobResponse:
+    """Queue an analysis to run in the background.
+
+    Poll GET /jobs/{id} for its progress and result. Submitting an analysis
+    that is already queued or running returns the existing job.
+
+    Args:
+        puuid: Player to analyze, or to find the live match of
+        kind: PLAYER for the player's analysis, MATCH for their live match
+
+    Returns:
+        The queued job
+    """
+    job = await analysis_jobs.submit(kind.value, puuid)
+    return AnalysisJobResponse.model_validate(job)
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(job_id: str) -> AnalysisJobResponse:
+    """Get a background analysis job's progress, and its result once complete.
+
+    Raises:
+        HTTPException: 404 if there is no such job
+    """
+    job = await analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Analysis job '{job_id}' not found")
+    return AnalysisJobResponse.model_validate(job)
+
+
+async def _run_player_job(puuid: str, progress: ProgressCallback) -> SmurfAnalysisResponse:
+    """Run a PLAYER job (as POST /player)."""
+    with request_context(origin=f"player:{puuid}"):
+        return await analyze_player_by_puuid(puuid)
+
+
+async def _run_match_job(puuid: str, progress: ProgressCallback) -> MatchAnalysisResponse:
+    """Run a MATCH job (as POST /match)."""
+    with request_context(origin=f"match:{puuid}"):
+        return await _analyze_match(puuid, progress)
+
+
+analysis_jobs.register(JobKind.PLAYER.value, _run_player_job)
+analysis_jobs.register(JobKind.MATCH.value, _run_match_job)
+
+
+@router.post("/players")
+async def analyze_players(
+    request: Request,
+    batch: PlayerBatchRequest,
+    deadline: float | None = Query(default=None, gt=0),
+) -> StreamingResponse:
+    """Analyze a list of players, streaming results as they finish.
+
+    Sends newline-delimited JSON: one line per distinct PUUID, in the order
+    they finish, holding either its SmurfAnalysisResponse (status COMPLETE
+    or PARTIAL) or a PlayerAnalysisError (status FAILED or TIMED_OUT).
+    Summoners, ranks and matches the players share are fetched once, and
+    the batch takes a single fair-share turn at the rate limiter.
+
+    Args:
+        request: Incoming request, watched for client disconnects
+        batch: PUUIDs to analyze
+        deadline: Seconds to spend at most; players still running then get
+            a TIMED_OUT line
+
+    Returns:
+        Stream of one JSON line per player
+    """
+    puuids = list(dict.fromkeys(batch.puuids))
+    return StreamingResponse(
+        _stream_players(request, puuids, _deadline_after(deadline)),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: str, data: str) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def _stream_match(
+    request: Request, puuid: str, lobby: LobbySkeleton, deadline: float | None
+) -> AsyncIterator[str]:
+    """Yield the lobby, then each player's analysis as soon as it finishes."""
+    yield _sse("lobby", lobby.model_dump_json())
+
+    async def analyze(player: LobbyPlayer) -> SmurfAnalysisResponse:
+        summoner = await riot_api.get_summoner_by_puuid(player.puuid)
+        return await analyze_lobby_player(player, summoner=summoner)
+
+    # Each player gets their own pipeline so nobody waits on the slowest;
+    # matches shared between players are still fetched once (see RiotAPIClient)
+    players = lobby.blue_team + lobby.red_team
+    with request_context(origin=f"match:{puuid}", deadline=deadline):
+        pending = {asyncio.ensure_future(analyze(p)): p.puuid for p in players}
+
+    analyzed = failed = 0
+    async for outcome in _as_finished(request, pending, deadline):
+        if isinstance(outcome, PlayerAnalysisError):
+            failed += 1
+            yield _sse("player_error", outcome.model_dump_json())
+        else:
+            analyzed += 1
+            yield _sse("player", outcome.model_dump_json())
+
+    # Unless the client went away
+    if analyzed + failed == len(players):
+        yield _sse("done", json.dumps({"analyzed": analyzed, "failed": failed}))
+
+
+async def _stream_players(request: Request, puuids: list[str], deadline: float | None) -> AsyncIterator[str]:
+    """Yield each player's analysis as a JSON line as soon as it finishes."""
+    semaphore = asyncio.Semaphore(settings.BATCH_ANALYSIS_CONCURRENCY)
+
+    async def analyze(puuid: str) -> SmurfAnalysisResponse:
+        async with semaphore:
+            return await analyze_player_by_puuid(puuid)
+
+    # The whole batch takes one fair-share turn in the scheduler
+    with request_context(origin=f"batch:{uuid.uuid4().hex}", deadline=deadline):
+        pending = {asyncio.ensure_future(analyze(p)): p for p in puuids}
+
+    async for outcome in _as_finished(request, pending, deadline):
+        yield outcome.model_dump_json() + "\n"
+
+
+async def analyze_lobby_player(player: LobbyPlayer, **kwargs) -> SmurfAnalysisResponse:
+    """Analyze a player of a live match.
+
+    Args:
+        player: Player from the lobby skeleton
+        **kwargs: Already fetched data, as for analyze_player_by_puuid
+
+    Returns:
+        SmurfAnalysisResponse with the player's live game details
+    """
+    return await analyze_player_by_puuid(
+        player.puuid,
+        riot_id_name=player.riot_id_name,
+        riot_id_tag=player.riot_id_tag,
+        champion_id=player.champion_id,
+        position=player.position,
+        **kwargs,
+    )
+
+
+async def get_lobby(puuid: str) -> LobbySkeleton:
+    """Get the players, positions and hidden players of the live match of `puuid`.
+
+    Raises:
+        HTTPException: 404 if the player is not in a game
+    """
     # Get live game
     try:
         live_game = await riot_api.get_live_game(puuid)
-    except SummonerNotFound:
+    except SummonerNotFound as e:
         raise HTTPException(
             status_code=404,
             detail="Player is not currently in a game",
-        )
+        ) from e
 
-    # Build participant info map
-    participant_info = {}
     blue_team_participants = []
     red_team_participants = []
     hidden_players_data = []  # Players with streamer mode (no puuid)
@@ -207,10 +645,9 @@ async def analyze_match(puuid: str) -> MatchAnalysisResponse:
             "champion_id": participant.champion_id,
             "spell1_id": participant.spell1_id,
             "spell2_id": participant.spell2_id,
+            "team_id": participant.team_id,
         }
 
-        participant_info[participant.puuid] = p_data
-
         if participant.team_id == 100:
             blue_team_participants.append(p_data)
         else:
@@ -221,46 +658,25 @@ async def analyze_match(puuid: str) -> MatchAnalysisResponse:
     red_positions = infer_team_positions(red_team_participants)
     all_positions = {**blue_positions, **red_positions}
 
-    blue_team_puuids = [p["puuid"] for p in blue_team_participants]
-    red_team_puuids = [p["puuid"] for p in red_team_participants]
-
-    # Analyze all players concurrently
-    async def safe_analyze(p: str) -> SmurfAnalysisResponse | None:
-        try:
-            info = participant_info.get(p, {})
-            return await analyze_player_by_puuid(
-                p,
-                riot_id_name=info.get("riot_id_name", ""),
-                riot_id_tag=info.get("riot_id_tag", ""),
-                champion_id=info.get("champion_id"),
-                position=all_positions.get(p, Position.UNKNOWN),
-            )
-        except Exception as e:
-            logger.warning(f"Failed to analyze player {p}: {e}")
-            return None
-
-    # Run all analyses concurrently
-    all_puuids = blue_team_puuids + red_team_puuids
-    results = await asyncio.gather(*[safe_analyze(p) for p in all_puuids])
+    def lobby_player(p_data: dict) -> LobbyPlayer:
+        return LobbyPlayer(
+            puuid=p_data["puuid"],
+            riot_id_name=p_data["riot_id_name"],
+            riot_id_tag=p_data["riot_id_tag"],
+            champion_id=p_data["champion_id"],
+            position=all_positions.get(p_data["puuid"], Position.UNKNOWN),
+            team_id=p_data["team_id"],
+        )
 
-    # Split results back into teams
-    blue_results = []
-    red_results = []
-
-    for i, result in enumerate(results):
-        if result is None:
-            continue
-        if i < len(blue_team_puuids):
-            blue_results.append(result)
-        else:
-            red_results.append(result)
+    blue_team = [lobby_player(p) for p in blue_team_participants]
+    red_team = [lobby_player(p) for p in red_team_participants]
 
     # Build hidden player objects
     hidden_players = []
 
     # First, handle any participants with null puuid (rare, but possible)
-    blue_assigned = {all_positions.get(p, Position.UNKNOWN) for p in blue_team_puuids}
-    red_assigned = {all_positions.get(p, Position.UNKNOWN) for p in red_team_puuids}
+    blue_assigned = {p.position for p in blue_team}
+    red_assigned = {p.position for p in red_team}
 
     for hp_data in hidden_players_data:
         team_id = hp_data["team_id"]
@@ -310,10 +726,173 @@ async def analyze_match(puuid: str) -> MatchAnalysisResponse:
             team_id=200,
         ))
 
-    return MatchAnalysisResponse(
+    return LobbySkeleton(
         game_id=live_game.game_id,
         game_mode=get_queue_name(live_game.game_queue_config_id, live_game.game_mode),
+        game_start_time=live_game.game_start_time,
+        blue_team=blue_team,
+        red_team=red_team,
+        hidden_players=hidden_players,
+    )
+
+
+async def _analyze_match(puuid: str, progress: ProgressCallback | None = None) -> MatchAnalysisResponse:
+    """Analyze all players in the live match of `puuid`.
+
+    The analysis is shared by everyone looking up the same game: a player
+    of a lobby analyzed moments ago is answered from the lobby cache
+    without any Riot calls, and concurrent lookups of one game share a
+    single analysis. A caller whose deadline passes first gets the players
+    finished by then, the others TIMED_OUT.
+
+    Args:
+        puuid: PUUID of player to find match for
+        progress: Called with (players finished, players in total) as
+            player analyses finish, also when joining a shared analysis
+            already in progress
+    """
+    game_id = lobby_cache.game_of(puuid)
+    if game_id is not None:
+        cached = await lobby_cache.lookup(game_id, progress)
+        if cached is not None:
+            return cached
+
+    lobby = await get_lobby(puuid)
+    # Filled in by the analysis as players finish, for callers out of time
+    results: dict[str, SmurfAnalysisResponse] = {}
+    statuses: dict[str, AnalysisStatus] = {}
+    return await lobby_cache.get_or_compute(
+        lobby,
+        lambda shared_progress: _analyze_lobby(lobby, shared_progress, results, statuses),
+        snapshot=lambda: _lobby_response(lobby, results, statuses),
+        progress=progress,
+    )
+
+
+# Watched players' lobbies are analyzed as soon as they enter a game
+player_watcher.set_prefetch(_analyze_match)
+
+
+async def _analyze_lobby(
+    lobby: LobbySkeleton,
+    progress: ProgressCallback | None = None,
+    results: dict[str, SmurfAnalysisResponse] | None = None,
+    statuses: dict[str, AnalysisStatus] | None = None,
+) -> MatchAnalysisResponse:
+    """Analyze all players in a live match.
+
+    Players whose analysis hasn't finished by the request context's deadline
+    are cancelled and reported in `player_statuses` only.
+
+    Args:
+        lobby: The match's lobby
+        progress: Called with (players finished, players in total) as
+            player analyses finish
+        results: Filled in with each player's analysis as it finishes
+        statuses: Filled in with the status of each player that failed
+    """
+    players = lobby.blue_team + lobby.red_team
+    results = {} if results is None else results
+    statuses = {} if statuses is None else statuses
+    finished = 0
+    if progress is not None:
+        await progress(finished, len(players))
+
+    # Fetch every player's summoner first so match history can be fetched
+    # for the whole lobby at once (shared matches are only fetched once)
+    async def safe_get_summoner(p: str) -> SummonerData | None:
+        try:
+            return await riot_api.get_summoner_by_puuid(p)
+        except HTTPException as e:
+            logger.warning(f"Failed to fetch summoner {p}: {e.detail}")
+            statuses[p] = _failure_status(e)
+        except Exception:
+            logger.exception(f"Failed to fetch summoner {p}")
+            statuses[p] = AnalysisStatus.FAILED
+        return None
+
+    summoners = await asyncio.gather(*[safe_get_summoner(p.puuid) for p in players])
+    summoners_by_puuid = {s.puuid: s for s in summoners if s is not None}
+    lobby_summoners = list(summoners_by_puuid.values())
+    lobby_match_ids = await match_service.get_lobby_match_ids(
+        lobby_summoners, count=ANALYSIS_MATCH_COUNT, queue_id=ANALYSIS_QUEUE_ID
+    )
+    # Players whose analysis is memoized load no stats, the rest only the
+    # matches missing from their running totals, together once every
+    # player has checked
+    stats_batch = PlayerStatsBatch(match_service, lobby_summoners, queue_id=ANALYSIS_QUEUE_ID)
+
+    # Analyze all players concurrently
+    async def safe_analyze(player: LobbyPlayer) -> SmurfAnalysisResponse | None:
+        nonlocal finished
+        p = player.puuid
+        result = None
+        if p in summoners_by_puuid:
+            try:
+                result = await analyze_lobby_player(
+                    player,
+                    summoner=summoners_by_puuid[p],
+                    match_ids=lobby_match_ids[p],
+                    load_stats=lambda match_ids: stats_batch.load(p, match_ids),
+                )
+            except Exception as e:
+                logger.warning(f"Failed to analyze player {p}: {e}")
+                statuses[p] = _failure_status(e)
+            finally:
+                stats_batch.done(p)
+        if result is not None:
+            results[p] = result
+        finished += 1
+        if progress is not None:
+            await progress(finished, len(players))
+        return result
+
+    # Run all analyses concurrently, keeping whatever finishes in time
+    tasks = [asyncio.ensure_future(safe_analyze(p)) for p in players]
+    if tasks:
+        try:
+            await asyncio.wait(tasks, timeout=time_remaining())
+        finally:
+            # Out of time, or cancelled ourselves (client gone): stop the rest
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            stats_batch.close()
+        # Let them unwind so their unused rate limit tokens are refunded
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    return _lobby_response(lobby, results, statuses)
+
+
+def _lobby_response(
+    lobby: LobbySkeleton,
+    results: dict[str, SmurfAnalysisResponse],
+    statuses: dict[str, AnalysisStatus],
+) -> MatchAnalysisResponse:
+    """A lobby's analysis from the players analyzed so far.
+
+    Players neither analyzed nor failed are reported TIMED_OUT.
+    """
+    blue_results = []
+    red_results = []
+    statuses = dict(statuses)
+
+    for player in lobby.blue_team + lobby.red_team:
+        result = results.get(player.puuid)
+        if result is None:
+            statuses.setdefault(player.puuid, AnalysisStatus.TIMED_OUT)
+            continue
+        statuses[player.puuid] = result.status
+        if player.team_id == 100:
+            blue_results.append(result)
+        else:
+            red_results.append(result)
+
+    return MatchAnalysisResponse(
+        game_id=lobby.game_id,
+        game_mode=lobby.game_mode,
         blue_team=blue_results,
         red_team=red_results,
-        hidden_players=hidden_players,
+        hidden_players=lobby.hidden_players,
+        player_statuses=statuses,
     )
@@ -2,10 +2,13 @@
 
 import logging
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
+from app.api.deps import cancel_on_disconnect
 from app.core.exceptions import SummonerNotFound
-from app.schemas.match import LiveGameResponse
+from app.schemas.match import LiveGameResponse, WatchedPlayerResponse
+from app.services.live_game_watcher import MAX_WAIT, live_game_watcher
+from app.services.player_watcher import player_watcher
 from app.services.riot_api import riot_api
 
 logger = logging.getLogger(__name__)
@@ -14,11 +17,17 @@ router = APIRouter()
 
 
 @router.get("/live/{puuid}", response_model=LiveGameResponse)
-async def get_live_match(puuid: str) -> LiveGameResponse:
+async def get_live_match(
+    request: Request,
+    puuid: str,
+    wait: float | None = Query(default=None, gt=0, le=MAX_WAIT),
+) -> LiveGameResponse:
     """Get the current live match for a player.
 
     Args:
+        request: Incoming request, watched for client disconnects
         puuid: Player PUUID
+        wait: Seconds to wait for a game to start if the player isn't in one
 
     Returns:
         Live game data including all participants
@@ -27,10 +36,49 @@ async def get_live_match(puuid: str) -> LiveGameResponse:
         404: Player is not currently in a game
     """
     try:
-        live_game = await riot_api.get_live_game(puuid)
-        return live_game
+        if wait is None:
+            return await riot_api.get_live_game(puuid)
+        live_game = await cancel_on_disconnect(request, live_game_watcher.wait_for_game(puuid, wait))
     except SummonerNotFound:
+        live_game = None
+    if live_game is None:
         raise HTTPException(
             status_code=404,
             detail="Player is not currently in a game",
         )
+    return live_game
+
+
+@router.get("/watched", response_model=list[WatchedPlayerResponse])
+async def list_watched_players() -> list[WatchedPlayerResponse]:
+    """List the players checked for live games in the background."""
+    return await player_watcher.players()
+
+
+@router.put("/watched/{puuid}", response_model=WatchedPlayerResponse)
+async def watch_player(puuid: str, label: str | None = Query(default=None, max_length=100)) -> WatchedPlayerResponse:
+    """Start checking a player for live games in the background.
+
+    When they enter a game, their lobby's analysis is prefetched so
+    POST /analysis/match answers from the cache.
+
+    Args:
+        puuid: Player PUUID
+        label: Why the player is watched, e.g. "streamer"
+
+    Returns:
+        The player's registration
+    """
+    return await player_watcher.watch(puuid, label)
+
+
+@router.delete("/watched/{puuid}", status_code=204)
+async def unwatch_player(puuid: str) -> Response:
+    """Stop checking a player for live games.
+
+    Raises:
+        404: Player is not watched
+    """
+    if not await player_watcher.unwatch(puuid):
+        raise HTTPException(status_code=404, detail="Player is not watched")
+    return Response(status_code=204)
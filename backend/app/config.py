@@ -37,6 +37,54 @@ class Settings(BaseSettings):
     RATE_LIMIT_PER_SECOND: int = 20
     RATE_LIMIT_PER_2MIN: int = 100
 
+    # Where rate limit state lives: "memory" (this process only), "file"
+    # (all workers on this host) or "database" (all hosts)
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_STATE_PATH: str = "rate_limits.json"
+
+    # Max match detail requests in flight at once (across all analyses)
+    MATCH_FETCH_CONCURRENCY: int = 10
+
+    # Riot response cache: in-memory caps on entries and on their encoded
+    # size, and SQLite file shared by workers on the same host (empty to
+    # keep the cache in memory only)
+    CACHE_MAX_ENTRIES: int = 5000
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_DB_PATH: str = "riot_cache.sqlite3"
+
+    # Calibrated CS/min and KDA benchmarks per tier, written by
+    # app.jobs.calibrate (built-in benchmarks are used if missing)
+    TIER_BENCHMARKS_PATH: str = "tier_benchmarks.json"
+
+    # Max players of a POST /analysis/players batch analyzed at once
+    BATCH_ANALYSIS_CONCURRENCY: int = 10
+
+    # Background analysis jobs: max running at once per process, and how
+    # long a running job may go without an update before it is presumed
+    # orphaned by a crashed process and re-run at startup
+    ANALYSIS_JOB_WORKERS: int = 4
+    ANALYSIS_JOB_STALE_SECONDS: int = 600
+
+    # "Not in game" spectator answers are cached this long plus up to the
+    # jitter, so re-checks of many players don't land together. Clients
+    # long-polling with ?wait= share one check per player this often.
+    LIVE_GAME_NOT_FOUND_TTL: float = 15
+    LIVE_GAME_NOT_FOUND_JITTER: float = 5
+    LIVE_GAME_POLL_SECONDS: float = 20
+
+    # Watched players (streamers, flagged accounts) are checked for live
+    # games every WATCH_MIN_INTERVAL_SECONDS at hours they usually play,
+    # backing off to WATCH_MAX_INTERVAL_SECONDS, and every
+    # WATCH_IN_GAME_INTERVAL_SECONDS while in a game. Their checks and
+    # prefetches use at most WATCH_RATE_SHARE of the app rate limit. One
+    # process at a time watches, holding a lease it renews well within
+    # WATCH_LEASE_SECONDS.
+    WATCH_MIN_INTERVAL_SECONDS: float = 30
+    WATCH_MAX_INTERVAL_SECONDS: float = 15 * 60
+    WATCH_IN_GAME_INTERVAL_SECONDS: float = 3 * 60
+    WATCH_RATE_SHARE: float = 0.25
+    WATCH_LEASE_SECONDS: float = 60
+
 
 @lru_cache
 def get_settings() -> Settings:
@@ -0,0 +1,310 @@
+"""Two-tier cache for Riot API responses.
+
+Responses live in an in-process LRU for fast repeat lookups, backed by a
+SQLite file so restarts and other uvicorn workers on the same host start
+with warm data. How long a response stays fresh depends on the endpoint.
+The LRU is capped by the encoded size of its responses as well as their
+number, since a match-v5 payload is far bigger than most.
+
+Some endpoints' 404s are cached too, for a short jittered TTL: a player
+who isn't in a game is usually asked about again seconds later.
+"""
+
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any
+
+import orjson
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Seconds each Riot API method's responses stay fresh. Endpoints not listed
+# here are never cached.
+ENDPOINT_TTLS: dict[str, float] = {
+    "account-v1.getByRiotId": 60 * 60,
+    "summoner-v4.getByPUUID": 60 * 60,  # Level changes rarely
+    "league-v4.getLeagueEntriesByPUUID": 5 * 60,  # Changes after every ranked game
+    "match-v5.getMatchIdsByPUUID": 60,
+    "match-v5.getMatch": 7 * 24 * 60 * 60,  # Finished matches never change
+    "spectator-v5.getCurrentGameInfoByPuuid": 10,
+}
+
+# Seconds a 404 from these endpoints is remembered, plus up to the jitter
+NOT_FOUND_TTLS: dict[str, tuple[float, float]] = {
+    "spectator-v5.getCurrentGameInfoByPuuid": (
+        settings.LIVE_GAME_NOT_FOUND_TTL,
+        settings.LIVE_GAME_NOT_FOUND_JITTER,
+    ),
+}
+
+# Cached in place of a 404 response (JSON so it survives the disk tier)
+NOT_FOUND = {"__not_found__": True}
+
+# Returned by cache lookups on a miss (None is a valid cached value)
+MISSING = object()
+
+
+class LRUCache:
+    """In-memory LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries: int, max_bytes: int | None = None):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Entries kept at most
+            max_bytes: Total of the sizes given to `set` kept at most (None for no cap)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[float, Any, int]] = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """Total size of the entries kept."""
+        return self._bytes
+
+    def get(self, key: str, now: float) -> Any:
+        """Get a fresh value, or MISSING."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value, size = entry
+        if expires_at <= now:
+            del self._entries[key]
+            self._bytes -= size
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, expires_at: float, size: int = 0) -> None:
+        """Store a value, evicting least recently used entries while over a cap.
+
+        Args:
+            key: Key to store the value under
+            value: Value to store
+            expires_at: time.time() after which the value is stale
+            size: Approximate size of the value in bytes, for `max_bytes`
+        """
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._entries[key] = (expires_at, value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self._bytes > self.max_bytes and len(self._entries) > 1
+        ):
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+
+class SQLiteCache:
+    """On-disk cache tier shared by every process on the host.
+
+    Calls are blocking, so ResponseCache runs them in a worker thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            # WAL lets several workers read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str, now: float) -> tuple[bytes, float] | None:
+        """Get a fresh (JSON payload, expires_at) pair, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def set(self, key: str, payload: bytes, expires_at: float) -> None:
+        """Store a JSON payload."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at),
+            )
+            conn.commit()
+
+    def purge_expired(self, now: float) -> int:
+        """Delete expired entries, returning how many were removed."""
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,)).rowcount
+            conn.commit()
+        return deleted
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ResponseCache:
+    """Riot response cache: LRU in front of an optional SQLite tier."""
+
+    # Purge expired disk entries after this many writes
+    PURGE_EVERY = 1000
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        db_path: str | None = None,
+        ttls: dict[str, float] | None = None,
+        not_found_ttls: dict[str, tuple[float, float]] | None = None,
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_entries: In-memory entry cap (defaults to CACHE_MAX_ENTRIES)
+            max_bytes: In-memory cap on the responses' encoded size (defaults
+                to CACHE_MAX_BYTES)
+            db_path: SQLite file for the disk tier (None for memory only)
+            ttls: Seconds to keep each endpoint's responses (defaults to ENDPOINT_TTLS)
+            not_found_ttls: (seconds, jitter) to keep each endpoint's 404s
+                (defaults to NOT_FOUND_TTLS)
+        """
+        self._memory = LRUCache(
+            max_entries or settings.CACHE_MAX_ENTRIES, max_bytes or settings.CACHE_MAX_BYTES
+        )
+        self._disk = SQLiteCache(db_path) if db_path else None
+        self._ttls = ENDPOINT_TTLS if ttls is None else ttls
+        self._not_found_ttls = NOT_FOUND_TTLS if not_found_ttls is None else not_found_ttls
+        self._writes = 0
+        self._hits: Counter[str] = Counter()
+        self._misses: Counter[str] = Counter()
+        self._disk_hits = 0
+
+    def is_cacheable(self, endpoint: str) -> bool:
+        """Whether responses (or 404s) for this endpoint are cached at all."""
+        return self._ttls.get(endpoint, 0) > 0 or endpoint in self._not_found_ttls
+
+    async def get(self, endpoint: str, key: str) -> Any:
+        """Look up a response in memory, then on disk.
+
+        Args:
+            endpoint: Riot API method name
+            key: Request key (method, URL and params)
+
+        Returns:
+            Cached response, or MISSING
+        """
+        now = time.time()
+        value = self._memory.get(key, now)
+
+        if value is MISSING and self._disk is not None:
+            entry = None
+            try:
+                entry = await asyncio.to_thread(self._disk.get, key, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache read failed: {e}")
+            if entry is not None:
+                payload, expires_at = entry
+                value = orjson.loads(payload)
+                self._disk_hits += 1
+                # Promote to memory for the rest of its lifetime
+                self._memory.set(key, value, expires_at, len(payload))
+
+        if value is MISSING:
+            self._misses[endpoint] += 1
+        else:
+            self._hits[endpoint] += 1
+        return value
+
+    async def set(self, endpoint: str, key: str, value: Any) -> None:
+        """Store a response in both tiers using the endpoint's TTL.
+
+        Args:
+            endpoint: Riot API method name
+            key: Request key (method, URL and params)
+            value: JSON-serializable response
+        """
+        if self._ttls.get(endpoint, 0) > 0:
+            await self._store(key, value, time.time() + self._ttls[endpoint])
+
+    async def set_not_found(self, endpoint: str, key: str) -> None:
+        """Remember a 404 for the endpoint's jittered not-found TTL.
+
+        Lookups then return NOT_FOUND until it expires.
+
+        Args:
+            endpoint: Riot API method name
+            key: Request key (method, URL and params)
+        """
+        if endpoint not in self._not_found_ttls:
+            return
+        ttl, jitter = self._not_found_ttls[endpoint]
+        await self._store(key, NOT_FOUND, time.time() + ttl + random.uniform(0, jitter))
+
+    async def _store(self, key: str, value: Any, expires_at: float) -> None:
+        """Write an entry to both tiers."""
+        now = time.time()
+        # The encoded size stands in for the value's size in memory
+        payload = orjson.dumps(value)
+        self._memory.set(key, value, expires_at, len(payload))
+
+        if self._disk is not None:
+            self._writes += 1
+            try:
+                await asyncio.to_thread(self._disk.set, key, payload, expires_at)
+                if self._writes % self.PURGE_EVERY == 0:
+                    await asyncio.to_thread(self._disk.purge_expired, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache write failed: {e}")
+
+    def stats(self) -> dict:
+        """Hit/miss counters, overall and per endpoint."""
+        hits = sum(self._hits.values())
+        misses = sum(self._misses.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "disk_hits": self._disk_hits,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory.size,
+            "endpoints": {
+                endpoint: {"hits": self._hits[endpoint], "misses": self._misses[endpoint]}
+                for endpoint in sorted(set(self._hits) | set(self._misses))
+            },
+        }
+
+    def close(self) -> None:
+        """Close the disk tier."""
+        if self._disk is not None:
+            self._disk.close()
+
+
+# Global response cache instance
+response_cache = ResponseCache(
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    max_bytes=settings.CACHE_MAX_BYTES,
+    db_path=settings.CACHE_DB_PATH or None,
+)
@@ -52,3 +52,23 @@ class InsufficientData(HTTPException):
             status_code=422,
             detail=message,
         )
+
+
+class DeadlineExceeded(HTTPException):
+    """Raised when a request can't finish before the analysis deadline."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=504,
+            detail="Analysis deadline exceeded",
+        )
+
+
+class ClientDisconnected(HTTPException):
+    """Raised when the client goes away before its analysis finishes."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=499,
+            detail="Client closed request",
+        )
@@ -0,0 +1,404 @@
+"""Rate limit state and the backends that store it.
+
+Limiter state is small (a start time and a count per window, plus a
+backoff deadline), so it can live in process memory, in a lock-protected
+file shared by all workers on one host, or in the database shared by every
+host. Shared backends also keep window counts across restarts.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+from collections.abc import Callable
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import get_settings
+from app.db.session import async_session_factory, dialect_insert
+from app.models.database import RateLimitTracker
+
+settings = get_settings()
+
+
+class TokenBucket:
+    """Token bucket for a single rate limit window.
+
+    The bucket holds `limit` tokens and refills completely `window` seconds
+    after the first token of the current window was spent. This is how Riot
+    counts requests (fixed windows starting at the first request), and it
+    keeps the state down to two numbers that are cheap to share.
+    """
+
+    def __init__(self, limit: int, window: float, window_start: float = 0, count: int = 0):
+        self.limit = limit
+        self.window = window
+        self.window_start = window_start
+        self.count = count
+
+    def next_available(self, now: float) -> float:
+        """Get the earliest time at or after `now` that a token can be spent."""
+        if now >= self.window_start + self.window:
+            return now
+        if self.count < self.limit:
+            # window_start may lie in the future when a later window is reserved
+            return max(now, self.window_start)
+        return self.window_start + self.window
+
+    def spend(self, at: float) -> None:
+        """Spend a token at time `at` (from `next_available`)."""
+        if at >= self.window_start + self.window:
+            self.window_start = at
+            self.count = 1
+        else:
+            self.count += 1
+
+    def refund(self, at: float) -> None:
+        """Give back a token spent at time `at` for a request that was never sent.
+
+        Tokens from a window that has since rolled over are not refunded.
+        """
+        if self.window_start <= at < self.window_start + self.window and self.count > 0:
+            self.count -= 1
+
+    def resize(self, limit: int) -> None:
+        """Change the bucket capacity, keeping the current window's count."""
+        self.limit = limit
+
+    def sync(self, count: int, now: float) -> None:
+        """Account for requests the server has counted but we have not.
+
+        Args:
+            count: Requests Riot reports for the current window
+            now: Current time
+        """
+        if now >= self.window_start + self.window:
+            self.window_start = now
+            self.count = 0
+        self.count = max(self.count, min(count, self.limit))
+
+    def available_tokens(self, now: float) -> int:
+        """Number of tokens that could be spent right now."""
+        if now >= self.window_start + self.window:
+            return self.limit
+        return max(self.limit - self.count, 0)
+
+    def to_dict(self) -> dict:
+        return {
+            "limit": self.limit,
+            "window": self.window,
+            "window_start": self.window_start,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TokenBucket":
+        return cls(data["limit"], data["window"], data["window_start"], data["count"])
+
+
+class LimiterState:
+    """All buckets of one rate limiter plus its backoff deadline."""
+
+    def __init__(self, limits: list[tuple[int, float]], backoff_until: float = 0):
+        self.buckets = [TokenBucket(limit, window) for limit, window in limits]
+        self.backoff_until = backoff_until
+
+    @property
+    def limits(self) -> list[tuple[int, float]]:
+        """Current (max requests, window seconds) pairs."""
+        return [(bucket.limit, bucket.window) for bucket in self.buckets]
+
+    def next_slot(self, now: float) -> float:
+        """Get the earliest time a request could be admitted by every bucket."""
+        slot = max(now, self.backoff_until)
+        while True:
+            latest = max((bucket.next_available(slot) for bucket in self.buckets), default=slot)
+            if latest == slot:
+                return slot
+            slot = latest
+
+    def reserve(self, now: float) -> float:
+        """Spend a token in every bucket at the next free slot.
+
+        Returns:
+            Time the request may be sent
+        """
+        slot = self.next_slot(now)
+        for bucket in self.buckets:
+            bucket.spend(slot)
+        return slot
+
+    def release(self, slot: float) -> None:
+        """Refund a reservation made for `slot` in every bucket."""
+        for bucket in self.buckets:
+            bucket.refund(slot)
+
+    def update_limits(self, limits: list[tuple[int, float]]) -> None:
+        """Resize buckets; those whose window is unchanged keep their count."""
+        existing = {bucket.window: bucket for bucket in self.buckets}
+        buckets = []
+        for limit, window in limits:
+            bucket = existing.get(window)
+            if bucket is None:
+                bucket = TokenBucket(limit, window)
+            else:
+                bucket.resize(limit)
+            buckets.append(bucket)
+        self.buckets = buckets
+
+    def sync_counts(self, counts: list[tuple[int, float]], now: float) -> None:
+        """Bring window counts up to the (count, window) pairs reported by the server."""
+        buckets = {bucket.window: bucket for bucket in self.buckets}
+        for count, window in counts:
+            bucket = buckets.get(window)
+            if bucket is not None:
+                bucket.sync(count, now)
+
+    def set_backoff(self, until: float) -> None:
+        """Block all requests until `until`."""
+        self.backoff_until = max(self.backoff_until, until)
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": [bucket.to_dict() for bucket in self.buckets],
+            "backoff_until": self.backoff_until,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LimiterState":
+        state = cls([], data.get("backoff_until", 0))
+        state.buckets = [TokenBucket.from_dict(bucket) for bucket in data["buckets"]]
+        return state
+
+
+# Applied to a limiter's state inside a store transaction
+StateUpdate = Callable[[LimiterState], Any]
+# Applied to several limiters' states, by name, inside one store transaction
+MultiStateUpdate = Callable[[dict[str, LimiterState]], Any]
+
+
+class MemoryRateLimitStore:
+    """Limiter state held in this process only."""
+
+    def __init__(self):
+        self._states: dict[str, LimiterState] = {}
+
+    async def transact(
+        self,
+        key: str,
+        default_limits: list[tuple[int, float]],
+        update: StateUpdate,
+    ) -> tuple[LimiterState, Any]:
+        """Apply `update` to a limiter's state atomically.
+
+        Args:
+            key: Limiter name
+            default_limits: Limits to start with if the limiter has no state yet
+            update: Function applied to the state
+
+        Returns:
+            (updated state, return value of `update`)
+        """
+        states, result = await self.transact_many({key: default_limits}, lambda s: update(s[key]))
+        return states[key], result
+
+    async def transact_many(
+        self,
+        default_limits: dict[str, list[tuple[int, float]]],
+        update: MultiStateUpdate,
+    ) -> tuple[dict[str, LimiterState], Any]:
+        """Apply `update` to several limiters' states in one atomic transaction.
+
+        Args:
+            default_limits: Limits to start with by limiter name, for each limiter
+            update: Function applied to the states by limiter name
+
+        Returns:
+            (updated states by limiter name, return value of `update`)
+        """
+        # Nothing awaits between read and write, so this is atomic in asyncio
+        states = {}
+        for key, limits in default_limits.items():
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = LimiterState(limits)
+            states[key] = state
+        return states, update(states)
+
+
+class FileRateLimitStore:
+    """Limiter state in a JSON file shared by every process on the host.
+
+    Each transaction holds an exclusive flock on a sidecar lock file while it
+    reads, updates and atomically rewrites the state file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _transact(
+        self,
+        default_limits: dict[str, list[tuple[int, float]]],
+        update: MultiStateUpdate,
+    ) -> tuple[dict[str, LimiterState], Any]:
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                data = {}
+
+            states = {
+                key: LimiterState.from_dict(data[key]) if key in data else LimiterState(limits)
+                for key, limits in default_limits.items()
+            }
+            result = update(states)
+            for key, state in states.items():
+                data[key] = state.to_dict()
+
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        return states, result
+
+    async def transact(
+        self,
+        key: str,
+        default_limits: list[tuple[int, float]],
+        update: StateUpdate,
+    ) -> tuple[LimiterState, Any]:
+        """Apply `update` to a limiter's state atomically (see MemoryRateLimitStore)."""
+        states, result = await self.transact_many({key: default_limits}, lambda s: update(s[key]))
+        return states[key], result
+
+    async def transact_many(
+        self,
+        default_limits: dict[str, list[tuple[int, float]]],
+        update: MultiStateUpdate,
+    ) -> tuple[dict[str, LimiterState], Any]:
+        """Apply `update` to several limiters' states atomically (see MemoryRateLimitStore)."""
+        return await asyncio.to_thread(self._transact, default_limits, update)
+
+
+def _to_datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=UTC)
+
+
+def _to_timestamp(value: datetime | None) -> float:
+    if value is None:
+        return 0
+    if value.tzinfo is None:  # SQLite drops the timezone
+        value = value.replace(tzinfo=UTC)
+    return value.timestamp()
+
+
+class DatabaseRateLimitStore:
+    """Limiter state in the rate_limit_tracker table, shared across hosts.
+
+    Each window is one row; a transaction locks the limiter's rows with
+    SELECT ... FOR UPDATE while it updates them.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession] = async_session_factory):
+        self._session_factory = session_factory
+
+    async def _lock_rows(self, session: AsyncSession, keys: list[str]) -> list[RateLimitTracker]:
+        # Always lock in the same order so concurrent transactions can't deadlock
+        result = await session.execute(
+            select(RateLimitTracker)
+            .where(RateLimitTracker.limiter.in_(keys))
+            .order_by(RateLimitTracker.limiter, RateLimitTracker.window_seconds)
+            .with_for_update()
+        )
+        return list(result.scalars())
+
+    async def _write_rows(self, session: AsyncSession, key: str, state: LimiterState) -> None:
+        for bucket in state.buckets:
+            values = {
+                "request_limit": bucket.limit,
+                "window_seconds": bucket.window,
+                "request_count": bucket.count,
+                "window_start": _to_datetime(bucket.window_start),
+                "backoff_until": _to_datetime(state.backoff_until),
+            }
+            stmt = dialect_insert(session, RateLimitTracker).values(
+                limiter=key, bucket=f"{key}:{bucket.window:g}", **values
+            )
+            await session.execute(
+                stmt.on_conflict_do_update(index_elements=[RateLimitTracker.bucket], set_=values)
+            )
+
+    async def transact(
+        self,
+        key: str,
+        default_limits: list[tuple[int, float]],
+        update: StateUpdate,
+    ) -> tuple[LimiterState, Any]:
+        """Apply `update` to a limiter's state atomically (see MemoryRateLimitStore)."""
+        states, result = await self.transact_many({key: default_limits}, lambda s: update(s[key]))
+        return states[key], result
+
+    async def transact_many(
+        self,
+        default_limits: dict[str, list[tuple[int, float]]],
+        update: MultiStateUpdate,
+    ) -> tuple[dict[str, LimiterState], Any]:
+        """Apply `update` to several limiters' states atomically (see MemoryRateLimitStore)."""
+        keys = sorted(default_limits)
+        async with self._session_factory() as session:
+            rows = await self._lock_rows(session, keys)
+            missing = {key for key in keys if default_limits[key]} - {row.limiter for row in rows}
+            if missing:
+                # Create the default windows so there are rows to lock
+                for key in sorted(missing):
+                    await self._write_rows(session, key, LimiterState(default_limits[key]))
+                rows = await self._lock_rows(session, keys)
+
+            states = {}
+            for key in keys:
+                key_rows = [row for row in rows if row.limiter == key]
+                state = LimiterState([], max((_to_timestamp(r.backoff_until) for r in key_rows), default=0))
+                state.buckets = [
+                    TokenBucket(
+                        row.request_limit,
+                        row.window_seconds,
+                        _to_timestamp(row.window_start),
+                        row.request_count,
+                    )
+                    for row in key_rows
+                ]
+                states[key] = state
+            result = update(states)
+
+            for key, state in states.items():
+                windows = {bucket.window for bucket in state.buckets}
+                for row in rows:
+                    if row.limiter == key and row.window_seconds not in windows:
+                        await session.delete(row)
+                await self._write_rows(session, key, state)
+            await session.commit()
+        return states, result
+
+
+RateLimitStore = MemoryRateLimitStore | FileRateLimitStore | DatabaseRateLimitStore
+
+
+def create_rate_limit_store(backend: str | None = None) -> RateLimitStore:
+    """Create the store selected by the RATE_LIMIT_BACKEND setting.
+
+    Args:
+        backend: "memory", "file" or "database" (defaults to the setting)
+    """
+    backend = backend or settings.RATE_LIMIT_BACKEND
+    if backend == "file":
+        return FileRateLimitStore(settings.RATE_LIMIT_STATE_PATH)
+    if backend == "database":
+        return DatabaseRateLimitStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown rate limit backend: {backend}")
+    return MemoryRateLimitStore()
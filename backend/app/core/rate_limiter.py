@@ -1,36 +1,244 @@
-"""Simple rate limiter - just adds small delays between requests."""
+"""Multi-window token bucket rate limiter for the Riot API."""
 
 import asyncio
 import time
+from typing import Any
+
+from app.config import get_settings
+from app.core.rate_limit_store import (
+    LimiterState,
+    MemoryRateLimitStore,
+    MultiStateUpdate,
+    RateLimitStore,
+    create_rate_limit_store,
+)
 
 
 class RateLimiter:
-    """Simple rate limiter that just adds a small delay between requests."""
+    """Rate limiter enforcing several token bucket windows at once.
+
+    A request is admitted when every bucket has a token. Callers reserve
+    their slot up front and then sleep until it arrives, so concurrent
+    requests are never serialized behind a lock and bursts up to each
+    window's capacity go through immediately.
+
+    Bucket state lives in a store that may be shared with other processes;
+    each limiter keeps a snapshot of the state from its last transaction.
+    """
+
+    def __init__(
+        self,
+        limits: list[tuple[int, float]] | None = None,
+        store: RateLimitStore | None = None,
+        name: str = "app",
+    ):
+        """Initialize the rate limiter.
+
+        Args:
+            limits: (max requests, window seconds) pairs. Defaults to the
+                RATE_LIMIT_PER_SECOND and RATE_LIMIT_PER_2MIN settings.
+            store: Where bucket state lives (defaults to this process's memory)
+            name: Key of this limiter's state in the store
+        """
+        if limits is None:
+            settings = get_settings()
+            limits = [
+                (settings.RATE_LIMIT_PER_SECOND, 1.0),
+                (settings.RATE_LIMIT_PER_2MIN, 120.0),
+            ]
+        self.name = name
+        self.store = store or MemoryRateLimitStore()
+        self._default_limits = limits
+        self._state = LimiterState(limits)
+
+    @property
+    def limits(self) -> list[tuple[int, float]]:
+        """Current (max requests, window seconds) pairs."""
+        return self._state.limits
+
+    async def _transact(self, update):
+        """Apply `update` to the stored state and refresh our snapshot."""
+        self._state, result = await self.store.transact(self.name, self._default_limits, update)
+        return result
+
+    async def update_from_server(
+        self,
+        limits: list[tuple[int, float]],
+        counts: list[tuple[int, float]],
+    ) -> None:
+        """Apply limits and window counts reported by the server.
+
+        Buckets whose window is unchanged keep their spent tokens, and
+        local counts are raised to the server's counts.
+
+        Args:
+            limits: (max requests, window seconds) pairs (empty to keep current)
+            counts: (requests made, window seconds) pairs
+        """
+        await self._transact(_server_update(limits, counts, time.time()))
+
+    async def update_limits(self, limits: list[tuple[int, float]]) -> None:
+        """Resize the buckets to match limits reported by the server."""
+        await self.update_from_server(limits, [])
 
-    def __init__(self):
-        self._last_request: float = 0
-        self._min_interval: float = 0.05  # 50ms between requests (20/sec)
-        self._lock = asyncio.Lock()
+    async def sync_counts(self, counts: list[tuple[int, float]]) -> None:
+        """Bring local window counts up to the counts reported by the server."""
+        await self.update_from_server([], counts)
 
-    def set_backoff(self, seconds: int) -> None:
-        """Called when we hit 429 - not used in simple implementation."""
-        pass
+    async def set_backoff(self, seconds: float) -> None:
+        """Block all requests for `seconds` (called when we hit a 429)."""
+        until = time.time() + seconds
+        await self._transact(lambda state: state.set_backoff(until))
+
+    async def refresh(self) -> None:
+        """Reload state from the store (picks up other processes' requests)."""
+        await self._transact(lambda state: None)
+
+    def get_wait_time(self) -> float:
+        """Seconds a request made now would have to wait, without reserving.
+
+        Based on the state as of this limiter's last store transaction.
+        """
+        now = time.time()
+        return self._state.next_slot(now) - now
 
     async def acquire(self) -> float:
-        """Add a small delay between requests to avoid bursting."""
-        async with self._lock:
-            now = time.monotonic()
-            elapsed = now - self._last_request
+        """Reserve a request slot and wait until it arrives.
+
+        If the caller is cancelled while waiting, the slot is refunded.
+
+        Returns:
+            Seconds spent waiting
+        """
+        now = time.time()
+        slot = await self._transact(lambda state: state.reserve(now))
+
+        # The reservation accounted for any backoff stored so far
+        wait_time = 0.0
+        try:
+            delay = slot - time.time()
+            while delay > 0:
+                await asyncio.sleep(delay)
+                wait_time += delay
+                # A 429, here or in another process, may have set a backoff meanwhile
+                backoff_until = await self._transact(lambda state: state.backoff_until)
+                delay = backoff_until - time.time()
+        except asyncio.CancelledError:
+            await self.release(slot)
+            raise
+
+        return wait_time
+
+    async def release(self, slot: float | None = None) -> None:
+        """Refund a token that was acquired but not used for a request.
+
+        Args:
+            slot: Time the token was reserved for (defaults to now, i.e. a
+                token acquired in the current window)
+        """
+        at = time.time() if slot is None else slot
+        await self._transact(lambda state: state.release(at))
+
+
+def _server_update(
+    limits: list[tuple[int, float]],
+    counts: list[tuple[int, float]],
+    now: float,
+):
+    """State update applying limits and window counts reported by the server."""
+
+    def update(state: LimiterState) -> None:
+        if limits and limits != state.limits:
+            state.update_limits(limits)
+        state.sync_counts(counts, now)
+
+    return update
+
+
+async def transact_limiters(limiters: list[RateLimiter], update: MultiStateUpdate) -> Any:
+    """Apply `update` to several limiters' states in one store transaction.
+
+    Args:
+        limiters: Limiters sharing one store
+        update: Function applied to their states by limiter name
+
+    Returns:
+        Return value of `update`
+    """
+    store = limiters[0].store
+    if any(limiter.store is not store for limiter in limiters):
+        raise ValueError("Limiters must share a store to be updated together")
+    states, result = await store.transact_many(
+        {limiter.name: limiter._default_limits for limiter in limiters}, update
+    )
+    for limiter in limiters:
+        limiter._state = states[limiter.name]
+    return result
+
+
+async def acquire_if_free(limiters: list[RateLimiter]) -> bool:
+    """Take a token from every limiter, but only if all of them have one free now.
+
+    Args:
+        limiters: Limiters sharing one store
+
+    Returns:
+        Whether the tokens were taken (nothing is taken otherwise)
+    """
+    now = time.time()
+
+    def update(states: dict[str, LimiterState]) -> bool:
+        if any(state.next_slot(now) > now for state in states.values()):
+            return False
+        for state in states.values():
+            state.reserve(now)
+        return True
+
+    return await transact_limiters(limiters, update)
+
+
+async def apply_server_limits(
+    updates: list[tuple[RateLimiter, list[tuple[int, float]], list[tuple[int, float]]]],
+) -> None:
+    """Apply server-reported limits and counts to several limiters in one transaction.
+
+    Args:
+        updates: (limiter, limits, counts) triples, as for RateLimiter.update_from_server
+    """
+    now = time.time()
+    server_updates = {limiter.name: _server_update(limits, counts, now) for limiter, limits, counts in updates}
+
+    def update(states: dict[str, LimiterState]) -> None:
+        for name, server_update in server_updates.items():
+            server_update(states[name])
+
+    await transact_limiters([limiter for limiter, _, _ in updates], update)
+
+
+def parse_rate_limit_header(value: str | None) -> list[tuple[int, float]]:
+    """Parse a Riot rate limit header such as "20:1,100:120".
+
+    Works for both the limit headers (max requests per window) and their
+    `-Count` counterparts (requests made per window).
+
+    Args:
+        value: Raw header value
 
-            if elapsed < self._min_interval:
-                wait_time = self._min_interval - elapsed
-                await asyncio.sleep(wait_time)
-            else:
-                wait_time = 0
+    Returns:
+        (number, window seconds) pairs, skipping malformed entries
+    """
+    if not value:
+        return []
 
-            self._last_request = time.monotonic()
-            return wait_time
+    pairs = []
+    for part in value.split(","):
+        number, _, window = part.strip().partition(":")
+        try:
+            pairs.append((int(number), float(window)))
+        except ValueError:
+            continue
+    return pairs
 
 
 # Global rate limiter instance
-rate_limiter = RateLimiter()
+rate_limiter = RateLimiter(store=create_rate_limit_store())
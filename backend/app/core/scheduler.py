@@ -0,0 +1,194 @@
+"""Priority-aware scheduling of Riot API requests.
+
+When rate limit tokens are scarce, requests wait in the scheduler instead
+of reserving tokens first-come first-served. Higher priority classes are
+admitted first, and within a class each originating analysis gets a turn
+in round-robin order, so a big lobby or a background crawl can't starve a
+user waiting on the page.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+
+from app.core.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class RequestPriority(IntEnum):
+    """Priority classes for Riot requests (lower value is served first)."""
+
+    INTERACTIVE = 0  # A user is waiting on the page
+    PREFETCH = 1  # Likely to be needed soon
+    BACKGROUND = 2  # Crawls and batch jobs
+
+
+# Priority and origin of the Riot requests made by the current task. Tasks
+# started with asyncio.gather/create_task inherit them.
+request_priority: ContextVar[RequestPriority] = ContextVar(
+    "request_priority", default=RequestPriority.INTERACTIVE
+)
+request_origin: ContextVar[str] = ContextVar("request_origin", default="")
+# time.monotonic() by which the current analysis must finish (None for no limit)
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+# Extra limiter capping the current task's share of the rate limit (None for no cap)
+request_budget: ContextVar[RateLimiter | None] = ContextVar("request_budget", default=None)
+
+
+@contextmanager
+def request_context(
+    priority: RequestPriority | None = None,
+    origin: str | None = None,
+    deadline: float | None = None,
+    budget: RateLimiter | None = None,
+):
+    """Set the priority, origin, deadline and/or budget for Riot requests made inside the block.
+
+    Args:
+        priority: Priority class for the requests
+        origin: Identifier of the analysis the requests belong to
+        deadline: time.monotonic() after which requests fail with DeadlineExceeded
+        budget: Limiter each request must also get a token from
+    """
+    tokens = []
+    if priority is not None:
+        tokens.append((request_priority, request_priority.set(priority)))
+    if origin is not None:
+        tokens.append((request_origin, request_origin.set(origin)))
+    if deadline is not None:
+        tokens.append((request_deadline, request_deadline.set(deadline)))
+    if budget is not None:
+        tokens.append((request_budget, request_budget.set(budget)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def time_remaining() -> float | None:
+    """Seconds left before the current request context's deadline (None for no limit)."""
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class RequestScheduler:
+    """Admits requests to a rate limiter in priority and fair-share order."""
+
+    def __init__(self, limiter: RateLimiter):
+        """Initialize the scheduler.
+
+        Args:
+            limiter: Rate limiter whose tokens are handed out
+        """
+        self._limiter = limiter
+        # Per priority: waiters grouped by origin, origins in round-robin order
+        self._queues: dict[RequestPriority, OrderedDict[str, deque[asyncio.Future]]] = {
+            priority: OrderedDict() for priority in RequestPriority
+        }
+        self._dispatcher: asyncio.Task | None = None
+
+    def queued(self) -> dict[str, int]:
+        """Number of waiting requests per priority class."""
+        return {
+            priority.name.lower(): sum(len(waiters) for waiters in origins.values())
+            for priority, origins in self._queues.items()
+        }
+
+    def _has_waiters(self) -> bool:
+        return any(self._queues.values())
+
+    def _pop_next(self) -> asyncio.Future | None:
+        """Take the next waiter: highest priority, then next origin in turn."""
+        for origins in self._queues.values():
+            while origins:
+                origin, waiters = next(iter(origins.items()))
+                future = waiters.popleft()
+                if waiters:
+                    origins.move_to_end(origin)
+                else:
+                    del origins[origin]
+                if not future.done():  # Skip waiters that were cancelled
+                    return future
+        return None
+
+    async def _dispatch(self) -> None:
+        """Hand out tokens to waiters as they become available."""
+        while self._has_waiters():
+            wait_time = self._limiter.get_wait_time()
+            if wait_time > 0:
+                # Re-check afterwards: a higher priority request may have arrived
+                await asyncio.sleep(wait_time)
+                continue
+
+            future = self._pop_next()
+            if future is None:
+                break
+            try:
+                await self._limiter.acquire()
+            except Exception as e:
+                # Fail this waiter, not the whole queue
+                logger.exception("Rate limiter failed to hand out a token")
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            # The waiter may have been cancelled meanwhile: pass its token on
+            while future is not None and future.done():
+                future = self._pop_next()
+            if future is None:
+                await self._limiter.release()
+            else:
+                future.set_result(None)
+
+    async def acquire(
+        self,
+        priority: RequestPriority | None = None,
+        origin: str | None = None,
+    ) -> float:
+        """Wait for this request's turn and its rate limit token.
+
+        Args:
+            priority: Priority class (defaults to the current request context)
+            origin: Originating analysis (defaults to the current request context)
+
+        Returns:
+            Seconds spent waiting
+        """
+        # Nobody is queued and tokens are free: go straight to the limiter
+        if not self._has_waiters() and self._limiter.get_wait_time() <= 0:
+            return await self._limiter.acquire()
+
+        priority = request_priority.get() if priority is None else priority
+        origin = request_origin.get() if origin is None else origin
+
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(origin, deque()).append(future)
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Cancelled just after being handed a token: give it back
+                await self._limiter.release()
+            else:
+                self._discard(priority, origin, future)
+            raise
+        return time.monotonic() - start
+
+    def _discard(self, priority: RequestPriority, origin: str, future: asyncio.Future) -> None:
+        """Remove a cancelled waiter from its queue."""
+        origins = self._queues[priority]
+        waiters = origins.get(origin)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del origins[origin]
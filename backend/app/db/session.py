@@ -1,13 +1,23 @@
 """Database session management."""
 
 from collections.abc import AsyncGenerator
+from pathlib import Path
 
+from alembic.command import stamp, upgrade
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import Connection, inspect
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.config import get_settings
 
 settings = get_settings()
 
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+# Schema of databases created before migrations were tracked
+BASELINE_REVISION = "0001"
+
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
@@ -30,3 +40,33 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         except Exception:
             await session.rollback()
             raise
+
+
+def upgrade_schema(connection: Connection) -> None:
+    """Apply any Alembic migrations the database is missing.
+
+    Databases created by `Base.metadata.create_all` before migrations were
+    tracked are stamped with the baseline revision first.
+    """
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["connection"] = connection
+    current = MigrationContext.configure(connection).get_current_revision()
+    if current is None and inspect(connection).has_table("summoners"):
+        stamp(config, BASELINE_REVISION)
+    upgrade(config, "head")
+
+
+async def init_db() -> None:
+    """Bring the database schema up to date."""
+    async with engine.begin() as conn:
+        await conn.run_sync(upgrade_schema)
+
+
+def dialect_insert(session: AsyncSession, model):
+    """Build an INSERT supporting ON CONFLICT for the session's database.
+
+    Postgres in production, SQLite in tests.
+    """
+    if session.bind.dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
@@ -0,0 +1,252 @@
+"""Calibrate the per-tier CS/min, KDA and vision benchmarks from stored matches.
+
+Streams every stored PlayerMatchStats row with its player's solo queue
+tier and feeds each metric into a KLL quantile sketch per tier, so memory
+stays a few KB per (tier, metric) however many rows there are and nothing
+is sorted in the database. The chosen quantile of each sketch becomes the
+tier's benchmark in a JSON file the detector loads at startup.
+
+Sketches can be saved instead of (or as well as) the benchmarks, and saved
+sketches from other shards or regions merged in, so a large calibration
+can be split up and combined without re-reading any rows.
+
+Run from backend/:
+    python -m app.jobs.calibrate [--output PATH] [--quantile Q]
+        [--sketches-out PATH] [--merge PATH ...] [--no-db]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from datetime import UTC, datetime
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.algorithms.quantiles import DEFAULT_K, KLLSketch
+from app.algorithms.thresholds import TIER_BENCHMARKS
+from app.config import get_settings
+from app.db.session import async_session_factory
+from app.models.database import PlayerMatchStats, Summoner
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+DEFAULT_CHUNK_SIZE = 50_000
+DEFAULT_QUANTILE = 0.5
+# Tiers with fewer games keep their built-in benchmarks
+DEFAULT_MIN_SAMPLES = 1000
+# Shorter games are remakes, whose per-minute stats are noise
+MIN_GAME_DURATION_SECONDS = 300
+
+# Benchmark metrics and the PlayerMatchStats columns they are sketched from
+METRICS = {
+    "cs": PlayerMatchStats.cs_per_min,
+    "kda": PlayerMatchStats.kda,
+    "vision": PlayerMatchStats.vision_score,
+}
+
+# Quantiles recorded alongside each benchmark, for inspection
+REPORTED_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+# Sketches per tier, then per metric
+TierSketches = dict[str, dict[str, KLLSketch]]
+
+
+def empty_sketches(k: int = DEFAULT_K) -> TierSketches:
+    """One empty sketch per tier and metric."""
+    return {tier: {metric: KLLSketch(k) for metric in METRICS} for tier in TIER_BENCHMARKS}
+
+
+async def sketch_match_stats(
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    queue_id: int | None = 420,
+    k: int = DEFAULT_K,
+) -> TierSketches:
+    """Sketch every stored match's metrics by the player's tier.
+
+    Players are bucketed by their current solo queue tier; unranked
+    players are skipped.
+
+    Args:
+        session_factory: Factory for database sessions
+        chunk_size: Rows read per query (keyset pagination on id)
+        queue_id: Queue to calibrate on (None for all queues)
+        k: Sketch accuracy parameter
+
+    Returns:
+        Sketches per tier and metric
+    """
+    sketches = empty_sketches(k)
+    last_id, rows_read = 0, 0
+    while True:
+        query = (
+            select(PlayerMatchStats.id, Summoner.solo_tier, *METRICS.values())
+            .join(Summoner, PlayerMatchStats.summoner_id == Summoner.id)
+            .where(PlayerMatchStats.id > last_id)
+            .where(Summoner.solo_tier.is_not(None))
+            .where(PlayerMatchStats.game_duration_seconds >= MIN_GAME_DURATION_SECONDS)
+            .order_by(PlayerMatchStats.id)
+            .limit(chunk_size)
+        )
+        if queue_id:
+            query = query.where(PlayerMatchStats.queue_id == queue_id)
+        async with session_factory() as session:
+            rows = (await session.execute(query)).all()
+        if not rows:
+            break
+
+        ids, tiers, *columns = zip(*rows)
+        tiers = np.array(tiers, dtype=object)
+        values = {metric: np.array(column, dtype=np.float64) for metric, column in zip(METRICS, columns)}
+        for tier in set(tiers.tolist()) & sketches.keys():
+            in_tier = tiers == tier
+            for metric, sketch in sketches[tier].items():
+                sketch.update(values[metric][in_tier])
+
+        last_id = int(ids[-1])
+        rows_read += len(rows)
+        logger.info(f"Sketched {rows_read} match rows")
+    return sketches
+
+
+def merge_sketches(into: TierSketches, other: TierSketches) -> TierSketches:
+    """Fold another set of sketches (e.g. another shard's) into `into`."""
+    for tier, metrics in other.items():
+        for metric, sketch in metrics.items():
+            into.setdefault(tier, {}).setdefault(metric, KLLSketch(sketch.k)).merge(sketch)
+    return into
+
+
+def save_sketches(path: str | Path, sketches: TierSketches) -> None:
+    """Write sketches to a JSON file for merging elsewhere."""
+    data = {
+        tier: {metric: sketch.to_dict() for metric, sketch in metrics.items()}
+        for tier, metrics in sketches.items()
+    }
+    Path(path).write_text(json.dumps(data))
+
+
+def load_sketches(path: str | Path) -> TierSketches:
+    """Read sketches written by `save_sketches`."""
+    data = json.loads(Path(path).read_text())
+    return {
+        tier: {metric: KLLSketch.from_dict(sketch) for metric, sketch in metrics.items()}
+        for tier, metrics in data.items()
+    }
+
+
+def benchmarks_from_sketches(
+    sketches: TierSketches,
+    quantile: float = DEFAULT_QUANTILE,
+    min_samples: int = DEFAULT_MIN_SAMPLES,
+) -> dict:
+    """Build the benchmarks file contents from sketches.
+
+    Args:
+        sketches: Sketches per tier and metric
+        quantile: Quantile used as each tier's benchmark
+        min_samples: Games a tier needs to be calibrated
+
+    Returns:
+        Benchmarks in the format read by load_tier_benchmarks
+    """
+    tiers, distributions = {}, {}
+    for tier, metrics in sketches.items():
+        games = max((sketch.count for sketch in metrics.values()), default=0)
+        if games < min_samples:
+            logger.info(f"Skipping {tier}: {games} games (need {min_samples})")
+            continue
+        tiers[tier] = {metric: round(sketch.quantile(quantile), 2) for metric, sketch in metrics.items()}
+        tiers[tier]["games"] = games
+        distributions[tier] = {
+            metric: {f"p{round(q * 100)}": round(sketch.quantile(q), 2) for q in REPORTED_QUANTILES}
+            for metric, sketch in metrics.items()
+        }
+
+    return {
+        "generated_at": datetime.now(UTC).isoformat(),
+        "quantile": quantile,
+        "tiers": tiers,
+        "distributions": distributions,
+    }
+
+
+async def calibrate(
+    output: str | Path,
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    queue_id: int | None = 420,
+    quantile: float = DEFAULT_QUANTILE,
+    min_samples: int = DEFAULT_MIN_SAMPLES,
+    merge: list[str | Path] | None = None,
+    sketches_out: str | Path | None = None,
+    read_db: bool = True,
+) -> dict:
+    """Sketch stored matches, merge in saved shards and write the benchmarks file.
+
+    Args:
+        output: Benchmarks file to write
+        session_factory: Factory for database sessions
+        chunk_size: Rows read per query
+        queue_id: Queue to calibrate on (None for all queues)
+        quantile: Quantile used as each tier's benchmark
+        min_samples: Games a tier needs to be calibrated
+        merge: Sketch files from other shards to merge in
+        sketches_out: Where to save the combined sketches, if anywhere
+        read_db: Sketch this database (False to only merge saved sketches)
+
+    Returns:
+        The benchmarks written
+    """
+    sketches = empty_sketches()
+    if read_db:
+        sketches = await sketch_match_stats(session_factory, chunk_size, queue_id)
+    for path in merge or []:
+        merge_sketches(sketches, load_sketches(path))
+        logger.info(f"Merged sketches from {path}")
+
+    if sketches_out:
+        save_sketches(sketches_out, sketches)
+
+    benchmarks = benchmarks_from_sketches(sketches, quantile, min_samples)
+    Path(output).write_text(json.dumps(benchmarks, indent=2))
+    logger.info(f"Wrote benchmarks for {len(benchmarks['tiers'])} tiers to {output}")
+    return benchmarks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Calibrate tier benchmarks from stored matches.")
+    parser.add_argument("--output", default=settings.TIER_BENCHMARKS_PATH, help="Benchmarks file to write")
+    parser.add_argument("--quantile", type=float, default=DEFAULT_QUANTILE)
+    parser.add_argument("--min-samples", type=int, default=DEFAULT_MIN_SAMPLES)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--queue", type=int, default=420, help="Queue to calibrate on (0 = all)")
+    parser.add_argument("--merge", nargs="*", default=[], help="Sketch files from other shards")
+    parser.add_argument("--sketches-out", help="Also save the combined sketches here")
+    parser.add_argument("--no-db", action="store_true", help="Only merge saved sketches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    benchmarks = asyncio.run(
+        calibrate(
+            args.output,
+            chunk_size=args.chunk_size,
+            queue_id=args.queue or None,
+            quantile=args.quantile,
+            min_samples=args.min_samples,
+            merge=args.merge,
+            sketches_out=args.sketches_out,
+            read_db=not args.no_db,
+        )
+    )
+    for tier, values in benchmarks["tiers"].items():
+        print(f"{tier:<12} cs {values['cs']:>5}  kda {values['kda']:>5}  vision {values['vision']:>5}  ({values['games']} games)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""Re-score stored analyses with the current scoring code.
+
+After tuning thresholds or weights, this shows (and applies) the effect on
+every analyzed player without calling the Riot API. Stored aggregates are
+streamed from smurf_analyses in chunks, scored with analyze_batch in a
+process pool and written back with bulk updates. Memory stays bounded by
+the number of chunks in flight, whatever the table size.
+
+After changing how aggregates are computed, --reaggregate first rebuilds
+each chunk's aggregates from the stored match stats: every analysis gets
+the newest of its player's matches that had ended when it was made, as
+many as it analyzed, aggregated for the whole chunk at once in a
+StatsBlock.
+
+Run from backend/:
+    python -m app.jobs.rescore [--chunk-size N] [--workers N] [--dry-run]
+        [--reaggregate] [--queue ID]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from collections import Counter
+from collections.abc import AsyncIterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import UTC, datetime
+
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.algorithms.smurf_detector import SmurfClassification, smurf_detector
+from app.db.session import async_session_factory
+from app.models.database import PlayerMatchStats, SmurfAnalysis, Summoner
+from app.services.analysis_repository import SCORING_CODE_HASH
+from app.services.stats_block import EMPTY_AGGREGATE, FIELDS, StatsBlock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 10_000
+# Queue the live analyses aggregate over
+DEFAULT_QUEUE_ID = 420
+
+# Indicator result fields and the SmurfAnalysis columns they are stored in
+INDICATOR_COLUMNS = {
+    "winrate": "winrate_score",
+    "account_age": "account_age_score",
+    "champion_pool": "champion_pool_score",
+    "cs_per_min": "cs_per_min_score",
+    "kda": "kda_score",
+    "game_frequency": "game_frequency_score",
+}
+
+# Aggregates scored, and the SmurfAnalysis columns they are stored in
+AGGREGATE_COLUMNS = {
+    "games_analyzed": "games_analyzed",
+    "winrate": "winrate",
+    "unique_champions": "unique_champions",
+    "avg_cs_per_min": "avg_cs_per_min",
+    "avg_kda": "avg_kda",
+    "games_per_day": "games_per_day",
+}
+
+
+def _epoch_ms(value: datetime) -> int:
+    if value.tzinfo is None:  # SQLite drops the timezone
+        value = value.replace(tzinfo=UTC)
+    return int(value.timestamp() * 1000)
+
+
+async def stream_analyses(
+    session_factory: async_sessionmaker[AsyncSession],
+    chunk_size: int,
+) -> AsyncIterator[dict[str, np.ndarray]]:
+    """Stream stored aggregates in id order, one columnar chunk at a time.
+
+    Uses keyset pagination, so each chunk is a cheap indexed range scan and
+    rows updated behind the cursor are not read again.
+
+    Args:
+        session_factory: Factory for database sessions
+        chunk_size: Rows per chunk
+
+    Yields:
+        Column arrays for up to `chunk_size` analyses
+    """
+    last_id = 0
+    while True:
+        async with session_factory() as session:
+            result = await session.execute(
+                select(
+                    SmurfAnalysis.id,
+                    SmurfAnalysis.classification,
+                    SmurfAnalysis.games_analyzed,
+                    SmurfAnalysis.winrate,
+                    SmurfAnalysis.unique_champions,
+                    SmurfAnalysis.avg_cs_per_min,
+                    SmurfAnalysis.avg_kda,
+                    SmurfAnalysis.games_per_day,
+                    # Rows stored before levels were recorded use the current level
+                    func.coalesce(SmurfAnalysis.summoner_level, Summoner.summoner_level),
+                    SmurfAnalysis.solo_tier,
+                    SmurfAnalysis.summoner_id,
+                    SmurfAnalysis.created_at,
+                )
+                .join(Summoner, SmurfAnalysis.summoner_id == Summoner.id)
+                .where(SmurfAnalysis.id > last_id)
+                .order_by(SmurfAnalysis.id)
+                .limit(chunk_size)
+            )
+            rows = result.all()
+        if not rows:
+            return
+
+        (
+            ids, classifications, games, winrate, unique, cs, kda, games_per_day, levels, tiers,
+            summoner_ids, created,
+        ) = zip(*rows)
+        yield {
+            "id": np.array(ids, dtype=np.int64),
+            "classification": np.array([c.value for c in classifications], dtype=object),
+            "games_analyzed": np.array(games, dtype=np.int64),
+            # Missing averages only occur without games, which score UNKNOWN anyway
+            "winrate": np.array(winrate, dtype=np.float64),
+            "unique_champions": np.array([u or 0 for u in unique], dtype=np.int64),
+            "avg_cs_per_min": np.array(cs, dtype=np.float64),
+            "avg_kda": np.array(kda, dtype=np.float64),
+            "games_per_day": np.array(games_per_day, dtype=np.float64),
+            "summoner_level": np.array(levels, dtype=np.int64),
+            "solo_tier": list(tiers),
+            "summoner_id": np.array(summoner_ids, dtype=np.int64),
+            "created_at": np.array([_epoch_ms(c) for c in created], dtype=np.int64),
+        }
+        last_id = int(ids[-1])
+
+
+async def reaggregate_chunk(
+    session_factory: async_sessionmaker[AsyncSession],
+    chunk: dict[str, np.ndarray],
+    queue_id: int | None = DEFAULT_QUEUE_ID,
+) -> dict[str, np.ndarray]:
+    """Rebuild a chunk's aggregates from the stored match stats.
+
+    Each analysis covers the newest of its player's matches that had ended
+    when it was made, up to the number it analyzed (fewer if some are no
+    longer stored).
+
+    Args:
+        session_factory: Factory for database sessions
+        chunk: Column arrays from `stream_analyses`
+        queue_id: Queue the analyses aggregated over (None for all queues)
+
+    Returns:
+        The chunk with its aggregate columns replaced
+    """
+    query = (
+        select(
+            PlayerMatchStats.summoner_id,
+            PlayerMatchStats.game_duration_seconds,
+            *[getattr(PlayerMatchStats, name) for name in FIELDS],
+        )
+        .where(PlayerMatchStats.summoner_id.in_(np.unique(chunk["summoner_id"]).tolist()))
+    )
+    if queue_id is not None:
+        query = query.where(PlayerMatchStats.queue_id == queue_id)
+    async with session_factory() as session:
+        rows = (await session.execute(query)).all()
+
+    names = ["summoner_id", "duration", *FIELDS]
+    dtypes = [np.dtype(np.int64), np.dtype(np.int64), *FIELDS.values()]
+    values = zip(*rows) if rows else [()] * len(names)
+    matches = {
+        name: np.array(column, dtype=dtype) for name, dtype, column in zip(names, dtypes, values, strict=True)
+    }
+    ended = matches["game_creation"] + matches["duration"] * 1000
+
+    # Sort matches by (player, end time) under one int64 key, so each
+    # analysis's window is found with a single searchsorted
+    players, player_of_match = np.unique(matches["summoner_id"], return_inverse=True)
+    created = chunk["created_at"]
+    earliest = min(ended.min(initial=created.min()), created.min())
+    span = max(ended.max(initial=created.max()), created.max()) - earliest + 1
+    keys = player_of_match * span + (ended - earliest)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+
+    player = np.searchsorted(players, chunk["summoner_id"])
+    first = np.searchsorted(keys, player * span, side="left")
+    end = np.searchsorted(keys, player * span + (created - earliest), side="right")
+    known = np.isin(chunk["summoner_id"], players)
+    games = np.where(known, np.minimum(chunk["games_analyzed"], end - first), 0)
+
+    # Each window newest first, as the analyses summed them
+    offsets = np.zeros(len(games) + 1, dtype=np.int64)
+    np.cumsum(games, out=offsets[1:])
+    position = np.arange(offsets[-1]) - np.repeat(offsets[:-1], games)
+    taken = order[np.repeat(end - 1, games) - position]
+    block = StatsBlock({name: matches[name][taken] for name in FIELDS}, offsets)
+
+    aggregates = block.aggregate_columns(rounded=True)
+    return {**chunk, **{name: aggregates[name] for name in AGGREGATE_COLUMNS}, "reaggregated": True}
+
+
+def score_chunk(chunk: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Score one chunk with the current code (runs in a worker process).
+
+    Args:
+        chunk: Column arrays from `stream_analyses`
+
+    Returns:
+        Row ids, old and new classification, and the new scores
+    """
+    aggregates = {name: np.nan_to_num(chunk[name]) for name in AGGREGATE_COLUMNS}
+    result = smurf_detector.analyze_batch(aggregates, chunk["summoner_level"], chunk["solo_tier"])
+    scored = {
+        "id": chunk["id"],
+        "old_classification": chunk["classification"],
+        "classification": np.array([c.value for c in result.classification], dtype=object),
+        "total_score": result.total_score,
+        "confidence": result.confidence,
+        "analyzed": result.analyzed,
+        **{name: scores for name, scores in result.indicator_scores.items()},
+    }
+    if chunk.get("reaggregated"):
+        scored["aggregates"] = aggregates
+    return scored
+
+
+async def write_scores(session_factory: async_sessionmaker[AsyncSession], scored: dict[str, np.ndarray]) -> None:
+    """Bulk-update a scored chunk and stamp it with the current scoring code hash.
+
+    Rebuilt aggregates are written too, with NULL averages for players left
+    without games.
+    """
+    analyzed = scored["analyzed"].tolist()
+    indicators = {name: scored[name].tolist() for name in INDICATOR_COLUMNS}
+    aggregates = {}
+    if "aggregates" in scored:
+        games = scored["aggregates"]["games_analyzed"]
+        for name, column in AGGREGATE_COLUMNS.items():
+            values = scored["aggregates"][name]
+            if EMPTY_AGGREGATE.get(name, 0) is None:
+                values = np.where(games > 0, values, None)
+            aggregates[column] = values.tolist()
+    rows = [
+        {
+            "id": row_id,
+            "scoring_hash": SCORING_CODE_HASH,
+            "total_score": total_score,
+            "classification": classification,
+            "confidence": confidence,
+            **{
+                column: indicators[name][i] if analyzed[i] else None
+                for name, column in INDICATOR_COLUMNS.items()
+            },
+            **{column: values[i] for column, values in aggregates.items()},
+        }
+        for i, (row_id, total_score, classification, confidence) in enumerate(
+            zip(
+                scored["id"].tolist(),
+                scored["total_score"].tolist(),
+                scored["classification"].tolist(),
+                scored["confidence"].tolist(),
+            )
+        )
+    ]
+    async with session_factory() as session:
+        await session.execute(update(SmurfAnalysis), rows)
+        await session.commit()
+
+
+async def rescore(
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int | None = None,
+    dry_run: bool = False,
+    reaggregate: bool = False,
+    queue_id: int | None = DEFAULT_QUEUE_ID,
+) -> Counter[tuple[str, str]]:
+    """Re-score every stored analysis.
+
+    Args:
+        session_factory: Factory for database sessions
+        chunk_size: Rows per chunk
+        workers: Scoring processes (defaults to the CPU count; 0 scores in this process)
+        dry_run: Only report the classification shifts, don't write
+        reaggregate: Rebuild the aggregates from the stored match stats first
+        queue_id: Queue the analyses aggregated over, for `reaggregate`
+
+    Returns:
+        Number of analyses per (old classification, new classification)
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    shifts: Counter[tuple[str, str]] = Counter()
+
+    async def finish(scored: dict[str, np.ndarray]) -> None:
+        shifts.update(zip(scored["old_classification"].tolist(), scored["classification"].tolist()))
+        if not dry_run:
+            await write_scores(session_factory, scored)
+        logger.info(f"Rescored {sum(shifts.values())} analyses")
+
+    pool: Executor | None = ProcessPoolExecutor(workers) if workers > 0 else None
+    try:
+        # Keep a couple of chunks per worker in flight to bound memory
+        pending: set[asyncio.Future] = set()
+        async for chunk in stream_analyses(session_factory, chunk_size):
+            if reaggregate:
+                chunk = await reaggregate_chunk(session_factory, chunk, queue_id)
+            if pool is None:
+                await finish(score_chunk(chunk))
+                continue
+            pending.add(loop.run_in_executor(pool, score_chunk, chunk))
+            if len(pending) >= workers * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    await finish(future.result())
+        for future in asyncio.as_completed(pending):
+            await finish(await future)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return shifts
+
+
+def format_shift_summary(shifts: Counter[tuple[str, str]]) -> str:
+    """Format a from/to table of classification counts."""
+    classes = [c.value for c in SmurfClassification]
+    total = sum(shifts.values())
+    moved = sum(count for (old, new), count in shifts.items() if old != new)
+
+    width = max(len(c) for c in classes) + 2
+    lines = [f"Rescored {total} analyses (scoring code {SCORING_CODE_HASH[:12]})", ""]
+    lines.append("from \\ to".ljust(width) + "".join(c.rjust(width) for c in classes))
+    for old in classes:
+        lines.append(old.ljust(width) + "".join(str(shifts.get((old, new), 0)).rjust(width) for new in classes))
+    lines.append("")
+    lines.append(f"Moved: {moved} ({moved / total * 100:.1f}%)" if total else "Moved: 0")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-score stored analyses with the current scoring code.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes (0 = no pool)")
+    parser.add_argument("--dry-run", action="store_true", help="Report shifts without writing")
+    parser.add_argument(
+        "--reaggregate", action="store_true", help="Rebuild aggregates from the stored match stats first"
+    )
+    parser.add_argument("--queue", type=int, default=DEFAULT_QUEUE_ID, help="Queue analyses aggregated over")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    shifts = asyncio.run(
+        rescore(
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            dry_run=args.dry_run,
+            reaggregate=args.reaggregate,
+            queue_id=args.queue,
+        )
+    )
+    print(format_shift_summary(shifts))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,17 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.api.v1 import analysis, match, summoner
 from app.config import get_settings
+from app.core.cache import response_cache
+from app.db.session import init_db
+from app.services.analysis_jobs import analysis_jobs
+from app.services.live_game_watcher import live_game_watcher
+from app.services.lobby_cache import lobby_cache
+from app.services.player_watcher import player_watcher
+from app.services.riot_api import riot_api
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +27,19 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     """Application lifespan handler for startup/shutdown."""
     # Startup
+    try:
+        await init_db()
+        await analysis_jobs.start()
+        await player_watcher.start()
+    except (SQLAlchemyError, OSError) as e:
+        # The API still works without a database, just without the match store,
+        # background jobs and watched players
+        logger.warning(f"Database unavailable, continuing without it: {e}")
     yield
     # Shutdown
+    await analysis_jobs.stop()
+    await player_watcher.stop()
+    response_cache.close()
 
 
 app = FastAPI(
@@ -61,3 +80,15 @@ app.include_router(analysis.router, prefix="/api/v1/analysis", tags=["analysis"]
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Cache and Riot API usage counters."""
+    return {
+        "riot_cache": response_cache.stats(),
+        "riot_api": riot_api.stats(),
+        "lobby_cache": lobby_cache.stats(),
+        "live_game_watcher": live_game_watcher.stats(),
+        "player_watcher": player_watcher.stats(),
+    }
@@ -3,6 +3,7 @@
 from enum import Enum as PyEnum
 
 from sqlalchemy import (
+    JSON,
     BigInteger,
     Column,
     DateTime,
@@ -32,6 +33,15 @@ class SmurfClassification(str, PyEnum):
     UNKNOWN = "UNKNOWN"
 
 
+class JobStatus(str, PyEnum):
+    """Background analysis job states."""
+
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETE = "COMPLETE"
+    FAILED = "FAILED"
+
+
 class Summoner(Base):
     """Cached summoner data from Riot API."""
 
@@ -39,9 +49,10 @@ class Summoner(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     puuid = Column(String(78), unique=True, nullable=False, index=True)
-    summoner_id = Column(String(63), unique=True, nullable=False)
-    riot_id_name = Column(String(96), nullable=False)
-    riot_id_tag = Column(String(5), nullable=False)
+    # Encrypted summoner ID is deprecated and may be missing from Riot responses
+    summoner_id = Column(String(63), unique=True)
+    riot_id_name = Column(String(96), nullable=False, default="")
+    riot_id_tag = Column(String(5), nullable=False, default="")
     summoner_level = Column(Integer, nullable=False)
     profile_icon_id = Column(Integer, nullable=False)
 
@@ -65,6 +76,8 @@ class Summoner(Base):
 
     # Relationships
     match_stats = relationship("PlayerMatchStats", back_populates="summoner")
+    sync_cursors = relationship("MatchSyncCursor", back_populates="summoner")
+    indicator_states = relationship("SummonerIndicatorState", back_populates="summoner")
     analyses = relationship("SmurfAnalysis", back_populates="summoner")
 
     __table_args__ = (
@@ -114,6 +127,67 @@ class PlayerMatchStats(Base):
     )
 
 
+class MatchSyncCursor(Base):
+    """Newest match synced for a summoner, per queue filter."""
+
+    __tablename__ = "match_sync_cursors"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    summoner_id = Column(Integer, ForeignKey("summoners.id"), nullable=False)
+    queue_id = Column(Integer, nullable=False)  # 0 = all queues
+    newest_game_creation = Column(BigInteger, nullable=False)  # Epoch ms
+
+    # Timestamps
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    summoner = relationship("Summoner", back_populates="sync_cursors")
+
+    __table_args__ = (
+        Index("ix_match_sync_cursors_summoner_queue", "summoner_id", "queue_id", unique=True),
+    )
+
+
+class SummonerIndicatorState(Base):
+    """Running totals over a summoner's newest matches, per queue filter.
+
+    See app.services.indicator_state.IndicatorState.
+    """
+
+    __tablename__ = "indicator_states"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    summoner_id = Column(Integer, ForeignKey("summoners.id"), nullable=False)
+    queue_id = Column(Integer, nullable=False)  # 0 = all queues
+    window = Column(Integer, nullable=False)  # Max matches covered
+
+    # Totals over the covered matches (kda/cs/gold in hundredths)
+    games = Column(Integer, nullable=False)
+    wins = Column(Integer, nullable=False)
+    kills = Column(Integer, nullable=False)
+    deaths = Column(Integer, nullable=False)
+    assists = Column(Integer, nullable=False)
+    kda_total = Column(BigInteger, nullable=False)
+    cs_total = Column(BigInteger, nullable=False)
+    gold_total = Column(BigInteger, nullable=False)
+    champion_counts = Column(JSON, nullable=False)  # {champion ID: games}
+    first_game_creation = Column(BigInteger)  # Epoch ms
+    last_game_creation = Column(BigInteger)
+
+    # Per-match contributions, newest first, to drop matches leaving the window
+    matches = Column(JSON, nullable=False)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    summoner = relationship("Summoner", back_populates="indicator_states")
+
+    __table_args__ = (
+        Index("ix_indicator_states_summoner_queue", "summoner_id", "queue_id", unique=True),
+    )
+
+
 class SmurfAnalysis(Base):
     """Smurf analysis results for a summoner."""
 
@@ -122,9 +196,20 @@ class SmurfAnalysis(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     summoner_id = Column(Integer, ForeignKey("summoners.id"), nullable=False)
 
+    # Hash of the analysis inputs and of the scoring code that produced the
+    # scores (see app.services.analysis_repository)
+    fingerprint = Column(String(64), nullable=False)
+    scoring_hash = Column(String(64), nullable=False)
+
+    # Account state the result was scored with
+    summoner_level = Column(Integer)
+    solo_tier = Column(String(20))
+    solo_rank = Column(String(5))
+
     # Overall result
     total_score = Column(Float, nullable=False)
     classification = Column(Enum(SmurfClassification), nullable=False)
+    confidence = Column(String(10), nullable=False)
     games_analyzed = Column(Integer, nullable=False)
 
     # Individual indicator scores (0-100)
@@ -151,19 +236,84 @@ class SmurfAnalysis(Base):
 
     __table_args__ = (
         Index("ix_smurf_analyses_summoner_created", "summoner_id", "created_at"),
+        Index("ix_smurf_analyses_summoner_fingerprint", "summoner_id", "fingerprint", unique=True),
     )
 
 
+class AnalysisJob(Base):
+    """Analysis run in the background (see app.services.analysis_jobs)."""
+
+    __tablename__ = "analysis_jobs"
+
+    id = Column(String(32), primary_key=True)  # UUID hex
+    kind = Column(String(10), nullable=False)  # 'PLAYER' or 'MATCH'
+    puuid = Column(String(78), nullable=False)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+
+    # Progress of match jobs (players finished / players in the lobby)
+    players_done = Column(Integer)
+    players_total = Column(Integer)
+
+    # Response of the analysis endpoint, or why it failed
+    result = Column(JSON)
+    error = Column(String(500))
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_analysis_jobs_status", "status"),
+        Index("ix_analysis_jobs_kind_puuid", "kind", "puuid"),
+    )
+
+
+class WatchedPlayer(Base):
+    """Player checked for live games in the background (see app.services.player_watcher)."""
+
+    __tablename__ = "watched_players"
+
+    puuid = Column(String(78), primary_key=True)
+    label = Column(String(100))  # Why they're watched, e.g. 'streamer'
+
+    # Game they are in, if any, and when they were last seen starting one
+    game_id = Column(BigInteger)
+    last_game_at = Column(DateTime(timezone=True))
+    # Games seen starting in each UTC hour of the day (24 counts)
+    hour_counts = Column(JSON)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ServiceLease(Base):
+    """Lease on a background service only one process may run at a time."""
+
+    __tablename__ = "service_leases"
+
+    name = Column(String(80), primary_key=True)  # e.g. 'player_watcher'
+    holder = Column(String(64), nullable=False)  # Random ID of the holding process
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
 class RateLimitTracker(Base):
-    """Track API rate limit usage."""
+    """Shared rate limit window state (one row per limiter window)."""
 
     __tablename__ = "rate_limit_tracker"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    bucket = Column(String(20), nullable=False)  # 'second' or '2min'
+    limiter = Column(String(80), nullable=False)  # 'app' or a Riot method name
+    bucket = Column(String(100), nullable=False)  # '<limiter>:<window seconds>'
+    request_limit = Column(Integer, nullable=False)
+    window_seconds = Column(Float, nullable=False)
     request_count = Column(Integer, nullable=False, default=0)
     window_start = Column(DateTime(timezone=True), nullable=False)
+    backoff_until = Column(DateTime(timezone=True))
 
     __table_args__ = (
         Index("ix_rate_limit_bucket", "bucket", unique=True),
+        Index("ix_rate_limit_limiter", "limiter"),
     )
@@ -26,6 +26,15 @@ class Position(str, Enum):
     UNKNOWN = "UNKNOWN"
 
 
+class AnalysisStatus(str, Enum):
+    """How far a player's analysis got."""
+
+    COMPLETE = "COMPLETE"
+    PARTIAL = "PARTIAL"  # Analyzed without some listed matches
+    TIMED_OUT = "TIMED_OUT"  # Not finished by the deadline
+    FAILED = "FAILED"
+
+
 class IndicatorScores(BaseModel):
     """Individual indicator scores (0-100)."""
 
@@ -72,6 +81,8 @@ class SmurfAnalysisResponse(BaseModel):
     # Timestamps
     analyzed_at: datetime
 
+    status: AnalysisStatus = AnalysisStatus.COMPLETE
+
     class Config:
         from_attributes = True
 
@@ -82,6 +93,12 @@ class MatchAnalysisRequest(BaseModel):
     puuid: str
 
 
+class PlayerBatchRequest(BaseModel):
+    """Request to analyze a list of players."""
+
+    puuids: list[str] = Field(min_length=1, max_length=500)
+
+
 class HiddenPlayer(BaseModel):
     """Player with privacy settings enabled (streamer mode)."""
 
@@ -91,6 +108,36 @@ class HiddenPlayer(BaseModel):
     is_hidden: bool = True  # Always true, used to distinguish from analyzed players
 
 
+class LobbyPlayer(BaseModel):
+    """Visible player in a live match, before analysis."""
+
+    puuid: str
+    riot_id_name: str
+    riot_id_tag: str
+    champion_id: int | None = None
+    position: Position = Position.UNKNOWN
+    team_id: int  # 100 for blue, 200 for red
+
+
+class LobbySkeleton(BaseModel):
+    """Who is in a live match, sent before any player is analyzed."""
+
+    game_id: int
+    game_mode: str
+    game_start_time: int = 0  # Epoch ms (0 while the game is loading)
+    blue_team: list[LobbyPlayer]
+    red_team: list[LobbyPlayer]
+    hidden_players: list[HiddenPlayer] = []
+
+
+class PlayerAnalysisError(BaseModel):
+    """A player in a streamed match analysis that could not be analyzed."""
+
+    puuid: str
+    detail: str
+    status: AnalysisStatus = AnalysisStatus.FAILED
+
+
 class MatchAnalysisResponse(BaseModel):
     """Analysis results for all players in a match."""
 
@@ -99,3 +146,43 @@ class MatchAnalysisResponse(BaseModel):
     blue_team: list[SmurfAnalysisResponse]
     red_team: list[SmurfAnalysisResponse]
     hidden_players: list[HiddenPlayer] = []  # Players with streamer mode enabled
+    # Every visible player's status, by PUUID (players that didn't finish
+    # are missing from the teams)
+    player_statuses: dict[str, AnalysisStatus] = {}
+
+
+class JobKind(str, Enum):
+    """What a background analysis job analyzes."""
+
+    PLAYER = "PLAYER"  # One player, as POST /player
+    MATCH = "MATCH"  # A player's live match, as POST /match
+
+
+class JobStatus(str, Enum):
+    """Background analysis job states."""
+
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETE = "COMPLETE"
+    FAILED = "FAILED"
+
+
+class AnalysisJobResponse(BaseModel):
+    """State of a background analysis job."""
+
+    id: str
+    kind: JobKind
+    puuid: str
+    status: JobStatus
+    # Match jobs: players finished and players in the lobby, once known
+    players_done: int | None = None
+    players_total: int | None = None
+    # Set once COMPLETE: the response of the matching analysis endpoint
+    result: MatchAnalysisResponse | SmurfAnalysisResponse | None = None
+    error: str | None = None  # Set once FAILED
+    created_at: datetime | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,7 @@
 """Pydantic schemas for match data."""
 
+from datetime import datetime
+
 from pydantic import BaseModel, Field
 
 
@@ -98,3 +100,16 @@ class MatchResponse(BaseModel):
 
     class Config:
         populate_by_name = True
+
+
+class WatchedPlayerResponse(BaseModel):
+    """A player checked for live games in the background."""
+
+    puuid: str
+    label: str | None = None
+    game_id: int | None = None  # Live game they are in, if any
+    last_game_at: datetime | None = None  # When they were last seen starting a game
+    created_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,243 @@
+"""Background analysis jobs.
+
+Deep or lobby-wide analyses can outlast a proxy's request timeout. A job
+is submitted and answered with its ID right away, then run by a small
+pool of in-process workers; clients poll its row in analysis_jobs for
+progress and the result. Rows are claimed with a conditional update, so
+several processes can share the table. A running job's row is touched
+periodically; jobs left queued, or running with no sign of life (orphaned
+by a crash), are picked up again at startup and then periodically.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import get_settings
+from app.db.session import async_session_factory
+from app.models.database import AnalysisJob, JobStatus
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Reports (players finished, players in total) of a running job
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+# Runs a job's analysis for a PUUID and returns the endpoint response
+JobRunner = Callable[[str, ProgressCallback], Awaitable[BaseModel]]
+
+
+class AnalysisJobQueue:
+    """Runs submitted analyses on a capped pool of workers."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+        workers: int = settings.ANALYSIS_JOB_WORKERS,
+        stale_after: float = settings.ANALYSIS_JOB_STALE_SECONDS,
+    ):
+        """Initialize the queue.
+
+        Args:
+            session_factory: Factory for database sessions
+            workers: Max jobs running at once in this process
+            stale_after: Seconds without an update after which a job is
+                presumed orphaned and re-run
+        """
+        self._session_factory = session_factory
+        self._worker_count = workers
+        self._stale_after = stale_after
+        self._runners: dict[str, JobRunner] = {}
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._reaper: asyncio.Task | None = None
+
+    def register(self, kind: str, runner: JobRunner) -> None:
+        """Set the analysis run for jobs of a kind."""
+        self._runners[kind] = runner
+
+    async def start(self) -> None:
+        """Start the workers and queue jobs left over from earlier runs."""
+        await self._requeue(AnalysisJob.status == JobStatus.QUEUED)
+        self._ensure_workers()
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.ensure_future(self._reap())
+
+    async def stop(self) -> None:
+        """Stop the workers (running jobs stay RUNNING until re-run)."""
+        tasks = [*self._workers, *([self._reaper] if self._reaper is not None else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._reaper = None
+
+    async def _requeue(self, condition: ColumnElement[bool] | None = None) -> None:
+        """Queue stale jobs, and jobs matching `condition`, in this process.
+
+        Requeued rows are touched so other processes leave them be; if
+        another process queued a job too, only one of them wins its claim.
+        """
+        stale = datetime.now(UTC) - timedelta(seconds=self._stale_after)
+        is_stale = AnalysisJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]) & (
+            AnalysisJob.updated_at < stale
+        )
+        async with self._session_factory() as session:
+            result = await session.execute(
+                update(AnalysisJob)
+                .where(is_stale if condition is None else or_(is_stale, condition))
+                .values(status=JobStatus.QUEUED, updated_at=datetime.now(UTC))
+                .returning(AnalysisJob.id, AnalysisJob.created_at)
+            )
+            jobs = sorted(result.all(), key=lambda job: job.created_at)
+            await session.commit()
+        for job_id, _ in jobs:
+            self._queue.put_nowait(job_id)
+        if jobs:
+            logger.info(f"Resuming {len(jobs)} analysis jobs")
+            self._ensure_workers()
+
+    async def _reap(self) -> None:
+        """Periodically re-queue jobs orphaned by other processes."""
+        while True:
+            await asyncio.sleep(self._stale_after / 2)
+            try:
+                await self._requeue()
+            except SQLAlchemyError:
+                logger.exception("Failed to re-queue stale analysis jobs")
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Touch a running job's row so it isn't taken for orphaned."""
+        while True:
+            await asyncio.sleep(self._stale_after / 4)
+            try:
+                await self._update(job_id, updated_at=datetime.now(UTC))
+            except SQLAlchemyError:
+                logger.exception(f"Failed to touch analysis job {job_id}")
+
+    def _ensure_workers(self) -> None:
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self._worker_count:
+            self._workers.append(asyncio.ensure_future(self._work()))
+
+    async def submit(self, kind: str, puuid: str) -> AnalysisJob:
+        """Queue an analysis.
+
+        A job of the same kind for the same player that hasn't finished yet
+        is returned instead of queueing another.
+
+        Args:
+            kind: Job kind (see `register`)
+            puuid: Player to analyze
+
+        Returns:
+            The queued (or already pending) job
+
+        Raises:
+            ValueError: If no runner is registered for `kind`
+        """
+        if kind not in self._runners:
+            raise ValueError(f"Unknown analysis job kind: {kind}")
+
+        async with self._session_factory() as session:
+            result = await session.execute(
+                select(AnalysisJob)
+                .where(AnalysisJob.kind == kind)
+                .where(AnalysisJob.puuid == puuid)
+                .where(AnalysisJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+            )
+            job = result.scalars().first()
+            if job is not None:
+                return job
+
+            job = AnalysisJob(id=uuid.uuid4().hex, kind=kind, puuid=puuid, status=JobStatus.QUEUED)
+            session.add(job)
+            await session.commit()
+            await session.refresh(job)
+
+        self._queue.put_nowait(job.id)
+        self._ensure_workers()
+        return job
+
+    async def get(self, job_id: str) -> AnalysisJob | None:
+        """Get a job by ID."""
+        async with self._session_factory() as session:
+            return await session.get(AnalysisJob, job_id)
+
+    async def _update(self, job_id: str, **values) -> int:
+        """Update a job's columns; returns the number of rows changed."""
+        async with self._session_factory() as session:
+            result = await session.execute(
+                update(AnalysisJob).where(AnalysisJob.id == job_id).values(**values)
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def _work(self) -> None:
+        """Run queued jobs one at a time."""
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception(f"Analysis job {job_id} could not be run")
+
+    async def _run(self, job_id: str) -> None:
+        """Claim a queued job, run its analysis and store the outcome."""
+        # Only one worker (in any process) wins the claim. Touch the row
+        # explicitly, as the database's clock may only have whole seconds
+        now = datetime.now(UTC)
+        async with self._session_factory() as session:
+            result = await session.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id)
+                .where(AnalysisJob.status == JobStatus.QUEUED)
+                .values(status=JobStatus.RUNNING, started_at=now, updated_at=now)
+                .returning(AnalysisJob.kind, AnalysisJob.puuid)
+            )
+            claimed = result.one_or_none()
+            await session.commit()
+        if claimed is None:
+            return
+        kind, puuid = claimed
+
+        async def progress(done: int, total: int) -> None:
+            await self._update(job_id, players_done=done, players_total=total)
+
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id))
+        try:
+            response = await self._runners[kind](puuid, progress)
+        except HTTPException as e:
+            logger.warning(f"Analysis job {job_id} ({kind} {puuid}) failed: {e.detail}")
+            await self._fail(job_id, str(e.detail))
+            return
+        except Exception as e:
+            logger.exception(f"Analysis job {job_id} ({kind} {puuid}) crashed")
+            await self._fail(job_id, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+
+        await self._update(
+            job_id,
+            status=JobStatus.COMPLETE,
+            result=response.model_dump(mode="json"),
+            finished_at=datetime.now(UTC),
+        )
+
+    async def _fail(self, job_id: str, error: str) -> None:
+        """Mark a job failed with the reason."""
+        await self._update(
+            job_id, status=JobStatus.FAILED, error=error[:500], finished_at=datetime.now(UTC)
+        )
+
+
+# Global job queue instance
+analysis_jobs = AnalysisJobQueue()
@@ -0,0 +1,177 @@
+"""Database-backed memo of smurf analysis results.
+
+An analysis depends only on the player's recent matches, account level and
+rank, and the scoring code. Each stored result carries a fingerprint of
+its inputs and a hash of the code that scored it, so a repeat analysis
+with nothing new is served from the smurf_analyses table instead of being
+recomputed.
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.algorithms import smurf_detector, thresholds
+from app.algorithms.smurf_detector import SmurfAnalysisResult
+from app.db.session import async_session_factory, dialect_insert
+from app.models.database import SmurfAnalysis, Summoner
+from app.schemas.summoner import SummonerData
+from app.services.match_repository import MatchRepository, match_repository
+
+logger = logging.getLogger(__name__)
+
+
+def _hash_scoring_code() -> str:
+    """Hash the thresholds and scoring modules' source and the tier benchmarks.
+
+    Any edit to either module or a recalibration changes the hash, so
+    results scored by the old code are no longer served (until rescored,
+    see app.jobs.rescore).
+    """
+    digest = hashlib.sha256()
+    for module in (thresholds, smurf_detector):
+        digest.update(Path(module.__file__).read_bytes())
+    digest.update(json.dumps(smurf_detector.smurf_detector.benchmarks, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+SCORING_CODE_HASH = _hash_scoring_code()
+
+
+def analysis_fingerprint(
+    newest_match_id: str,
+    summoner_level: int,
+    tier: str | None,
+    rank: str | None,
+    match_count: int,
+    queue_id: int | None,
+) -> str:
+    """Fingerprint the inputs of an analysis.
+
+    Args:
+        newest_match_id: Newest match in the analyzed history ("" if none)
+        summoner_level: Account level
+        tier: Solo queue tier
+        rank: Solo queue rank within the tier
+        match_count: Number of matches analyzed
+        queue_id: Queue the matches were taken from
+
+    Returns:
+        Hex digest identifying the inputs
+    """
+    key = "|".join(
+        str(part)
+        for part in (
+            newest_match_id,
+            summoner_level,
+            tier or "",
+            rank or "",
+            match_count,
+            queue_id or 0,
+        )
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class AnalysisRepository:
+    """Reads and writes memoized analysis results."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+        match_repository: MatchRepository = match_repository,
+    ):
+        """Initialize the repository.
+
+        Args:
+            session_factory: Factory for database sessions
+            match_repository: Used to upsert the summoner rows results belong to
+        """
+        self._session_factory = session_factory
+        self._match_repository = match_repository
+
+    async def get_analysis(self, puuid: str, fingerprint: str) -> SmurfAnalysis | None:
+        """Get a stored result computed from the same inputs by the current code.
+
+        Args:
+            puuid: Player PUUID
+            fingerprint: From `analysis_fingerprint`
+
+        Returns:
+            The stored analysis, or None
+        """
+        async with self._session_factory() as session:
+            result = await session.execute(
+                select(SmurfAnalysis)
+                .join(Summoner, SmurfAnalysis.summoner_id == Summoner.id)
+                .where(Summoner.puuid == puuid)
+                .where(SmurfAnalysis.fingerprint == fingerprint)
+                .where(SmurfAnalysis.scoring_hash == SCORING_CODE_HASH)
+            )
+            return result.scalar_one_or_none()
+
+    async def save_analysis(
+        self,
+        summoner: SummonerData,
+        fingerprint: str,
+        result: SmurfAnalysisResult,
+        aggregate_stats: dict,
+        tier: str | None,
+        rank: str | None,
+    ) -> None:
+        """Store a freshly computed result.
+
+        Args:
+            summoner: Summoner that was analyzed
+            fingerprint: From `analysis_fingerprint`
+            result: Detector output
+            aggregate_stats: Aggregated match stats the result was scored from
+            tier: Solo queue tier the result was scored with
+            rank: Solo queue rank the result was scored with
+        """
+        scores = result.indicator_scores
+        async with self._session_factory() as session:
+            # Also records the player's tier for calibration
+            summoner_id = await self._match_repository.upsert_summoner(
+                session, summoner, solo_rank=(tier, rank)
+            )
+            values = {
+                "scoring_hash": SCORING_CODE_HASH,
+                "summoner_level": summoner.summoner_level,
+                "solo_tier": tier,
+                "solo_rank": rank,
+                "total_score": result.total_score,
+                "classification": result.classification.value,
+                "confidence": result.confidence,
+                "games_analyzed": result.games_analyzed,
+                "winrate_score": scores.winrate,
+                "account_age_score": scores.account_age,
+                "champion_pool_score": scores.champion_pool,
+                "cs_per_min_score": scores.cs_per_min,
+                "kda_score": scores.kda,
+                "game_frequency_score": scores.game_frequency,
+                "winrate": aggregate_stats.get("winrate"),
+                "avg_cs_per_min": aggregate_stats.get("avg_cs_per_min"),
+                "avg_kda": aggregate_stats.get("avg_kda"),
+                "unique_champions": aggregate_stats.get("unique_champions"),
+                "games_per_day": aggregate_stats.get("games_per_day"),
+            }
+            stmt = dialect_insert(session, SmurfAnalysis).values(
+                summoner_id=summoner_id, fingerprint=fingerprint, **values
+            )
+            # Same inputs scored by older code: replace the stale scores
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[SmurfAnalysis.summoner_id, SmurfAnalysis.fingerprint],
+                    set_={**values, "updated_at": func.now()},
+                )
+            )
+            await session.commit()
+
+
+# Global repository instance
+analysis_repository = AnalysisRepository()
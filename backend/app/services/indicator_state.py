@@ -0,0 +1,296 @@
+"""Running indicator totals over each summoner's newest matches.
+
+An analysis aggregates a player's newest few matches. Instead of reloading
+and re-aggregating them every time, an IndicatorState keeps the counts,
+sums, champion counts and first/last timestamps of those matches, stored
+next to the summoner. Each new match is added and the match it pushes out
+of the window is subtracted, so catching up after a sync costs one O(1)
+update per new match, and a re-score with no new matches reads no stats at
+all.
+
+KDA, CS/min and gold/min are stored rounded to hundredths, so their totals
+are kept as integer hundredths and never drift however many updates are
+applied.
+"""
+
+import logging
+from fractions import Fraction
+from itertools import takewhile
+from typing import NamedTuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.session import async_session_factory, dialect_insert
+from app.models.database import Summoner, SummonerIndicatorState
+from app.schemas.summoner import SummonerData
+from app.services.match_repository import MatchRepository, match_repository
+from app.services.stats_block import EMPTY_AGGREGATE, MS_PER_DAY
+
+logger = logging.getLogger(__name__)
+
+
+class MatchContribution(NamedTuple):
+    """What one match adds to the totals (kda/cs/gold in hundredths)."""
+
+    match_id: str
+    game_creation: int
+    champion_id: int
+    win: int
+    kills: int
+    deaths: int
+    assists: int
+    kda: int
+    cs: int
+    gold: int
+
+    @classmethod
+    def from_stats(cls, stats: dict) -> "MatchContribution":
+        """Build from a stats dict of MatchService.extract_player_stats."""
+        return cls(
+            match_id=stats["match_id"],
+            game_creation=stats["game_creation"],
+            champion_id=stats["champion_id"],
+            win=stats["win"],
+            kills=stats["kills"],
+            deaths=stats["deaths"],
+            assists=stats["assists"],
+            kda=round(stats["kda"] * 100),
+            cs=round(stats["cs_per_min"] * 100),
+            gold=round(stats["gold_per_min"] * 100),
+        )
+
+
+def _average(hundredths: int, games: int) -> float:
+    """Average of values totalling `hundredths`, rounded to 2 decimals (half to even)."""
+    return round(Fraction(hundredths, games)) / 100
+
+
+class IndicatorState:
+    """Running totals over a player's newest `window` matches."""
+
+    def __init__(self, window: int, queue_id: int | None = None):
+        """Create an empty state.
+
+        Args:
+            window: Max number of newest matches covered
+            queue_id: Queue filter of the covered matches (None for all queues)
+        """
+        self.window = window
+        self.queue_id = queue_id
+        self.games = 0
+        self.wins = 0
+        self.kills = 0
+        self.deaths = 0
+        self.assists = 0
+        self.kda_total = 0
+        self.cs_total = 0
+        self.gold_total = 0
+        self.champion_counts: dict[int, int] = {}
+        # Covered matches, newest first
+        self.matches: list[MatchContribution] = []
+
+    @property
+    def match_ids(self) -> list[str]:
+        """Covered match IDs, newest first."""
+        return [m.match_id for m in self.matches]
+
+    @property
+    def first_game_creation(self) -> int | None:
+        return self.matches[-1].game_creation if self.matches else None
+
+    @property
+    def last_game_creation(self) -> int | None:
+        return self.matches[0].game_creation if self.matches else None
+
+    def _apply(self, match: MatchContribution, sign: int) -> None:
+        """Add (sign 1) or subtract (sign -1) a match's contribution."""
+        self.games += sign
+        self.wins += sign * match.win
+        self.kills += sign * match.kills
+        self.deaths += sign * match.deaths
+        self.assists += sign * match.assists
+        self.kda_total += sign * match.kda
+        self.cs_total += sign * match.cs
+        self.gold_total += sign * match.gold
+        count = self.champion_counts.get(match.champion_id, 0) + sign
+        if count:
+            self.champion_counts[match.champion_id] = count
+        else:
+            del self.champion_counts[match.champion_id]
+
+    def add(self, stats: dict) -> None:
+        """Add a match, dropping the oldest one if the window is full.
+
+        Args:
+            stats: Stats dict of MatchService.extract_player_stats
+        """
+        match = MatchContribution.from_stats(stats)
+        if match.match_id in self.match_ids:
+            return
+
+        # New matches are normally the newest; older ones are inserted in place
+        position = 0
+        while position < len(self.matches) and self.matches[position].game_creation > match.game_creation:
+            position += 1
+        if position >= self.window:
+            return
+        self.matches.insert(position, match)
+        self._apply(match, 1)
+
+        if len(self.matches) > self.window:
+            self._apply(self.matches.pop(), -1)
+
+    def retain(self, match_ids: list[str]) -> None:
+        """Drop covered matches that are not in `match_ids`."""
+        keep = set(match_ids)
+        for match in [m for m in self.matches if m.match_id not in keep]:
+            self.matches.remove(match)
+            self._apply(match, -1)
+
+    def new_match_ids(self, match_ids: list[str]) -> list[str] | None:
+        """Work out which matches must be added to cover `match_ids`.
+
+        Args:
+            match_ids: A player's newest match IDs, newest first
+
+        Returns:
+            The IDs newer than every covered match, or None if the covered
+            matches don't line up with `match_ids` (rebuild from scratch)
+        """
+        covered = self.match_ids
+        known = set(covered)
+        new = list(takewhile(lambda m: m not in known, match_ids))
+        rest = match_ids[len(new):]
+        if rest != covered[: len(rest)]:
+            return None
+        return new
+
+    def aggregate(self) -> dict:
+        """Aggregate statistics in the format of MatchService.calculate_aggregate_stats.
+
+        Identical to aggregating the covered stats dicts, except that
+        averages exactly halfway between hundredths round half to even
+        rather than however float summation error falls.
+        """
+        games = self.games
+        if not games:
+            return dict(EMPTY_AGGREGATE)
+
+        if games >= 2:
+            days_span = max((self.last_game_creation - self.first_game_creation) / MS_PER_DAY, 1)
+            games_per_day = round(games / days_span, 2)
+        else:
+            games_per_day = 0
+
+        return {
+            "games_analyzed": games,
+            "winrate": round(self.wins / games * 100, 1),
+            "avg_kda": _average(self.kda_total, games),
+            "avg_cs_per_min": _average(self.cs_total, games),
+            "avg_gold_per_min": _average(self.gold_total, games),
+            "unique_champions": len(self.champion_counts),
+            "total_kills": self.kills,
+            "total_deaths": self.deaths,
+            "total_assists": self.assists,
+            "games_per_day": games_per_day,
+        }
+
+    def to_row(self) -> dict:
+        """Column values of the stored SummonerIndicatorState."""
+        return {
+            "queue_id": self.queue_id or 0,
+            "window": self.window,
+            "games": self.games,
+            "wins": self.wins,
+            "kills": self.kills,
+            "deaths": self.deaths,
+            "assists": self.assists,
+            "kda_total": self.kda_total,
+            "cs_total": self.cs_total,
+            "gold_total": self.gold_total,
+            "champion_counts": {str(champion): count for champion, count in self.champion_counts.items()},
+            "first_game_creation": self.first_game_creation,
+            "last_game_creation": self.last_game_creation,
+            "matches": [list(m) for m in self.matches],
+        }
+
+    @classmethod
+    def from_row(cls, row: SummonerIndicatorState) -> "IndicatorState":
+        """Restore a stored state."""
+        state = cls(row.window, row.queue_id or None)
+        state.games = row.games
+        state.wins = row.wins
+        state.kills = row.kills
+        state.deaths = row.deaths
+        state.assists = row.assists
+        state.kda_total = row.kda_total
+        state.cs_total = row.cs_total
+        state.gold_total = row.gold_total
+        state.champion_counts = {int(champion): count for champion, count in row.champion_counts.items()}
+        state.matches = [MatchContribution(*m) for m in row.matches]
+        return state
+
+
+class IndicatorStateRepository:
+    """Reads and writes per-summoner indicator states."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+        match_repository: MatchRepository = match_repository,
+    ):
+        """Initialize the repository.
+
+        Args:
+            session_factory: Factory for database sessions
+            match_repository: Used to upsert the summoner rows states belong to
+        """
+        self._session_factory = session_factory
+        self._match_repository = match_repository
+
+    async def get_state(self, puuid: str, queue_id: int | None, window: int) -> IndicatorState | None:
+        """Get a player's stored state.
+
+        Args:
+            puuid: Player PUUID
+            queue_id: Queue filter (None for all queues)
+            window: Number of matches the caller analyzes
+
+        Returns:
+            The stored state, or None if there is none for this window
+        """
+        async with self._session_factory() as session:
+            result = await session.execute(
+                select(SummonerIndicatorState)
+                .join(Summoner, SummonerIndicatorState.summoner_id == Summoner.id)
+                .where(Summoner.puuid == puuid)
+                .where(SummonerIndicatorState.queue_id == (queue_id or 0))
+            )
+            row = result.scalar_one_or_none()
+        if row is None or row.window != window:
+            return None
+        return IndicatorState.from_row(row)
+
+    async def save_state(self, summoner: SummonerData, state: IndicatorState) -> None:
+        """Store a player's state, replacing the previous one.
+
+        Args:
+            summoner: Summoner the state belongs to
+            state: State to store
+        """
+        values = state.to_row()
+        async with self._session_factory() as session:
+            summoner_id = await self._match_repository.upsert_summoner(session, summoner)
+            stmt = dialect_insert(session, SummonerIndicatorState).values(summoner_id=summoner_id, **values)
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[SummonerIndicatorState.summoner_id, SummonerIndicatorState.queue_id],
+                    set_={**values, "updated_at": func.now()},
+                )
+            )
+            await session.commit()
+
+
+# Global repository instance
+indicator_state_repository = IndicatorStateRepository()
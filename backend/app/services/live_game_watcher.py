@@ -0,0 +1,145 @@
+"""Long-polling for a player's next live game.
+
+While a user waits in champ select, the frontend can ask to be answered
+as soon as the player's game starts instead of re-polling. Every client
+waiting on the same PUUID shares one poller, which asks the spectator
+API on a fixed schedule and wakes them all with the game it finds; the
+poller stops once the last client has given up.
+"""
+
+import asyncio
+import contextvars
+import logging
+from typing import Any
+
+from fastapi import HTTPException
+
+from app.config import get_settings
+from app.core.cache import MISSING
+from app.core.exceptions import SummonerNotFound
+from app.core.scheduler import request_context, time_remaining
+from app.schemas.match import LiveGameResponse
+from app.services.riot_api import riot_api
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Longest a client may wait for a game in one request, in seconds
+MAX_WAIT = 60
+
+
+async def check_live_game(puuid: str) -> Any:
+    """Ask Riot for a player's live game, bypassing cached answers.
+
+    Failures are logged here, so pollers can simply try again later.
+
+    Returns:
+        The live game, None if the player isn't in one, or MISSING if the
+        check failed
+    """
+    try:
+        return await riot_api.get_live_game(puuid, fresh=True)
+    except SummonerNotFound:
+        return None
+    except HTTPException as e:
+        logger.warning(f"Live game check for {puuid} failed: {e.detail}")
+    except Exception:
+        logger.exception(f"Live game check for {puuid} failed")
+    return MISSING
+
+
+class LiveGameWatcher:
+    """Shares one spectator poller per player among waiting clients."""
+
+    def __init__(self, poll_interval: float = settings.LIVE_GAME_POLL_SECONDS):
+        """Initialize the watcher.
+
+        Args:
+            poll_interval: Seconds between spectator checks of a player
+        """
+        self._poll_interval = poll_interval
+        self._pollers: dict[str, asyncio.Task] = {}
+        self._waiters: dict[str, int] = {}
+        self._found = 0
+        self._timed_out = 0
+
+    async def wait_for_game(self, puuid: str, timeout: float) -> LiveGameResponse | None:
+        """Get a player's live game, waiting up to `timeout` for one to start.
+
+        The wait also ends at the request context's deadline.
+
+        Args:
+            puuid: Player PUUID
+            timeout: Seconds to wait at most
+
+        Returns:
+            The live game, or None if none started in time
+        """
+        try:
+            return await riot_api.get_live_game(puuid)
+        except SummonerNotFound:
+            pass
+
+        remaining = time_remaining()
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+
+        poller = self._pollers.get(puuid)
+        if poller is None:
+            # Poll in a fresh context so the first caller's deadline and
+            # origin don't carry over to everyone else's wait
+            poller = asyncio.get_running_loop().create_task(
+                self._poll(puuid), context=contextvars.Context()
+            )
+            self._pollers[puuid] = poller
+            poller.add_done_callback(lambda t: self._finish(puuid, t))
+
+        self._waiters[puuid] = self._waiters.get(puuid, 0) + 1
+        try:
+            # Shield so one client giving up doesn't stop the poller for the others
+            game = await asyncio.wait_for(asyncio.shield(poller), timeout)
+        except TimeoutError:
+            self._timed_out += 1
+            return None
+        finally:
+            self._waiters[puuid] -= 1
+            if not self._waiters[puuid]:
+                del self._waiters[puuid]
+                if not poller.done():
+                    if self._pollers.get(puuid) is poller:
+                        del self._pollers[puuid]
+                    poller.cancel()
+        self._found += 1
+        return game
+
+    async def _poll(self, puuid: str) -> LiveGameResponse:
+        """Check a player's live game on a schedule until there is one.
+
+        The first check is immediate, so a wait shorter than the poll
+        interval still asks Riot once. A failed check is logged and the
+        polling goes on.
+        """
+        with request_context(origin=f"watch:{puuid}"):
+            while True:
+                game = await check_live_game(puuid)
+                if game is not None and game is not MISSING:
+                    return game
+                await asyncio.sleep(self._poll_interval)
+
+    def _finish(self, puuid: str, task: asyncio.Task) -> None:
+        """Forget a poller that found a game (or was stopped)."""
+        if self._pollers.get(puuid) is task:
+            del self._pollers[puuid]
+
+    def stats(self) -> dict:
+        """Players being polled and how waits ended."""
+        return {
+            "watched": len(self._pollers),
+            "waiting": sum(self._waiters.values()),
+            "found": self._found,
+            "timed_out": self._timed_out,
+        }
+
+
+# Global live game watcher instance
+live_game_watcher = LiveGameWatcher()
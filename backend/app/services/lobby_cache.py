@@ -0,0 +1,243 @@
+"""Cache of whole-lobby analyses, keyed by game.
+
+Everyone in a lobby (and their friends) looks up the same game under a
+different PUUID. Each finished MatchAnalysisResponse is kept per game_id
+for as long as the game can last, and each lobby player's PUUID is mapped
+to its game_id for a few minutes. A repeat lookup for the lobby then
+costs no Riot calls at all, and concurrent first lookups share a single
+computation.
+
+Callers joining an analysis in progress can subscribe to its progress as
+well as the one that started it.
+
+The PUUID mapping is kept short because a player whose game ended may
+already be in the next one; once it expires, one spectator call finds
+their current game, which is still served from the cache.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+from app.core.cache import MISSING, LRUCache
+from app.core.exceptions import DeadlineExceeded
+from app.core.scheduler import request_deadline, time_remaining
+from app.schemas.analysis import AnalysisStatus, LobbySkeleton, MatchAnalysisResponse
+from app.services.analysis_jobs import ProgressCallback
+
+logger = logging.getLogger(__name__)
+
+# Seconds after its start a game's analysis is kept (games rarely run longer)
+GAME_TTL = 60 * 60
+# Kept at least this long however long the game has been running
+MIN_GAME_TTL = 5 * 60
+# Seconds a player maps to the game they were seen in
+PLAYER_TTL = 2 * 60
+MAX_LOBBIES = 1000
+
+# Seconds an analysis with PARTIAL players is kept, so the matches that
+# failed to load are retried soon
+PARTIAL_TTL = 60
+
+
+class _Progress:
+    """Progress of one shared analysis, passed on to each subscribed caller."""
+
+    def __init__(self):
+        self._subscribers: list[ProgressCallback] = []
+        self._latest: tuple[int, int] | None = None
+
+    async def subscribe(self, callback: ProgressCallback) -> None:
+        """Add a subscriber, telling it the progress so far."""
+        self._subscribers.append(callback)
+        if self._latest is not None:
+            await self._notify(callback, *self._latest)
+
+    def unsubscribe(self, callback: ProgressCallback) -> None:
+        """Remove a subscriber."""
+        self._subscribers.remove(callback)
+
+    async def __call__(self, done: int, total: int) -> None:
+        self._latest = (done, total)
+        for callback in list(self._subscribers):
+            await self._notify(callback, done, total)
+
+    @staticmethod
+    async def _notify(callback: ProgressCallback, done: int, total: int) -> None:
+        # One subscriber failing mustn't fail the analysis for everyone
+        try:
+            await callback(done, total)
+        except Exception:
+            logger.exception("Lobby analysis progress callback failed")
+
+
+class LobbyCache:
+    """Live match analyses by game, shared by every player in the game."""
+
+    def __init__(self, max_lobbies: int = MAX_LOBBIES):
+        """Initialize the cache.
+
+        Args:
+            max_lobbies: Games kept at most (least recently used are evicted)
+        """
+        self._games = LRUCache(max_lobbies)
+        # Ten players per game
+        self._players = LRUCache(max_lobbies * 10)
+        # Analyses in progress and the number of callers awaiting each
+        self._inflight: dict[int, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        # What each analysis in progress has so far, for callers out of time
+        self._snapshots: dict[asyncio.Task, Callable[[], MatchAnalysisResponse]] = {}
+        self._progress: dict[asyncio.Task, _Progress] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    def game_of(self, puuid: str) -> int | None:
+        """Game a player was recently seen in, if any."""
+        game_id = self._players.get(puuid, time.time())
+        return None if game_id is MISSING else game_id
+
+    def _remember_players(self, lobby: LobbySkeleton) -> None:
+        expires_at = time.time() + PLAYER_TTL
+        for player in lobby.blue_team + lobby.red_team:
+            self._players.set(player.puuid, lobby.game_id, expires_at)
+
+    async def lookup(
+        self, game_id: int, progress: ProgressCallback | None = None
+    ) -> MatchAnalysisResponse | None:
+        """Get a game's analysis if it is cached or being computed.
+
+        Args:
+            game_id: The game's ID
+            progress: Called with (players finished, players in total) while
+                the analysis is in progress
+
+        Returns:
+            The analysis, or None if the game isn't known
+        """
+        cached = self._games.get(str(game_id), time.time())
+        if cached is not MISSING:
+            self._hits += 1
+            return cached
+        task = self._inflight.get(game_id)
+        if task is None:
+            return None
+        self._coalesced += 1
+        return await self._await(game_id, task, progress)
+
+    async def get_or_compute(
+        self,
+        lobby: LobbySkeleton,
+        compute: Callable[[ProgressCallback], Awaitable[MatchAnalysisResponse]],
+        snapshot: Callable[[], MatchAnalysisResponse] | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> MatchAnalysisResponse:
+        """Get a game's analysis, computing it unless cached or in progress.
+
+        Args:
+            lobby: The game's lobby
+            compute: Analyzes the lobby, reporting its progress to the
+                callback it is given
+            snapshot: The analysis `compute` has so far, returned to callers
+                whose deadline passes before it is done
+            progress: Called with (players finished, players in total) while
+                the analysis is in progress, whoever started it
+
+        Returns:
+            The lobby's analysis
+        """
+        self._remember_players(lobby)
+        cached = await self.lookup(lobby.game_id, progress)
+        if cached is not None:
+            return cached
+
+        self._misses += 1
+        now = time.time()
+        started = lobby.game_start_time / 1000 if lobby.game_start_time else now
+        expires_at = max(started + GAME_TTL, now + MIN_GAME_TTL)
+        # Compute with the first caller's priority, origin and budget, but
+        # without its deadline: each caller waits only as long as its own
+        context = contextvars.copy_context()
+        context.run(request_deadline.set, None)
+        shared_progress = _Progress()
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(compute(shared_progress), context=context)
+        self._inflight[lobby.game_id] = task
+        self._progress[task] = shared_progress
+        if snapshot is not None:
+            self._snapshots[task] = snapshot
+        task.add_done_callback(lambda t: self._finish(lobby, expires_at, t))
+        return await self._await(lobby.game_id, task, progress)
+
+    async def _await(
+        self, game_id: int, task: asyncio.Task, progress: ProgressCallback | None = None
+    ) -> MatchAnalysisResponse:
+        """Await a shared analysis, cancelling it once every caller has gone.
+
+        Each caller waits no longer than its request context's deadline,
+        then gets the analysis's snapshot if it has one.
+
+        Raises:
+            DeadlineExceeded: If the deadline passes before the analysis is
+                done and there is no snapshot
+        """
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        shared_progress = None if progress is None else self._progress.get(task)
+        try:
+            if shared_progress is not None:
+                await shared_progress.subscribe(progress)
+            # Shield so one caller giving up doesn't cancel it for the others
+            return await asyncio.wait_for(asyncio.shield(task), time_remaining())
+        except TimeoutError as e:
+            snapshot = self._snapshots.get(task)
+            if snapshot is None:
+                raise DeadlineExceeded() from e
+            return snapshot()
+        finally:
+            if shared_progress is not None:
+                shared_progress.unsubscribe(progress)
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    if self._inflight.get(game_id) is task:
+                        del self._inflight[game_id]
+                    task.cancel()
+
+    def _finish(self, lobby: LobbySkeleton, expires_at: float, task: asyncio.Task) -> None:
+        """Cache a finished analysis unless some players are missing from it.
+
+        Analyses with PARTIAL players are kept only briefly.
+        """
+        if self._inflight.get(lobby.game_id) is task:
+            del self._inflight[lobby.game_id]
+        self._snapshots.pop(task, None)
+        self._progress.pop(task, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        response = task.result()
+        statuses = set(response.player_statuses.values())
+        if not statuses <= {AnalysisStatus.COMPLETE, AnalysisStatus.PARTIAL}:
+            return
+        if AnalysisStatus.PARTIAL in statuses:
+            expires_at = min(expires_at, time.time() + PARTIAL_TTL)
+        self._games.set(str(lobby.game_id), response, expires_at)
+        self._remember_players(lobby)
+        logger.debug(f"Cached analysis of game {lobby.game_id}")
+
+    def stats(self) -> dict:
+        """Hit/miss counters and number of cached games."""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._inflight),
+            "lobbies": len(self._games),
+        }
+
+
+# Global lobby cache instance
+lobby_cache = LobbyCache()
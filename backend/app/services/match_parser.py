@@ -0,0 +1,95 @@
+"""Fast projection of match-v5 payloads down to the fields we use.
+
+A match-v5 response is ~100 KB: ten participants with hundreds of stats
+and challenge fields each. Smurf detection reads about a dozen of them, so
+instead of validating the whole payload into MatchResponse we decode it
+with orjson and copy just those fields into compact `__slots__` records.
+"""
+
+from typing import Any
+
+import orjson
+
+
+class ParticipantRecord:
+    """The stats we keep for one participant of a finished match."""
+
+    __slots__ = (
+        "assists",
+        "champion_id",
+        "champion_name",
+        "deaths",
+        "gold_earned",
+        "kills",
+        "neutral_minions_killed",
+        "puuid",
+        "total_damage_dealt_to_champions",
+        "total_minions_killed",
+        "vision_score",
+        "win",
+    )
+
+    def __init__(self, data: dict[str, Any]):
+        """Project a match-v5 participant object.
+
+        Args:
+            data: Participant object from `info.participants`
+
+        Raises:
+            KeyError: If a required field is missing
+        """
+        self.puuid: str = data["puuid"]
+        self.champion_id: int = data["championId"]
+        self.champion_name: str = data["championName"]
+        self.kills: int = data["kills"]
+        self.deaths: int = data["deaths"]
+        self.assists: int = data["assists"]
+        self.total_minions_killed: int = data["totalMinionsKilled"]
+        self.neutral_minions_killed: int = data["neutralMinionsKilled"]
+        self.gold_earned: int = data["goldEarned"]
+        self.total_damage_dealt_to_champions: int = data["totalDamageDealtToChampions"]
+        self.vision_score: int = data["visionScore"]
+        self.win: bool = data["win"]
+
+
+class MatchRecord:
+    """The fields of a finished match that stats extraction needs."""
+
+    __slots__ = ("game_creation", "game_duration", "match_id", "participants", "queue_id")
+
+    def __init__(self, data: dict[str, Any]):
+        """Project a decoded match-v5 response.
+
+        Args:
+            data: Match response (`metadata` and `info` objects)
+
+        Raises:
+            KeyError: If a required field is missing
+        """
+        info = data["info"]
+        self.match_id: str = data["metadata"].get("matchId", "")
+        self.game_creation: int = info["gameCreation"]
+        self.game_duration: int = info["gameDuration"]
+        self.queue_id: int = info["queueId"]
+        self.participants: tuple[ParticipantRecord, ...] = tuple(
+            ParticipantRecord(p) for p in info["participants"]
+        )
+
+    def get_participant(self, puuid: str) -> ParticipantRecord | None:
+        """Find a participant by PUUID."""
+        for participant in self.participants:
+            if participant.puuid == puuid:
+                return participant
+        return None
+
+
+def decode_match(raw: bytes | str) -> MatchRecord:
+    """Decode a raw match-v5 response body straight into a MatchRecord.
+
+    Args:
+        raw: JSON response body
+
+    Returns:
+        Projected match
+    """
+    return MatchRecord(orjson.loads(raw))
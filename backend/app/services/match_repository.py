@@ -0,0 +1,237 @@
+"""Database-backed store for per-player match stats.
+
+Finished matches never change, so stats extracted from a match are stored
+once and served from the database on every later analysis.
+"""
+
+import logging
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.session import async_session_factory, dialect_insert
+from app.models.database import MatchSyncCursor, PlayerMatchStats, Summoner
+from app.schemas.summoner import SummonerData
+
+logger = logging.getLogger(__name__)
+
+
+def _row_to_stats(row: PlayerMatchStats) -> dict:
+    """Convert a stored row to the dict format of MatchService.extract_player_stats."""
+    return {
+        "match_id": row.match_id,
+        "game_duration_seconds": row.game_duration_seconds,
+        "game_creation": row.game_creation,
+        "queue_id": row.queue_id,
+        "champion_id": row.champion_id,
+        "champion_name": row.champion_name,
+        "kills": row.kills,
+        "deaths": row.deaths,
+        "assists": row.assists,
+        "total_cs": row.total_minions_killed,
+        "gold_earned": row.gold_earned,
+        "total_damage": row.total_damage_dealt,
+        "vision_score": row.vision_score,
+        "win": row.win,
+        "kda": row.kda,
+        "cs_per_min": row.cs_per_min,
+        "gold_per_min": row.gold_per_min,
+    }
+
+
+def _stats_to_row(summoner_id: int, stats: dict) -> dict:
+    """Convert an extracted stats dict to PlayerMatchStats column values."""
+    return {
+        "summoner_id": summoner_id,
+        "match_id": stats["match_id"],
+        "game_duration_seconds": stats["game_duration_seconds"],
+        "game_creation": stats["game_creation"],
+        "queue_id": stats["queue_id"],
+        "champion_id": stats["champion_id"],
+        "champion_name": stats["champion_name"],
+        "kills": stats["kills"],
+        "deaths": stats["deaths"],
+        "assists": stats["assists"],
+        "total_minions_killed": stats["total_cs"],
+        "gold_earned": stats["gold_earned"],
+        "total_damage_dealt": stats["total_damage"],
+        "vision_score": stats["vision_score"],
+        "win": stats["win"],
+        "kda": stats["kda"],
+        "cs_per_min": stats["cs_per_min"],
+        "gold_per_min": stats["gold_per_min"],
+    }
+
+
+class MatchRepository:
+    """Reads and writes immutable per-player match stats."""
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession] = async_session_factory):
+        """Initialize the repository.
+
+        Args:
+            session_factory: Factory for database sessions
+        """
+        self._session_factory = session_factory
+
+    async def upsert_summoner(
+        self,
+        session: AsyncSession,
+        summoner: SummonerData,
+        solo_rank: tuple[str | None, str | None] | None = None,
+    ) -> int:
+        """Insert or refresh a summoner row.
+
+        Args:
+            session: Open database session
+            summoner: Summoner data from Riot
+            solo_rank: Solo queue (tier, rank) if ranked data was fetched,
+                (None, None) for unranked; None keeps what is stored
+
+        Returns:
+            Database ID of the summoner row
+        """
+        values = {
+            "summoner_level": summoner.summoner_level,
+            "profile_icon_id": summoner.profile_icon_id,
+        }
+        if solo_rank is not None:
+            values["solo_tier"], values["solo_rank"] = solo_rank
+        stmt = dialect_insert(session, Summoner).values(
+            puuid=summoner.puuid, summoner_id=summoner.id, **values
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Summoner.puuid],
+            set_={key: stmt.excluded[key] for key in values},
+        ).returning(Summoner.id)
+        return (await session.execute(stmt)).scalar_one()
+
+    async def get_player_stats(self, puuid: str, match_ids: list[str]) -> dict[str, dict]:
+        """Load stored stats for a player in the given matches.
+
+        Args:
+            puuid: Player PUUID
+            match_ids: Match IDs to look up
+
+        Returns:
+            Stats dicts keyed by match ID (missing matches are absent)
+        """
+        if not match_ids:
+            return {}
+
+        async with self._session_factory() as session:
+            result = await session.execute(
+                select(PlayerMatchStats)
+                .join(Summoner, PlayerMatchStats.summoner_id == Summoner.id)
+                .where(Summoner.puuid == puuid)
+                .where(PlayerMatchStats.match_id.in_(match_ids))
+            )
+            return {row.match_id: _row_to_stats(row) for row in result.scalars()}
+
+    async def save_player_stats(self, summoner: SummonerData, stats: list[dict]) -> None:
+        """Bulk-insert stats for a player, ignoring matches already stored.
+
+        Args:
+            summoner: Summoner the stats belong to
+            stats: Stats dicts from MatchService.extract_player_stats
+        """
+        if not stats:
+            return
+
+        async with self._session_factory() as session:
+            summoner_id = await self.upsert_summoner(session, summoner)
+            stmt = dialect_insert(session, PlayerMatchStats).values(
+                [_stats_to_row(summoner_id, s) for s in stats]
+            )
+            await session.execute(
+                stmt.on_conflict_do_nothing(
+                    index_elements=[PlayerMatchStats.summoner_id, PlayerMatchStats.match_id]
+                )
+            )
+            await session.commit()
+
+        logger.debug(f"Stored {len(stats)} matches for {summoner.puuid}")
+
+    async def get_recent_match_ids(
+        self,
+        puuid: str,
+        count: int,
+        queue_id: int | None = None,
+    ) -> list[str]:
+        """Get the IDs of a player's newest stored matches.
+
+        Args:
+            puuid: Player PUUID
+            count: Max number of IDs
+            queue_id: Queue filter (None for all queues)
+
+        Returns:
+            Match IDs, newest first
+        """
+        query = (
+            select(PlayerMatchStats.match_id)
+            .join(Summoner, PlayerMatchStats.summoner_id == Summoner.id)
+            .where(Summoner.puuid == puuid)
+        )
+        if queue_id:
+            query = query.where(PlayerMatchStats.queue_id == queue_id)
+        # Ties keep insertion order, which is newest first
+        query = query.order_by(PlayerMatchStats.game_creation.desc(), PlayerMatchStats.id).limit(count)
+
+        async with self._session_factory() as session:
+            result = await session.execute(query)
+            return list(result.scalars())
+
+    async def get_sync_cursor(self, puuid: str, queue_id: int | None = None) -> int | None:
+        """Get the game creation time of the newest match synced for a player.
+
+        Args:
+            puuid: Player PUUID
+            queue_id: Queue filter the sync used (None for all queues)
+
+        Returns:
+            Epoch milliseconds, or None if the player was never synced
+        """
+        async with self._session_factory() as session:
+            result = await session.execute(
+                select(MatchSyncCursor.newest_game_creation)
+                .join(Summoner, MatchSyncCursor.summoner_id == Summoner.id)
+                .where(Summoner.puuid == puuid)
+                .where(MatchSyncCursor.queue_id == (queue_id or 0))
+            )
+            return result.scalar_one_or_none()
+
+    async def set_sync_cursor(
+        self,
+        summoner: SummonerData,
+        queue_id: int | None,
+        newest_game_creation: int,
+    ) -> None:
+        """Record the newest match synced for a player.
+
+        Args:
+            summoner: Summoner that was synced
+            queue_id: Queue filter the sync used (None for all queues)
+            newest_game_creation: Creation time of the newest stored match (epoch ms)
+        """
+        async with self._session_factory() as session:
+            summoner_id = await self.upsert_summoner(session, summoner)
+            stmt = dialect_insert(session, MatchSyncCursor).values(
+                summoner_id=summoner_id,
+                queue_id=queue_id or 0,
+                newest_game_creation=newest_game_creation,
+            )
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[MatchSyncCursor.summoner_id, MatchSyncCursor.queue_id],
+                    set_={
+                        "newest_game_creation": stmt.excluded.newest_game_creation,
+                        "synced_at": func.now(),
+                    },
+                )
+            )
+            await session.commit()
+
+
+# Global repository instance
+match_repository = MatchRepository()
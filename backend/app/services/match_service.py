@@ -1,22 +1,286 @@
 """Match history fetching and processing service."""
 
+import asyncio
 import logging
 
-from app.schemas.match import MatchResponse
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config import get_settings
+from app.schemas.summoner import SummonerData
+from app.services.match_parser import MatchRecord
+from app.services.match_repository import MatchRepository, match_repository
 from app.services.riot_api import riot_api
+from app.services.stats_block import StatsBlock
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Max match IDs per match-v5 listing call
+MATCH_ID_PAGE_SIZE = 100
 
 
 class MatchService:
     """Service for fetching and processing match history data."""
 
+    # Max listing pages per incremental sync
+    MAX_SYNC_PAGES = 5
+
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        repository: MatchRepository | None = None,
+    ):
+        """Initialize the service.
+
+        Args:
+            max_concurrency: Max match fetches in flight at once
+                (defaults to MATCH_FETCH_CONCURRENCY)
+            repository: Match store (defaults to the global one)
+        """
+        self._fetch_semaphore = asyncio.Semaphore(
+            max_concurrency or settings.MATCH_FETCH_CONCURRENCY
+        )
+        self._repository = repository or match_repository
+
+    async def get_recent_player_stats(
+        self,
+        summoner: SummonerData,
+        count: int = 20,
+        queue_id: int | None = 420,
+    ) -> list[dict]:
+        """Get a player's per-match stats for their recent matches.
+
+        Stats for matches already in the match store are read from the
+        database; only the missing matches are fetched from Riot.
+
+        Args:
+            summoner: Summoner to get stats for
+            count: Number of matches to fetch (max 100)
+            queue_id: Queue filter (420=ranked solo, 440=flex, None=all)
+
+        Returns:
+            List of player stats dicts, newest first
+        """
+        stats = await self.get_lobby_player_stats([summoner], count=count, queue_id=queue_id)
+        return stats[summoner.puuid]
+
+    async def get_lobby_player_stats(
+        self,
+        summoners: list[SummonerData],
+        count: int = 20,
+        queue_id: int | None = 420,
+    ) -> dict[str, list[dict]]:
+        """Get recent per-match stats for several players at once.
+
+        Players in the same lobby (premades especially) often share recent
+        matches. All match ID lists are collected first so each shared
+        match is fetched from Riot only once.
+
+        Args:
+            summoners: Summoners to get stats for
+            count: Number of matches per player (max 100)
+            queue_id: Queue filter (420=ranked solo, 440=flex, None=all)
+
+        Returns:
+            Player stats dicts (newest first) keyed by PUUID
+        """
+        match_ids_by_puuid = await self.get_lobby_match_ids(summoners, count=count, queue_id=queue_id)
+        return await self.load_player_stats(summoners, match_ids_by_puuid, queue_id=queue_id)
+
+    async def get_lobby_match_ids(
+        self,
+        summoners: list[SummonerData],
+        count: int = 20,
+        queue_id: int | None = 420,
+    ) -> dict[str, list[str]]:
+        """Sync several players' newest match IDs concurrently.
+
+        A player whose IDs can't be fetched gets an empty list.
+
+        Args:
+            summoners: Summoners to get match IDs for
+            count: Number of match IDs per player (max 100)
+            queue_id: Queue filter (420=ranked solo, 440=flex, None=all)
+
+        Returns:
+            Match IDs (newest first) keyed by PUUID
+        """
+
+        async def get_match_ids(puuid: str) -> list[str]:
+            try:
+                return await self.sync_match_ids(puuid, count=count, queue_id=queue_id)
+            except Exception as e:
+                logger.warning(f"Failed to fetch match IDs for {puuid}: {e}")
+                return []
+
+        id_lists = await asyncio.gather(*[get_match_ids(s.puuid) for s in summoners])
+        return {s.puuid: ids for s, ids in zip(summoners, id_lists, strict=True)}
+
+    async def load_player_stats(
+        self,
+        summoners: list[SummonerData],
+        match_ids_by_puuid: dict[str, list[str]],
+        queue_id: int | None = 420,
+    ) -> dict[str, list[dict]]:
+        """Get players' stats for synced match IDs and advance their sync cursors.
+
+        Args:
+            summoners: Summoners to get stats for
+            match_ids_by_puuid: IDs from `sync_match_ids`, keyed by PUUID
+            queue_id: Queue filter the IDs were synced with
+
+        Returns:
+            Player stats dicts keyed by PUUID, in the same order as their match IDs
+        """
+        stats_by_puuid = await self.get_player_stats(summoners, match_ids_by_puuid)
+
+        await asyncio.gather(*[
+            self._advance_sync_cursor(s, queue_id, match_ids_by_puuid[s.puuid], stats_by_puuid[s.puuid])
+            for s in summoners
+        ])
+        return stats_by_puuid
+
+    async def sync_match_ids(
+        self,
+        puuid: str,
+        count: int = 20,
+        queue_id: int | None = 420,
+    ) -> list[str]:
+        """Get a player's newest match IDs, listing only matches we haven't seen.
+
+        Once a player has been synced, Riot is asked only for matches played
+        since the sync cursor. The rest of the list comes from the match store.
+
+        Args:
+            puuid: Player PUUID
+            count: Number of match IDs (max 100)
+            queue_id: Queue filter (420=ranked solo, 440=flex, None=all)
+
+        Returns:
+            Match IDs, newest first
+        """
+        try:
+            cursor = await self._repository.get_sync_cursor(puuid, queue_id)
+            known = (
+                await self._repository.get_recent_match_ids(puuid, count, queue_id)
+                if cursor is not None
+                else []
+            )
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning(f"Failed to read sync cursor for {puuid}: {e}")
+            cursor, known = None, []
+
+        # Never synced, or the stored history is shorter than requested
+        if cursor is None or len(known) < count:
+            return await riot_api.get_match_ids(puuid=puuid, count=count, queue=queue_id)
+
+        # startTime filters on game start, which comes after game creation, so
+        # the listing runs from the newest match back to the one at the cursor.
+        # All of it is read, so a match that failed to fetch last time is
+        # listed again even if newer ones were stored.
+        known_ids = set(known)
+        listed: list[str] = []
+        for page in range(self.MAX_SYNC_PAGES):
+            page_ids = await riot_api.get_match_ids(
+                puuid=puuid,
+                start=page * MATCH_ID_PAGE_SIZE,
+                count=MATCH_ID_PAGE_SIZE,
+                queue=queue_id,
+                start_time=cursor // 1000,
+            )
+            listed.extend(page_ids)
+            if len(page_ids) < MATCH_ID_PAGE_SIZE:
+                break
+
+        listed_ids = set(listed)
+        new_ids = [m for m in listed if m not in known_ids]
+        logger.debug(f"Synced {len(new_ids)} new matches for {puuid}")
+        return (listed + [m for m in known if m not in listed_ids])[:count]
+
+    async def _advance_sync_cursor(
+        self,
+        summoner: SummonerData,
+        queue_id: int | None,
+        match_ids: list[str],
+        stats: list[dict],
+    ) -> None:
+        """Move a player's sync cursor up to their newest stored match.
+
+        The cursor only moves when every listed match was stored, so a match
+        that failed to fetch is listed again on the next sync.
+        """
+        if not stats or len(stats) < len(match_ids):
+            return
+        try:
+            await self._repository.set_sync_cursor(
+                summoner, queue_id, max(s["game_creation"] for s in stats)
+            )
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning(f"Failed to store sync cursor for {summoner.puuid}: {e}")
+
+    async def get_player_stats(
+        self,
+        summoners: list[SummonerData],
+        match_ids_by_puuid: dict[str, list[str]],
+    ) -> dict[str, list[dict]]:
+        """Get players' stats for the given matches, match store first.
+
+        Matches missing from the store are fetched once for all players and
+        each player's stats are split out of the shared payloads.
+
+        Args:
+            summoners: Summoners to get stats for
+            match_ids_by_puuid: Match IDs to get stats from, keyed by PUUID
+
+        Returns:
+            Player stats dicts keyed by PUUID, in the same order as their match IDs
+        """
+
+        async def load_stored(puuid: str) -> dict[str, dict]:
+            try:
+                return await self._repository.get_player_stats(puuid, match_ids_by_puuid[puuid])
+            except (SQLAlchemyError, OSError) as e:
+                logger.warning(f"Failed to read stored matches for {puuid}: {e}")
+                return {}
+
+        stored = await asyncio.gather(*[load_stored(s.puuid) for s in summoners])
+        stats_by_puuid = {s.puuid: stats for s, stats in zip(summoners, stored, strict=True)}
+
+        missing_by_puuid = {
+            puuid: [m for m in match_ids_by_puuid[puuid] if m not in stats_by_id]
+            for puuid, stats_by_id in stats_by_puuid.items()
+        }
+        # Union of missing IDs, keeping first-seen order
+        missing = list(dict.fromkeys(m for ids in missing_by_puuid.values() for m in ids))
+
+        if missing:
+            matches = await self.get_matches(missing)
+            matches_by_id = {match.match_id: match for match in matches}
+            logger.debug(f"Fetched {len(matches)} matches for {len(summoners)} players")
+
+            for summoner in summoners:
+                puuid = summoner.puuid
+                player_matches = [
+                    matches_by_id[m] for m in missing_by_puuid[puuid] if m in matches_by_id
+                ]
+                new_stats = self.extract_player_stats(player_matches, puuid)
+                try:
+                    await self._repository.save_player_stats(summoner, new_stats)
+                except (SQLAlchemyError, OSError) as e:
+                    logger.warning(f"Failed to store matches for {puuid}: {e}")
+                stats_by_puuid[puuid].update({s["match_id"]: s for s in new_stats})
+
+        return {
+            puuid: [stats_by_id[m] for m in match_ids_by_puuid[puuid] if m in stats_by_id]
+            for puuid, stats_by_id in stats_by_puuid.items()
+        }
+
     async def get_recent_matches(
         self,
         puuid: str,
         count: int = 20,
         queue_id: int | None = 420,  # Default to ranked solo
-    ) -> list[MatchResponse]:
+    ) -> list[MatchRecord]:
         """Fetch recent matches for a player.
 
         Args:
@@ -25,7 +289,7 @@ class MatchService:
             queue_id: Queue filter (420=ranked solo, 440=flex, None=all)
 
         Returns:
-            List of full match data
+            List of match records, in the order Riot returned the IDs
         """
         try:
             match_ids = await riot_api.get_match_ids(
@@ -37,20 +301,34 @@ class MatchService:
             logger.warning(f"Failed to fetch match IDs for {puuid}: {e}")
             return []
 
-        matches = []
-        for match_id in match_ids:
-            try:
-                match = await riot_api.get_match(match_id)
-                matches.append(match)
-            except Exception as e:
-                logger.warning(f"Failed to fetch match {match_id}: {e}")
-                continue
+        return await self.get_matches(match_ids)
+
+    async def get_matches(self, match_ids: list[str]) -> list[MatchRecord]:
+        """Fetch match details concurrently, bounded by the fetch semaphore.
+
+        Matches that fail to fetch are skipped without cancelling the others.
+
+        Args:
+            match_ids: Match IDs to fetch
+
+        Returns:
+            Fetched matches, in the same order as `match_ids`
+        """
 
-        return matches
+        async def fetch(match_id: str) -> MatchRecord | None:
+            async with self._fetch_semaphore:
+                try:
+                    return await riot_api.get_match_record(match_id)
+                except Exception as e:
+                    logger.warning(f"Failed to fetch match {match_id}: {e}")
+                    return None
+
+        results = await asyncio.gather(*[fetch(match_id) for match_id in match_ids])
+        return [match for match in results if match is not None]
 
     def extract_player_stats(
         self,
-        matches: list[MatchResponse],
+        matches: list[MatchRecord],
         puuid: str,
     ) -> list[dict]:
         """Extract stats for a specific player from matches.
@@ -65,18 +343,12 @@ class MatchService:
         stats = []
 
         for match in matches:
-            # Find player in participants
-            participant = None
-            for p in match.info.participants:
-                if p.puuid == puuid:
-                    participant = p
-                    break
-
+            participant = match.get_participant(puuid)
             if not participant:
                 continue
 
             # Calculate metrics
-            game_duration_mins = match.info.game_duration / 60
+            game_duration_mins = match.game_duration / 60
             total_cs = participant.total_minions_killed + participant.neutral_minions_killed
             cs_per_min = total_cs / game_duration_mins if game_duration_mins > 0 else 0
 
@@ -86,10 +358,10 @@ class MatchService:
             gold_per_min = participant.gold_earned / game_duration_mins if game_duration_mins > 0 else 0
 
             stats.append({
-                "match_id": match.metadata.get("matchId", ""),
-                "game_duration_seconds": match.info.game_duration,
-                "game_creation": match.info.game_creation,
-                "queue_id": match.info.queue_id,
+                "match_id": match.match_id,
+                "game_duration_seconds": match.game_duration,
+                "game_creation": match.game_creation,
+                "queue_id": match.queue_id,
                 "champion_id": participant.champion_id,
                 "champion_name": participant.champion_name,
                 "kills": participant.kills,
@@ -110,60 +382,79 @@ class MatchService:
     def calculate_aggregate_stats(self, player_stats: list[dict]) -> dict:
         """Calculate aggregate statistics from match history.
 
+        For many players at once, build a StatsBlock and call `aggregate`.
+
         Args:
             player_stats: List of per-match stats
 
         Returns:
             Aggregated statistics dict
         """
-        if not player_stats:
-            return {
-                "games_analyzed": 0,
-                "winrate": None,
-                "avg_kda": None,
-                "avg_cs_per_min": None,
-                "avg_gold_per_min": None,
-                "unique_champions": 0,
-                "total_kills": 0,
-                "total_deaths": 0,
-                "total_assists": 0,
-            }
-
-        games = len(player_stats)
-        wins = sum(s["win"] for s in player_stats)
-
-        unique_champs = len(set(s["champion_id"] for s in player_stats))
-
-        total_kills = sum(s["kills"] for s in player_stats)
-        total_deaths = sum(s["deaths"] for s in player_stats)
-        total_assists = sum(s["assists"] for s in player_stats)
-
-        avg_kda = sum(s["kda"] for s in player_stats) / games
-        avg_cs = sum(s["cs_per_min"] for s in player_stats) / games
-        avg_gold = sum(s["gold_per_min"] for s in player_stats) / games
-
-        # Calculate games per day
-        if len(player_stats) >= 2:
-            timestamps = [s["game_creation"] for s in player_stats]
-            oldest = min(timestamps)
-            newest = max(timestamps)
-            days_span = max((newest - oldest) / (1000 * 60 * 60 * 24), 1)
-            games_per_day = games / days_span
-        else:
-            games_per_day = 0
+        return StatsBlock.from_player_stats([player_stats]).aggregate()[0]
 
-        return {
-            "games_analyzed": games,
-            "winrate": round(wins / games * 100, 1),
-            "avg_kda": round(avg_kda, 2),
-            "avg_cs_per_min": round(avg_cs, 2),
-            "avg_gold_per_min": round(avg_gold, 2),
-            "unique_champions": unique_champs,
-            "total_kills": total_kills,
-            "total_deaths": total_deaths,
-            "total_assists": total_assists,
-            "games_per_day": round(games_per_day, 2),
-        }
+
+class PlayerStatsBatch:
+    """Loads the match stats several players ask for with one `load_player_stats`.
+
+    Each player asks for the matches it needs once it knows them, or drops
+    out. The stats are loaded when no player is left to hear from, so
+    matches shared by several players are still fetched once and players
+    needing nothing cost nothing.
+    """
+
+    def __init__(
+        self,
+        service: MatchService,
+        summoners: list[SummonerData],
+        queue_id: int | None = 420,
+    ):
+        """Initialize the batch.
+
+        Args:
+            service: Loads the stats
+            summoners: Players that may ask for stats
+            queue_id: Queue filter the match IDs were synced with
+        """
+        self._service = service
+        self._summoners = {s.puuid: s for s in summoners}
+        self._queue_id = queue_id
+        self._waiting = set(self._summoners)
+        self._requested: dict[str, list[str]] = {}
+        self._task: asyncio.Task[dict[str, list[dict]]] | None = None
+        self._started = asyncio.Event()
+        self._closed = False
+
+    async def load(self, puuid: str, match_ids: list[str]) -> list[dict]:
+        """Get a player's stats for `match_ids` once the batch is loaded.
+
+        Returns:
+            The player's stats dicts, in the same order as `match_ids`
+        """
+        self._requested[puuid] = match_ids
+        self.done(puuid)
+        await self._started.wait()
+        # Shield so one player giving up doesn't cancel the others' load
+        stats_by_puuid = await asyncio.shield(self._task)
+        return stats_by_puuid.get(puuid, [])
+
+    def done(self, puuid: str) -> None:
+        """Stop waiting for a player, whether or not it asked for stats."""
+        self._waiting.discard(puuid)
+        if not self._waiting and self._task is None and self._requested and not self._closed:
+            self._task = asyncio.ensure_future(
+                self._service.load_player_stats(
+                    [self._summoners[p] for p in self._requested],
+                    self._requested,
+                    queue_id=self._queue_id,
+                )
+            )
+            self._started.set()
+
+    def close(self) -> None:
+        """Cancel the load if it is still running, or never start it."""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
 
 
 # Global service instance
@@ -0,0 +1,415 @@
+"""Background live-game detection for watched players.
+
+Streamers and flagged accounts are registered in watched_players and each
+gets a task that checks the spectator API on its own schedule: often at
+hours of the day the player usually starts games, less often at other
+hours, and less and less often the longer they go without playing. When
+a new game is found, the lobby's analysis is prefetched so it's cached
+by the time anyone looks it up.
+
+Every check also takes a token from a budget limiter holding
+WATCH_RATE_SHARE of the app rate limit, kept in the app limiter's store.
+A check that would have to wait for the budget is skipped until the next
+one instead of queueing behind prefetches, and no lobby is prefetched
+while the budget is spent. Prefetches run at PREFETCH priority and draw
+on the same budget, and a lobby analysis started by a prefetch keeps both
+even when someone looking the game up joins it.
+
+Only one process watches at a time: the one holding the player watcher's
+row in service_leases. It renews the lease every third of
+WATCH_LEASE_SECONDS and picks up players registered through the other
+processes as it does; if it dies, another process takes over once the
+lease expires.
+"""
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import get_settings
+from app.core.cache import MISSING
+from app.core.rate_limit_store import RateLimitStore
+from app.core.rate_limiter import RateLimiter, rate_limiter
+from app.core.scheduler import RequestPriority, request_context
+from app.db.session import async_session_factory, dialect_insert
+from app.models.database import ServiceLease, WatchedPlayer
+from app.services.live_game_watcher import check_live_game
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Games a player must have been seen starting before their hours are trusted
+MIN_HISTORY_GAMES = 5
+# Check interval multiplier at hours the player rarely plays
+OFF_HOURS_FACTOR = 4
+# The check interval doubles for each this many seconds without a game
+IDLE_DOUBLING_SECONDS = 12 * 60 * 60
+# Name of the watcher's row in service_leases
+LEASE_NAME = "player_watcher"
+
+# Prefetches the live match analysis of a player
+PrefetchRunner = Callable[[str], Awaitable[Any]]
+
+
+@dataclass
+class WatchState:
+    """What the watcher knows about a watched player."""
+
+    puuid: str
+    game_id: int | None = None
+    last_game_at: float | None = None
+    hour_counts: list[int] = field(default_factory=lambda: [0] * 24)
+    created_at: float = field(default_factory=time.time)
+
+
+def _to_datetime(timestamp: float | None) -> datetime | None:
+    return None if timestamp is None else datetime.fromtimestamp(timestamp, tz=UTC)
+
+
+def _to_timestamp(value: datetime | None) -> float | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:  # SQLite drops the timezone
+        value = value.replace(tzinfo=UTC)
+    return value.timestamp()
+
+
+def _state_of(row: WatchedPlayer) -> WatchState:
+    return WatchState(
+        puuid=row.puuid,
+        game_id=row.game_id,
+        last_game_at=_to_timestamp(row.last_game_at),
+        hour_counts=list(row.hour_counts or [0] * 24),
+        created_at=_to_timestamp(row.created_at) or time.time(),
+    )
+
+
+class PlayerWatcher:
+    """Checks watched players for live games and prefetches their lobbies."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+        min_interval: float = settings.WATCH_MIN_INTERVAL_SECONDS,
+        max_interval: float = settings.WATCH_MAX_INTERVAL_SECONDS,
+        in_game_interval: float = settings.WATCH_IN_GAME_INTERVAL_SECONDS,
+        rate_share: float = settings.WATCH_RATE_SHARE,
+        lease_seconds: float = settings.WATCH_LEASE_SECONDS,
+        store: RateLimitStore | None = None,
+    ):
+        """Initialize the watcher.
+
+        Args:
+            session_factory: Factory for database sessions
+            min_interval: Seconds between checks at a player's usual hours
+            max_interval: Longest time between checks
+            in_game_interval: Seconds between checks while in a game
+            rate_share: Fraction of the app rate limit watched players may use
+            lease_seconds: Seconds the watching process's lease lasts unrenewed
+            store: Where the budget's state lives (defaults to the app rate
+                limiter's store, so both are taken in one transaction)
+        """
+        self._session_factory = session_factory
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._in_game_interval = in_game_interval
+        self._budget = RateLimiter(
+            limits=[
+                (max(1, int(settings.RATE_LIMIT_PER_SECOND * rate_share)), 1.0),
+                (max(1, int(settings.RATE_LIMIT_PER_2MIN * rate_share)), 120.0),
+            ],
+            store=store or rate_limiter.store,
+            name="watch",
+        )
+        self._lease_seconds = lease_seconds
+        self._holder = uuid.uuid4().hex
+        self._leading = False
+        self._leader: asyncio.Task | None = None
+        self._prefetch: PrefetchRunner | None = None
+        self._players: dict[str, WatchState] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        # Prefetches in progress by game, so a lobby is prefetched once
+        self._prefetches: dict[int, asyncio.Task] = {}
+        self._checks = 0
+        self._skipped = 0
+        self._games_found = 0
+
+    def set_prefetch(self, runner: PrefetchRunner) -> None:
+        """Set the analysis run when a watched player enters a game."""
+        self._prefetch = runner
+
+    async def start(self) -> None:
+        """Watch every registered player while this process holds the lease."""
+        await self._lead_once()
+        if self._leader is None or self._leader.done():
+            self._leader = asyncio.ensure_future(self._lead())
+
+    async def stop(self) -> None:
+        """Stop all checks and prefetches, and hand the lease over."""
+        tasks = [*self._tasks.values(), *self._prefetches.values()]
+        if self._leader is not None:
+            tasks.append(self._leader)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = {}
+        self._prefetches = {}
+        self._leader = None
+        if self._leading:
+            self._leading = False
+            self._players = {}
+            try:
+                await self._release_lease()
+            except SQLAlchemyError:
+                logger.exception("Player watcher lease could not be released")
+
+    async def _lead(self) -> None:
+        """Renew the lease on a schedule, watching while it is held."""
+        while True:
+            await asyncio.sleep(self._lease_seconds / 3)
+            await self._lead_once()
+
+    async def _lead_once(self) -> None:
+        """Take or renew the lease, then start or stop watching to match."""
+        try:
+            leading = await self._renew_lease()
+            if leading:
+                await self._sync_players()
+        except SQLAlchemyError:
+            logger.exception("Player watcher lease could not be renewed")
+            leading = False
+        if self._leading and not leading:
+            logger.info("Player watcher lease lost, no longer watching")
+            tasks = list(self._tasks.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._tasks = {}
+            self._players = {}
+        self._leading = leading
+
+    async def _renew_lease(self) -> bool:
+        """Take the lease if it's free or expired, or extend it if ours.
+
+        Returns:
+            Whether this process holds the lease
+        """
+        now = datetime.now(UTC)
+        values = {"holder": self._holder, "expires_at": now + timedelta(seconds=self._lease_seconds)}
+        async with self._session_factory() as session:
+            stmt = dialect_insert(session, ServiceLease).values(name=LEASE_NAME, **values)
+            result = await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[ServiceLease.name],
+                    set_=values,
+                    where=(ServiceLease.holder == self._holder) | (ServiceLease.expires_at < now),
+                ).returning(ServiceLease.holder)
+            )
+            held = result.one_or_none() is not None
+            await session.commit()
+        return held
+
+    async def _release_lease(self) -> None:
+        """Expire our lease so another process can take over at once."""
+        async with self._session_factory() as session:
+            await session.execute(
+                update(ServiceLease)
+                .where(ServiceLease.name == LEASE_NAME, ServiceLease.holder == self._holder)
+                .values(expires_at=datetime.now(UTC))
+            )
+            await session.commit()
+
+    async def _sync_players(self) -> None:
+        """Watch players registered, and forget players unwatched, by any process."""
+        async with self._session_factory() as session:
+            result = await session.execute(select(WatchedPlayer))
+            rows = {row.puuid: row for row in result.scalars()}
+        added = [puuid for puuid in rows if puuid not in self._players]
+        for puuid in added:
+            self._players[puuid] = _state_of(rows[puuid])
+            # Spread the first checks so taking over doesn't check everyone at once
+            self._start(puuid, delay=0 if self._leading else random.uniform(0, self._min_interval))
+        for puuid in [puuid for puuid in self._players if puuid not in rows]:
+            self._players.pop(puuid)
+            task = self._tasks.pop(puuid, None)
+            if task is not None:
+                task.cancel()
+        if added and not self._leading:
+            logger.info(f"Watching {len(added)} players for live games")
+
+    def _start(self, puuid: str, delay: float = 0) -> None:
+        task = self._tasks.get(puuid)
+        if task is None or task.done():
+            self._tasks[puuid] = asyncio.ensure_future(self._watch(puuid, delay))
+
+    async def watch(self, puuid: str, label: str | None = None) -> WatchedPlayer:
+        """Register a player and check them right away.
+
+        If another process holds the lease, it checks them once it next
+        renews it instead.
+
+        Args:
+            puuid: Player PUUID
+            label: Why they are watched (kept if None and already registered)
+
+        Returns:
+            The player's registration
+        """
+        async with self._session_factory() as session:
+            row = await session.get(WatchedPlayer, puuid)
+            if row is None:
+                row = WatchedPlayer(puuid=puuid, label=label, hour_counts=[0] * 24)
+                session.add(row)
+            elif label is not None:
+                row.label = label
+            await session.commit()
+            await session.refresh(row)
+
+        if self._leading:
+            if puuid not in self._players:
+                self._players[puuid] = _state_of(row)
+            self._start(puuid)
+        return row
+
+    async def unwatch(self, puuid: str) -> bool:
+        """Stop watching a player.
+
+        Returns:
+            False if the player wasn't registered
+        """
+        task = self._tasks.pop(puuid, None)
+        if task is not None:
+            task.cancel()
+        self._players.pop(puuid, None)
+        async with self._session_factory() as session:
+            result = await session.execute(delete(WatchedPlayer).where(WatchedPlayer.puuid == puuid))
+            await session.commit()
+        return result.rowcount > 0
+
+    async def players(self) -> list[WatchedPlayer]:
+        """Get every registered player."""
+        async with self._session_factory() as session:
+            result = await session.execute(select(WatchedPlayer).order_by(WatchedPlayer.created_at))
+            return list(result.scalars().all())
+
+    def poll_interval(self, state: WatchState, now: float) -> float:
+        """Seconds until a player's next check.
+
+        Args:
+            state: The player's watch state
+            now: Current time.time()
+        """
+        if state.game_id is not None:
+            # Only needed to notice the game ending
+            return self._in_game_interval
+
+        interval = self._min_interval
+        games = sum(state.hour_counts)
+        if games >= MIN_HISTORY_GAMES:
+            # Share of their games started within an hour of now, against
+            # the share if they played at any hour alike
+            hour = datetime.fromtimestamp(now, tz=UTC).hour
+            nearby = sum(state.hour_counts[(hour + offset) % 24] for offset in (-1, 0, 1))
+            if nearby / games < 0.5 * 3 / 24:
+                interval *= OFF_HOURS_FACTOR
+
+        idle = now - (state.last_game_at or state.created_at)
+        doublings = min(int(idle // IDLE_DOUBLING_SECONDS), 10)
+        return min(interval * 2**doublings, self._max_interval)
+
+    async def _watch(self, puuid: str, delay: float) -> None:
+        """Check a player on their schedule until unwatched."""
+        with request_context(
+            priority=RequestPriority.PREFETCH, origin=f"watch:{puuid}", budget=self._budget
+        ):
+            await asyncio.sleep(delay)
+            while True:
+                state = self._players[puuid]
+                if self._budget.get_wait_time() > 0:
+                    self._skipped += 1
+                else:
+                    try:
+                        await self._check(state)
+                    except Exception:
+                        logger.exception(f"Live game check for watched player {puuid} failed")
+                await asyncio.sleep(self.poll_interval(state, time.time()))
+
+    async def _check(self, state: WatchState) -> None:
+        """Look up a player's live game, prefetching it if it's new."""
+        self._checks += 1
+        game = await check_live_game(state.puuid)
+        if game is MISSING:
+            return
+        if game is None:
+            if state.game_id is not None:
+                state.game_id = None
+                await self._save(state)
+            return
+
+        if game.game_id == state.game_id:
+            return
+        now = time.time()
+        state.game_id = game.game_id
+        state.last_game_at = now
+        state.hour_counts[datetime.fromtimestamp(now, tz=UTC).hour] += 1
+        self._games_found += 1
+        logger.info(f"Watched player {state.puuid} entered game {game.game_id}")
+        await self._save(state)
+
+        if self._budget.get_wait_time() > 0:
+            logger.info(f"Not prefetching game {game.game_id}, watch budget spent")
+            return
+        if self._prefetch is not None and game.game_id not in self._prefetches:
+            task = asyncio.ensure_future(self._run_prefetch(state.puuid))
+            self._prefetches[game.game_id] = task
+            task.add_done_callback(lambda t: self._prefetches.pop(game.game_id, None))
+
+    async def _run_prefetch(self, puuid: str) -> None:
+        """Prefetch a player's match at PREFETCH priority within the budget."""
+        try:
+            with request_context(
+                priority=RequestPriority.PREFETCH, origin=f"watch:{puuid}", budget=self._budget
+            ):
+                await self._prefetch(puuid)
+        except HTTPException as e:
+            logger.warning(f"Prefetch of watched player {puuid}'s match failed: {e.detail}")
+        except Exception:
+            logger.exception(f"Prefetch of watched player {puuid}'s match failed")
+
+    async def _save(self, state: WatchState) -> None:
+        """Store a player's game state."""
+        async with self._session_factory() as session:
+            row = await session.get(WatchedPlayer, state.puuid)
+            if row is None:  # Unwatched meanwhile
+                return
+            row.game_id = state.game_id
+            row.last_game_at = _to_datetime(state.last_game_at)
+            row.hour_counts = list(state.hour_counts)
+            await session.commit()
+
+    def stats(self) -> dict:
+        """Watched players, check counts and games found."""
+        return {
+            "leading": self._leading,
+            "watched": len(self._players),
+            "in_game": sum(1 for state in self._players.values() if state.game_id is not None),
+            "checks": self._checks,
+            "skipped_over_budget": self._skipped,
+            "games_found": self._games_found,
+            "prefetching": len(self._prefetches),
+        }
+
+
+# Global player watcher instance
+player_watcher = PlayerWatcher()
@@ -4,12 +4,27 @@ import asyncio
 import logging
 
 import httpx
+import orjson
 
 from app.config import get_settings
-from app.core.exceptions import RateLimitExceeded, RiotAPIError, SummonerNotFound
-from app.core.rate_limiter import rate_limiter
+from app.core.cache import MISSING, NOT_FOUND, ResponseCache, response_cache
+from app.core.exceptions import (
+    DeadlineExceeded,
+    RateLimitExceeded,
+    RiotAPIError,
+    SummonerNotFound,
+)
+from app.core.rate_limiter import (
+    RateLimiter,
+    acquire_if_free,
+    apply_server_limits,
+    parse_rate_limit_header,
+    rate_limiter,
+)
+from app.core.scheduler import RequestScheduler, request_budget, time_remaining
 from app.schemas.match import LiveGameResponse, MatchResponse
 from app.schemas.summoner import RankedEntry, RiotAccount, SummonerData
+from app.services.match_parser import MatchRecord
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -18,9 +33,32 @@ settings = get_settings()
 class RiotAPIClient:
     """Async client for Riot Games API."""
 
-    def __init__(self):
-        """Initialize the API client."""
+    def __init__(
+        self,
+        limiter: RateLimiter | None = None,
+        cache: ResponseCache | None = None,
+    ):
+        """Initialize the API client.
+
+        Args:
+            limiter: Application rate limiter (defaults to the global one)
+            cache: Response cache (defaults to the global one)
+        """
         self._client: httpx.AsyncClient | None = None
+        self._rate_limiter = limiter or rate_limiter
+        # Hands out app rate limit tokens by request priority
+        self._scheduler = RequestScheduler(self._rate_limiter)
+        self._cache = cache or response_cache
+        # Per-method limiters, sized from X-Method-Rate-Limit headers
+        self._method_limiters: dict[str, RateLimiter] = {}
+        # Requests currently in flight, keyed by (method, url, params)
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        # Number of callers awaiting each in-flight request
+        self._waiters: dict[asyncio.Task, int] = {}
+        # Requests cancelled while waiting for a token (no call spent) and
+        # after being sent (call spent, response discarded)
+        self._calls_saved = 0
+        self._calls_abandoned = 0
 
     async def _get_client(self) -> httpx.AsyncClient:
         """Get or create the HTTP client."""
@@ -39,11 +77,182 @@ class RiotAPIClient:
         if self._client and not self._client.is_closed:
             await self._client.aclose()
 
+    def stats(self) -> dict:
+        """Requests in flight, waiting for rate limit tokens and cancelled."""
+        return {
+            "in_flight": len(self._inflight),
+            "queued": self._scheduler.queued(),
+            "calls_saved": self._calls_saved,
+            "calls_abandoned": self._calls_abandoned,
+        }
+
+    def _get_method_limiter(self, endpoint: str) -> RateLimiter:
+        """Get the rate limiter for a Riot API method.
+
+        Starts without limits until the first response tells us what they are.
+        """
+        if endpoint not in self._method_limiters:
+            # Method limits live in the same store as the app limit
+            self._method_limiters[endpoint] = RateLimiter(
+                [], store=self._rate_limiter.store, name=endpoint
+            )
+        return self._method_limiters[endpoint]
+
+    async def _update_rate_limits(self, endpoint: str, headers: httpx.Headers) -> None:
+        """Resize app and method buckets from Riot's rate limit headers.
+
+        Both are updated in a single store transaction.
+        """
+        method_limiter = self._get_method_limiter(endpoint)
+        updates = []
+        for limiter, prefix in (
+            (self._rate_limiter, "X-App-Rate-Limit"),
+            (method_limiter, "X-Method-Rate-Limit"),
+        ):
+            limits = parse_rate_limit_header(headers.get(prefix))
+            counts = parse_rate_limit_header(headers.get(f"{prefix}-Count"))
+            if not limits and not counts:
+                continue
+            if limits and limits != limiter.limits:
+                logger.info(f"{prefix} for {endpoint} updated to {limits}")
+            updates.append((limiter, limits, counts))
+        if updates:
+            await apply_server_limits(updates)
+
     async def _request(
         self,
         method: str,
         url: str,
         retries: int = 3,
+        endpoint: str = "",
+        fresh: bool = False,
+        **kwargs,
+    ) -> dict:
+        """Make a cached request, sharing it with concurrent callers.
+
+        Fresh responses are served from the response cache. Otherwise the
+        first caller starts the request; anyone asking for the same method,
+        URL and params while it is in flight awaits the same result (or
+        error) instead of spending another rate limit token. Results may be
+        shared and must not be mutated.
+
+        Each caller waits no longer than its request context's deadline.
+        Once every caller has given up, the request is cancelled and any
+        rate limit tokens it reserved but didn't use are refunded.
+
+        Args:
+            method: HTTP method
+            url: Full URL to request
+            retries: Number of retries for rate limit errors
+            endpoint: Riot API method name, used for per-method rate limits
+            fresh: Skip the cache lookup (the response is still cached)
+            **kwargs: Additional arguments to pass to httpx
+
+        Returns:
+            JSON response as dict
+
+        Raises:
+            SummonerNotFound: If Riot answered 404 (possibly from the cache)
+            DeadlineExceeded: If the deadline passes before the response arrives
+        """
+        params = kwargs.get("params") or {}
+        key = (method, url, tuple(sorted(params.items())))
+
+        cacheable = method == "GET" and self._cache.is_cacheable(endpoint)
+        cache_key = f"{method} {url} {key[2]}"
+        if cacheable and not fresh:
+            cached = await self._cache.get(endpoint, cache_key)
+            if cached == NOT_FOUND:
+                raise SummonerNotFound(url.split("/")[-1])
+            if cached is not MISSING:
+                return cached
+
+        remaining = time_remaining()
+        # Don't queue for a token that can't arrive in time
+        if remaining is not None and (remaining <= 0 or self._rate_limiter.get_wait_time() > remaining):
+            raise DeadlineExceeded()
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._send_request(
+                    method,
+                    url,
+                    retries,
+                    endpoint,
+                    cache_key=cache_key if cacheable else None,
+                    **kwargs,
+                )
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish_request(key, t))
+
+        # Shield so one caller giving up doesn't cancel it for the others
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), remaining)
+        except TimeoutError as e:
+            raise DeadlineExceeded() from e
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # Nobody wants the result any more
+                    if self._inflight.get(key) is task:
+                        del self._inflight[key]
+                    task.cancel()
+
+    def _finish_request(self, key: tuple, task: asyncio.Task) -> None:
+        """Remove a finished request from the in-flight map."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the error as retrieved in case every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+    async def _acquire_tokens(self, method_limiter: RateLimiter) -> float:
+        """Wait for budget and method tokens, then an app token.
+
+        When nobody is queued and every token is free, they are all taken
+        in one store transaction. Otherwise the request context's budget
+        (if any) and the method limit are waited on first, so those waits
+        don't hold app tokens. If cancelled meanwhile, the tokens taken are
+        refunded and the call counted as saved.
+
+        Returns:
+            Seconds spent waiting
+        """
+        budget = request_budget.get()
+        limiters = [method_limiter] if budget is None else [budget, method_limiter]
+        store = self._rate_limiter.store
+        if (
+            not any(self._scheduler.queued().values())
+            and all(limiter.store is store for limiter in limiters)
+            and await acquire_if_free([*limiters, self._rate_limiter])
+        ):
+            return 0.0
+
+        acquired = []
+        try:
+            wait_time = 0.0
+            for limiter in limiters:
+                wait_time += await limiter.acquire()
+                acquired.append(limiter)
+            return wait_time + await self._scheduler.acquire()
+        except asyncio.CancelledError:
+            for limiter in acquired:
+                await limiter.release()
+            self._calls_saved += 1
+            raise
+
+    async def _send_request(
+        self,
+        method: str,
+        url: str,
+        retries: int = 3,
+        endpoint: str = "",
+        cache_key: str | None = None,
         **kwargs,
     ) -> dict:
         """Make a rate-limited request to Riot API with retry logic.
@@ -52,6 +261,8 @@ class RiotAPIClient:
             method: HTTP method
             url: Full URL to request
             retries: Number of retries for rate limit errors
+            endpoint: Riot API method name, used for per-method rate limits
+            cache_key: Key to store a successful response (or 404) under, if cacheable
             **kwargs: Additional arguments to pass to httpx
 
         Returns:
@@ -62,26 +273,42 @@ class RiotAPIClient:
             RiotAPIError: For other API errors
             SummonerNotFound: If summoner not found (404)
         """
+        method_limiter = self._get_method_limiter(endpoint)
+
         for attempt in range(retries + 1):
-            # Wait for rate limit token
-            wait_time = await rate_limiter.acquire()
+            wait_time = await self._acquire_tokens(method_limiter)
             if wait_time > 0:
                 logger.debug(f"Rate limited, waited {wait_time:.2f}s")
 
             client = await self._get_client()
-            response = await client.request(method, url, **kwargs)
+            try:
+                response = await client.request(method, url, **kwargs)
+            except asyncio.CancelledError:
+                self._calls_abandoned += 1
+                raise
+            await self._update_rate_limits(endpoint, response.headers)
 
             if response.status_code == 200:
-                return response.json()
+                data = orjson.loads(response.content)
+                if cache_key is not None:
+                    await self._cache.set(endpoint, cache_key, data)
+                return data
             elif response.status_code == 404:
+                if cache_key is not None:
+                    await self._cache.set_not_found(endpoint, cache_key)
                 raise SummonerNotFound(url.split("/")[-1])
             elif response.status_code == 429:
                 retry_after = int(response.headers.get("Retry-After", 10))
-                # Set global backoff so ALL requests wait
-                rate_limiter.set_backoff(retry_after)
+                # App limit (or unknown): set global backoff so ALL requests wait.
+                # Method/service limits only block this method. Our retry blocks
+                # in acquire() until the backoff expires.
+                limit_type = response.headers.get("X-Rate-Limit-Type", "application")
+                if limit_type == "application":
+                    await self._rate_limiter.set_backoff(retry_after)
+                else:
+                    await method_limiter.set_backoff(retry_after)
                 if attempt < retries:
-                    logger.warning(f"Rate limit hit, global backoff for {retry_after}s, retry {attempt + 1}/{retries}")
-                    await asyncio.sleep(retry_after)
+                    logger.warning(f"Rate limit hit ({limit_type}), backoff for {retry_after}s, retry {attempt + 1}/{retries}")
                     continue
                 else:
                     logger.error(f"Rate limit exceeded after {retries} retries")
@@ -108,7 +335,7 @@ class RiotAPIClient:
             RiotAccount with puuid, game_name, tag_line
         """
         url = f"{settings.REGIONAL_HOST}/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}"
-        data = await self._request("GET", url)
+        data = await self._request("GET", url, endpoint="account-v1.getByRiotId")
         return RiotAccount.model_validate(data)
 
     # Summoner endpoints (Platform)
@@ -122,7 +349,7 @@ class RiotAPIClient:
             SummonerData with summoner details
         """
         url = f"{settings.PLATFORM_HOST}/lol/summoner/v4/summoners/by-puuid/{puuid}"
-        data = await self._request("GET", url)
+        data = await self._request("GET", url, endpoint="summoner-v4.getByPUUID")
         return SummonerData.model_validate(data)
 
     # League endpoints (Platform)
@@ -136,15 +363,16 @@ class RiotAPIClient:
             List of RankedEntry (solo/duo, flex, etc.)
         """
         url = f"{settings.PLATFORM_HOST}/lol/league/v4/entries/by-puuid/{puuid}"
-        data = await self._request("GET", url)
+        data = await self._request("GET", url, endpoint="league-v4.getLeagueEntriesByPUUID")
         return [RankedEntry.model_validate(entry) for entry in data]
 
     # Spectator endpoints (Platform)
-    async def get_live_game(self, puuid: str) -> LiveGameResponse:
+    async def get_live_game(self, puuid: str, fresh: bool = False) -> LiveGameResponse:
         """Get active game for a summoner.
 
         Args:
             puuid: Player PUUID
+            fresh: Ask Riot even if a recent answer is cached
 
         Returns:
             LiveGameResponse with game details
@@ -153,7 +381,9 @@ class RiotAPIClient:
             SummonerNotFound: If player is not in a game
         """
         url = f"{settings.PLATFORM_HOST}/lol/spectator/v5/active-games/by-summoner/{puuid}"
-        data = await self._request("GET", url)
+        data = await self._request(
+            "GET", url, endpoint="spectator-v5.getCurrentGameInfoByPuuid", fresh=fresh
+        )
         return LiveGameResponse.model_validate(data)
 
     # Match endpoints (Regional)
@@ -163,6 +393,7 @@ class RiotAPIClient:
         start: int = 0,
         count: int = 20,
         queue: int | None = None,
+        start_time: int | None = None,
     ) -> list[str]:
         """Get match IDs for a player.
 
@@ -171,15 +402,18 @@ class RiotAPIClient:
             start: Start index for pagination
             count: Number of matches to fetch (max 100)
             queue: Optional queue ID filter (420=ranked solo, 440=ranked flex)
+            start_time: Only matches played at or after this time (epoch seconds)
 
         Returns:
-            List of match IDs
+            List of match IDs, newest first
         """
         url = f"{settings.REGIONAL_HOST}/lol/match/v5/matches/by-puuid/{puuid}/ids"
         params = {"start": start, "count": min(count, 100)}
         if queue:
             params["queue"] = queue
-        data = await self._request("GET", url, params=params)
+        if start_time is not None:
+            params["startTime"] = start_time
+        data = await self._request("GET", url, endpoint="match-v5.getMatchIdsByPUUID", params=params)
         return data
 
     async def get_match(self, match_id: str) -> MatchResponse:
@@ -192,9 +426,25 @@ class RiotAPIClient:
             MatchResponse with full match data
         """
         url = f"{settings.REGIONAL_HOST}/lol/match/v5/matches/{match_id}"
-        data = await self._request("GET", url)
+        data = await self._request("GET", url, endpoint="match-v5.getMatch")
         return MatchResponse.model_validate(data)
 
+    async def get_match_record(self, match_id: str) -> MatchRecord:
+        """Get only the match fields needed for stats extraction.
+
+        Much cheaper than `get_match` since the payload is projected
+        instead of validated. Shares its cache entry with `get_match`.
+
+        Args:
+            match_id: Match ID (e.g., "NA1_1234567890")
+
+        Returns:
+            MatchRecord with the match's player stats
+        """
+        url = f"{settings.REGIONAL_HOST}/lol/match/v5/matches/{match_id}"
+        data = await self._request("GET", url, endpoint="match-v5.getMatch")
+        return MatchRecord(data)
+
 
 # Global client instance
 riot_api = RiotAPIClient()
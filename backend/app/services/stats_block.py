@@ -0,0 +1,221 @@
+"""Columnar, NumPy-backed per-match stats for one or many players.
+
+Per-match stats dicts are convenient for a single analysis but slow in
+bulk. A StatsBlock keeps each field in one array, with every player's
+matches stored as a contiguous segment delimited by `offsets`, so
+aggregates for any number of players are computed with vectorized
+operations instead of Python loops over dicts.
+"""
+
+from collections.abc import Iterable
+
+import numpy as np
+
+from app.algorithms.numeric import round_like_python
+
+MS_PER_DAY = 1000 * 60 * 60 * 24
+
+# Fields kept per match and their array dtypes
+FIELDS: dict[str, np.dtype] = {
+    "champion_id": np.dtype(np.int64),
+    "kills": np.dtype(np.int64),
+    "deaths": np.dtype(np.int64),
+    "assists": np.dtype(np.int64),
+    "win": np.dtype(np.int64),
+    "kda": np.dtype(np.float64),
+    "cs_per_min": np.dtype(np.float64),
+    "gold_per_min": np.dtype(np.float64),
+    "game_creation": np.dtype(np.int64),
+}
+
+# Columns summed per player, in the order of the summed matrix
+_SUMMED = ("win", "kills", "deaths", "assists", "kda", "cs_per_min", "gold_per_min")
+
+# Decimal places of the averaged aggregates
+ROUNDING = {
+    "winrate": 1,
+    "avg_kda": 2,
+    "avg_cs_per_min": 2,
+    "avg_gold_per_min": 2,
+    "games_per_day": 2,
+}
+
+EMPTY_AGGREGATE = {
+    "games_analyzed": 0,
+    "winrate": None,
+    "avg_kda": None,
+    "avg_cs_per_min": None,
+    "avg_gold_per_min": None,
+    "unique_champions": 0,
+    "total_kills": 0,
+    "total_deaths": 0,
+    "total_assists": 0,
+}
+
+
+def _segment_sums(values: np.ndarray, starts: np.ndarray, games: np.ndarray) -> np.ndarray:
+    """Sum each player's rows in match order, like Python's sum() would.
+
+    np.add.reduceat sums pairwise, which changes the last digit of some
+    averages. Instead players are grouped by match count rounded up to a
+    power of two, each group's segments are padded with zeros into a
+    (match, player) matrix, and np.add.accumulate adds its rows strictly in
+    order. Padding at most doubles the rows, and there is one group per
+    power of two rather than one pass per match.
+
+    Args:
+        values: One row per match, one column per summed field
+        starts: First row of each player's segment
+        games: Rows in each player's segment
+
+    Returns:
+        Sums with one row per player
+    """
+    sums = np.zeros((len(games), values.shape[1]))
+    groups = np.ceil(np.log2(np.maximum(games, 1))).astype(np.int64)
+    for group in np.unique(groups[games > 0]):
+        players = np.flatnonzero((groups == group) & (games > 0))
+        counts = games[players]
+        position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        column = np.repeat(np.arange(len(players)), counts)
+        padded = np.zeros((1 << int(group), len(players), values.shape[1]))
+        padded[position, column] = values[np.repeat(starts[players], counts) + position]
+        sums[players] = np.add.accumulate(padded, axis=0)[-1]
+    return sums
+
+
+class StatsBlock:
+    """Per-match stats for several players, one array per field.
+
+    Player `i`'s matches are rows `offsets[i]:offsets[i + 1]` of every column.
+    """
+
+    __slots__ = ("columns", "offsets")
+
+    def __init__(self, columns: dict[str, np.ndarray], offsets: np.ndarray):
+        """Wrap existing arrays.
+
+        Args:
+            columns: One array per name in FIELDS, all the same length
+            offsets: Segment boundaries (length = players + 1, starting at 0)
+
+        Raises:
+            ValueError: If a column is missing or the lengths don't match
+        """
+        missing = FIELDS.keys() - columns.keys()
+        if missing:
+            raise ValueError(f"Missing stats columns: {sorted(missing)}")
+        rows = int(offsets[-1]) if len(offsets) else 0
+        if any(len(columns[name]) != rows for name in FIELDS):
+            raise ValueError("Stats columns must all have one row per match")
+
+        self.columns = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in FIELDS.items()}
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_player_stats(cls, players: Iterable[list[dict]]) -> "StatsBlock":
+        """Build a block from per-player lists of stats dicts.
+
+        Args:
+            players: Stats dicts from MatchService.extract_player_stats, one list per player
+
+        Returns:
+            Block with one segment per player, in the same order
+        """
+        players = list(players)
+        offsets = np.zeros(len(players) + 1, dtype=np.int64)
+        np.cumsum([len(stats) for stats in players], out=offsets[1:])
+
+        rows = [s for stats in players for s in stats]
+        columns = {
+            name: np.fromiter((s[name] for s in rows), dtype=dtype, count=len(rows))
+            for name, dtype in FIELDS.items()
+        }
+        return cls(columns, offsets)
+
+    def __len__(self) -> int:
+        """Number of players."""
+        return len(self.offsets) - 1
+
+    def aggregate_columns(self, rounded: bool = False) -> dict[str, np.ndarray]:
+        """Aggregate statistics for every player, one array per stat.
+
+        Players without matches get zeros; check `games_analyzed`.
+
+        Args:
+            rounded: Round averages like the aggregate dicts do
+
+        Returns:
+            Arrays of length len(self), keyed like the aggregate dicts
+        """
+        players = len(self)
+        games = np.diff(self.offsets)
+        starts = self.offsets[:-1]
+
+        summed = np.stack([self.columns[name].astype(np.float64) for name in _SUMMED], axis=1)
+        sums = _segment_sums(summed, starts, games)
+        wins, kills, deaths, assists, kda, cs, gold = sums.T
+
+        # reduceat needs every start in range, so the column gets a padding
+        # value that doesn't change the result
+        created = self.columns["game_creation"]
+        info = np.iinfo(np.int64)
+        oldest = np.minimum.reduceat(np.append(created, info.max), starts)
+        newest = np.maximum.reduceat(np.append(created, info.min), starts)
+        days_span = np.maximum((newest - oldest) / MS_PER_DAY, 1)
+
+        # Unique champions: sort by (player, champion) and count changes
+        segment = np.repeat(np.arange(players), games)
+        order = np.lexsort((self.columns["champion_id"], segment))
+        champs, segs = self.columns["champion_id"][order], segment[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (champs[1:] != champs[:-1]) | (segs[1:] != segs[:-1])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            columns = {
+                "games_analyzed": games,
+                "winrate": np.where(games > 0, wins / games * 100, 0),
+                "avg_kda": np.where(games > 0, kda / games, 0),
+                "avg_cs_per_min": np.where(games > 0, cs / games, 0),
+                "avg_gold_per_min": np.where(games > 0, gold / games, 0),
+                "unique_champions": np.bincount(segs[first], minlength=players),
+                "total_kills": kills.astype(np.int64),
+                "total_deaths": deaths.astype(np.int64),
+                "total_assists": assists.astype(np.int64),
+                "games_per_day": np.where(games >= 2, games / days_span, 0),
+            }
+
+        if rounded:
+            for name, digits in ROUNDING.items():
+                columns[name] = round_like_python(columns[name], digits)
+        return columns
+
+    def aggregate(self) -> list[dict]:
+        """Aggregate statistics for every player.
+
+        Returns:
+            One dict per player in the format of
+            MatchService.calculate_aggregate_stats
+        """
+        columns = {
+            name: values.tolist() for name, values in self.aggregate_columns(rounded=True).items()
+        }
+
+        results = []
+        for i, games in enumerate(columns["games_analyzed"]):
+            if not games:
+                results.append(dict(EMPTY_AGGREGATE))
+                continue
+            results.append({
+                "games_analyzed": games,
+                "winrate": columns["winrate"][i],
+                "avg_kda": columns["avg_kda"][i],
+                "avg_cs_per_min": columns["avg_cs_per_min"][i],
+                "avg_gold_per_min": columns["avg_gold_per_min"][i],
+                "unique_champions": columns["unique_champions"][i],
+                "total_kills": columns["total_kills"][i],
+                "total_deaths": columns["total_deaths"][i],
+                "total_assists": columns["total_assists"][i],
+                "games_per_day": columns["games_per_day"][i],
+            })
+        return results
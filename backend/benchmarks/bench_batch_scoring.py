@@ -0,0 +1,65 @@
+"""Benchmark: per-player SmurfDetector.analyze vs analyze_batch.
+
+Run from backend/:
+    python -m benchmarks.bench_batch_scoring [--players N]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+from app.algorithms.smurf_detector import SmurfDetector, encode_tiers
+from app.algorithms.thresholds import TIER_BENCHMARKS
+
+
+def make_players(rng: random.Random, count: int) -> tuple[dict[str, np.ndarray], list[int], list]:
+    """Random aggregate columns, levels and tiers for `count` players."""
+    aggregates = {
+        "games_analyzed": np.array([rng.choice([3, 5, 10, 20]) for _ in range(count)]),
+        "winrate": np.array([round(rng.uniform(30, 85), 1) for _ in range(count)]),
+        "unique_champions": np.array([rng.randint(1, 8) for _ in range(count)]),
+        "avg_cs_per_min": np.array([round(rng.uniform(3, 11), 2) for _ in range(count)]),
+        "avg_kda": np.array([round(rng.uniform(0.5, 7), 2) for _ in range(count)]),
+        "games_per_day": np.array([round(rng.uniform(0, 12), 2) for _ in range(count)]),
+    }
+    levels = [rng.randint(30, 800) for _ in range(count)]
+    tiers = [rng.choice([*TIER_BENCHMARKS, None]) for _ in range(count)]
+    return aggregates, levels, tiers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=100_000)
+    args = parser.parse_args()
+
+    detector = SmurfDetector()
+    aggregates, levels, tiers = make_players(random.Random(0), args.players)
+    rows = [
+        {name: values[i].item() for name, values in aggregates.items()}
+        for i in range(args.players)
+    ]
+
+    start = time.perf_counter()
+    for i, stats in enumerate(rows):
+        detector.analyze(stats, levels[i], tiers[i], None, None, None)
+    per_player = time.perf_counter() - start
+
+    start = time.perf_counter()
+    detector.analyze_batch(aggregates, levels, tiers)
+    batch = time.perf_counter() - start
+
+    # Columnar callers (e.g. rescoring jobs) keep levels and tiers as arrays
+    level_array, tier_codes = np.asarray(levels), encode_tiers(tiers)
+    start = time.perf_counter()
+    detector.analyze_batch(aggregates, level_array, tier_codes)
+    columnar = time.perf_counter() - start
+
+    print(f"{args.players} players")
+    print(f"analyze (per player)             {per_player * 1000:10.1f} ms")
+    print(f"analyze_batch (lists)            {batch * 1000:10.1f} ms  {per_player / batch:5.0f}x")
+    print(f"analyze_batch (encoded arrays)   {columnar * 1000:10.1f} ms  {per_player / columnar:5.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Microbenchmark: decode + extract CPU time per match-v5 payload.
+
+Compares the old path (stdlib json, full MatchResponse validation) with
+orjson decoding into a MatchRecord projection.
+
+Run from backend/:
+    python -m benchmarks.bench_match_parsing [--iterations N]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from app.schemas.match import MatchResponse
+from app.services.match_parser import decode_match
+from app.services.match_service import MatchService
+
+
+def make_participant(rng: random.Random, index: int) -> dict:
+    """Build a participant object with roughly the size of a real one."""
+    participant = {
+        "puuid": f"puuid-{index}",
+        "summonerName": f"Player{index}",
+        "riotIdGameName": f"Player{index}",
+        "riotIdTagline": "NA1",
+        "championId": rng.randint(1, 900),
+        "championName": "Annie",
+        "teamId": 100 if index < 5 else 200,
+        "kills": rng.randint(0, 20),
+        "deaths": rng.randint(0, 15),
+        "assists": rng.randint(0, 25),
+        "totalMinionsKilled": rng.randint(0, 300),
+        "neutralMinionsKilled": rng.randint(0, 100),
+        "goldEarned": rng.randint(5000, 20000),
+        "totalDamageDealtToChampions": rng.randint(5000, 50000),
+        "visionScore": rng.randint(0, 80),
+        "win": index < 5,
+    }
+    # Real participants carry ~130 more stat fields plus a challenges object
+    for i in range(130):
+        participant[f"statField{i}"] = rng.randint(0, 100000)
+    participant["challenges"] = {f"challenge{i}": rng.random() * 100 for i in range(120)}
+    participant["perks"] = {
+        "statPerks": {"defense": 5002, "flex": 5008, "offense": 5005},
+        "styles": [
+            {
+                "description": "primaryStyle",
+                "selections": [{"perk": 8000 + i, "var1": 0, "var2": 0, "var3": 0} for i in range(4)],
+                "style": 8000,
+            }
+        ],
+    }
+    return participant
+
+
+def make_match_body(rng: random.Random) -> bytes:
+    """Build a raw match-v5 response body."""
+    participants = [make_participant(rng, i) for i in range(10)]
+    data = {
+        "metadata": {
+            "matchId": "NA1_1234567890",
+            "participants": [p["puuid"] for p in participants],
+        },
+        "info": {
+            "gameCreation": 1703299200000,
+            "gameDuration": 1800,
+            "gameId": 1234567890,
+            "gameMode": "CLASSIC",
+            "gameType": "MATCHED_GAME",
+            "queueId": 420,
+            "participants": participants,
+            "teams": [{"teamId": 100, "win": True}, {"teamId": 200, "win": False}],
+        },
+    }
+    return json.dumps(data).encode()
+
+
+def extract_validated(match: MatchResponse, puuid: str) -> dict | None:
+    """Stats extraction as it was done on a validated MatchResponse."""
+    for p in match.info.participants:
+        if p.puuid == puuid:
+            mins = match.info.game_duration / 60
+            total_cs = p.total_minions_killed + p.neutral_minions_killed
+            return {
+                "match_id": match.metadata.get("matchId", ""),
+                "game_duration_seconds": match.info.game_duration,
+                "game_creation": match.info.game_creation,
+                "queue_id": match.info.queue_id,
+                "champion_id": p.champion_id,
+                "champion_name": p.champion_name,
+                "kills": p.kills,
+                "deaths": p.deaths,
+                "assists": p.assists,
+                "total_cs": total_cs,
+                "gold_earned": p.gold_earned,
+                "total_damage": p.total_damage_dealt_to_champions,
+                "vision_score": p.vision_score,
+                "win": 1 if p.win else 0,
+                "kda": round((p.kills + p.assists) / max(p.deaths, 1), 2),
+                "cs_per_min": round(total_cs / mins, 2),
+                "gold_per_min": round(p.gold_earned / mins, 2),
+            }
+    return None
+
+
+def bench(label: str, fn, iterations: int) -> float:
+    """Run `fn` and report CPU time per call in microseconds."""
+    fn()  # Warm up
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.process_time() - start) / iterations * 1e6
+    print(f"{label:<40} {per_call:10.1f} us/match")
+    return per_call
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    body = make_match_body(random.Random(0))
+    puuid = "puuid-3"
+    service = MatchService()
+    print(f"Payload size: {len(body) / 1024:.0f} KB, {args.iterations} iterations\n")
+
+    # Both paths must produce the same stats
+    before_stats = extract_validated(MatchResponse.model_validate(json.loads(body)), puuid)
+    after_stats = service.extract_player_stats([decode_match(body)], puuid)[0]
+    assert before_stats == after_stats, "Projection changed the extracted stats"
+
+    before = bench(
+        "json + MatchResponse.model_validate",
+        lambda: extract_validated(MatchResponse.model_validate(json.loads(body)), puuid),
+        args.iterations,
+    )
+    after = bench(
+        "orjson + MatchRecord projection",
+        lambda: service.extract_player_stats([decode_match(body)], puuid),
+        args.iterations,
+    )
+    print(f"\nSpeedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,20 @@
 """Pytest fixtures and configuration."""
 
 import pytest
+from app.models.database import Base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    """Session factory for a fresh SQLite database with all tables."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    await engine.dispose()
 
 
 @pytest.fixture
@@ -0,0 +1,229 @@
+"""Unit tests for background analysis jobs."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import httpx
+import pytest
+from app.api.v1 import analysis as analysis_module
+from app.core.exceptions import SummonerNotFound
+from app.main import app
+from app.models.database import AnalysisJob, JobStatus
+from app.schemas.analysis import MatchAnalysisResponse
+from app.services.analysis_jobs import AnalysisJobQueue
+from pydantic import BaseModel
+from sqlalchemy import update
+
+
+class FakeResult(BaseModel):
+    puuid: str
+
+
+async def wait_until_finished(queue: AnalysisJobQueue, job_id: str) -> AnalysisJob:
+    """Poll a job until it completes or fails."""
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job.status in (JobStatus.COMPLETE, JobStatus.FAILED):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+@pytest.fixture
+async def job_queue(session_factory):
+    """A job queue with a runner that reports progress before finishing."""
+    queue = AnalysisJobQueue(session_factory, workers=2)
+
+    async def run(puuid, progress):
+        await progress(1, 2)
+        await asyncio.sleep(0.01)
+        if puuid == "missing":
+            raise SummonerNotFound(puuid)
+        return FakeResult(puuid=puuid)
+
+    queue.register("PLAYER", run)
+    yield queue
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_runs_in_background(job_queue):
+    """Test a submitted job is queued, then completed with its result."""
+    job = await job_queue.submit("PLAYER", "test-puuid-1")
+
+    assert job.status == JobStatus.QUEUED
+    job = await wait_until_finished(job_queue, job.id)
+    assert job.status == JobStatus.COMPLETE
+    assert job.result == {"puuid": "test-puuid-1"}
+    assert (job.players_done, job.players_total) == (1, 2)
+    assert job.started_at is not None and job.finished_at is not None
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error(job_queue):
+    """Test a job whose analysis raises is marked failed with the reason."""
+    job = await job_queue.submit("PLAYER", "missing")
+
+    job = await wait_until_finished(job_queue, job.id)
+    assert job.status == JobStatus.FAILED
+    assert job.error == "Summoner 'missing' not found"
+    assert job.result is None
+
+
+@pytest.mark.asyncio
+async def test_pending_job_reused(job_queue):
+    """Test resubmitting an unfinished analysis returns the same job."""
+    first = await job_queue.submit("PLAYER", "test-puuid-1")
+    second = await job_queue.submit("PLAYER", "test-puuid-1")
+
+    assert second.id == first.id
+    await wait_until_finished(job_queue, first.id)
+    third = await job_queue.submit("PLAYER", "test-puuid-1")
+    assert third.id != first.id
+
+
+@pytest.mark.asyncio
+async def test_unknown_kind_rejected(job_queue):
+    """Test submitting a job nobody can run fails."""
+    with pytest.raises(ValueError):
+        await job_queue.submit("LEAGUE", "test-puuid-1")
+
+
+@pytest.mark.asyncio
+async def test_worker_cap(session_factory):
+    """Test no more jobs run at once than there are workers."""
+    queue = AnalysisJobQueue(session_factory, workers=2)
+    running, peak = 0, 0
+
+    async def run(puuid, progress):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return FakeResult(puuid=puuid)
+
+    queue.register("PLAYER", run)
+    jobs = [await queue.submit("PLAYER", f"test-puuid-{i}") for i in range(5)]
+    for job in jobs:
+        assert (await wait_until_finished(queue, job.id)).status == JobStatus.COMPLETE
+    await queue.stop()
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_unfinished_jobs_resumed_on_start(session_factory):
+    """Test queued jobs and stale running jobs from an earlier process are re-run."""
+    async with session_factory() as session:
+        session.add_all([
+            AnalysisJob(id="queued", kind="PLAYER", puuid="test-puuid-1", status=JobStatus.QUEUED),
+            AnalysisJob(id="orphaned", kind="PLAYER", puuid="test-puuid-2", status=JobStatus.RUNNING),
+            AnalysisJob(id="running", kind="PLAYER", puuid="test-puuid-3", status=JobStatus.RUNNING),
+        ])
+        await session.commit()
+        await session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == "orphaned")
+            .values(updated_at=datetime.now(UTC) - timedelta(hours=1))
+        )
+        await session.commit()
+
+    queue = AnalysisJobQueue(session_factory, workers=1, stale_after=600)
+    queue.register("PLAYER", lambda puuid, progress: asyncio.sleep(0, FakeResult(puuid=puuid)))
+    await queue.start()
+
+    assert (await wait_until_finished(queue, "queued")).status == JobStatus.COMPLETE
+    assert (await wait_until_finished(queue, "orphaned")).status == JobStatus.COMPLETE
+    # Still owned by a live process
+    assert (await queue.get("running")).status == JobStatus.RUNNING
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_long_job_kept_alive(session_factory):
+    """Test a job running longer than the stale timeout is touched, not re-run."""
+    queue = AnalysisJobQueue(session_factory, workers=2, stale_after=0.1)
+    runs = []
+
+    async def run(puuid, progress):
+        runs.append(puuid)
+        await asyncio.sleep(0.4)
+        return FakeResult(puuid=puuid)
+
+    queue.register("PLAYER", run)
+    await queue.start()
+    job = await queue.submit("PLAYER", "test-puuid-1")
+
+    assert (await wait_until_finished(queue, job.id)).status == JobStatus.COMPLETE
+    assert runs == ["test-puuid-1"]
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_orphaned_job_picked_up_while_running(session_factory):
+    """Test a job orphaned after startup is re-run without a restart."""
+    queue = AnalysisJobQueue(session_factory, workers=1, stale_after=0.1)
+    queue.register("PLAYER", lambda puuid, progress: asyncio.sleep(0, FakeResult(puuid=puuid)))
+    await queue.start()
+
+    async with session_factory() as session:
+        session.add(AnalysisJob(id="orphaned", kind="PLAYER", puuid="test-puuid-1", status=JobStatus.RUNNING))
+        await session.commit()
+
+    assert (await wait_until_finished(queue, "orphaned")).status == JobStatus.COMPLETE
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_endpoints(monkeypatch, session_factory):
+    """Test submitting a job answers 202 at once and polling returns its result."""
+    queue = AnalysisJobQueue(session_factory, workers=1)
+    queue.register("PLAYER", analysis_module._run_player_job)
+    monkeypatch.setattr(analysis_module, "analysis_jobs", queue)
+
+    async def analyze_player_by_puuid(puuid):
+        raise SummonerNotFound(puuid)
+
+    monkeypatch.setattr(analysis_module, "analyze_player_by_puuid", analyze_player_by_puuid)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/api/v1/analysis/jobs?puuid=test-puuid-1")
+        assert response.status_code == 202
+        job = response.json()
+        assert job["status"] == "QUEUED"
+        assert job["kind"] == "PLAYER"
+
+        await wait_until_finished(queue, job["id"])
+        response = await client.get(f"/api/v1/analysis/jobs/{job['id']}")
+        assert response.json()["status"] == "FAILED"
+        assert response.json()["error"] == "Summoner 'test-puuid-1' not found"
+
+        response = await client.get("/api/v1/analysis/jobs/nope")
+        assert response.status_code == 404
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_match_job_reports_progress(monkeypatch, session_factory):
+    """Test a MATCH job's progress and result are served by the polling endpoint."""
+    queue = AnalysisJobQueue(session_factory, workers=1)
+    queue.register("MATCH", analysis_module._run_match_job)
+    monkeypatch.setattr(analysis_module, "analysis_jobs", queue)
+
+    async def analyze_match(puuid, progress):
+        for done in range(3):
+            await progress(done, 2)
+        return MatchAnalysisResponse(game_id=1, game_mode="CLASSIC", blue_team=[], red_team=[])
+
+    monkeypatch.setattr(analysis_module, "_analyze_match", analyze_match)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/api/v1/analysis/jobs?puuid=test-puuid-1&kind=MATCH")
+        await wait_until_finished(queue, response.json()["id"])
+        job = (await client.get(f"/api/v1/analysis/jobs/{response.json()['id']}")).json()
+
+    assert job["status"] == "COMPLETE"
+    assert (job["players_done"], job["players_total"]) == (2, 2)
+    assert job["result"]["game_id"] == 1
+    await queue.stop()
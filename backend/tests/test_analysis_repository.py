@@ -0,0 +1,203 @@
+"""Unit tests for analysis memoization."""
+
+import pytest
+from app.api.v1 import analysis as analysis_module
+from app.models.database import Summoner
+from app.schemas.analysis import AnalysisStatus, LobbyPlayer, LobbySkeleton
+from app.schemas.summoner import RankedEntry, SummonerData
+from app.services import analysis_repository as analysis_repository_module
+from app.services import match_service as match_service_module
+from app.services.analysis_repository import AnalysisRepository, analysis_fingerprint
+from app.services.indicator_state import IndicatorStateRepository
+from app.services.match_parser import MatchRecord
+from app.services.match_repository import MatchRepository
+from app.services.match_service import MatchService
+from sqlalchemy import select
+
+
+def test_fingerprint_depends_on_every_input():
+    """Test that changing any input changes the fingerprint."""
+    base = ("NA1_5", 150, "GOLD", "II", 5, 420)
+    fingerprint = analysis_fingerprint(*base)
+
+    assert analysis_fingerprint(*base) == fingerprint
+    for i, changed in enumerate(["NA1_6", 151, "PLATINUM", "I", 10, 440]):
+        args = list(base)
+        args[i] = changed
+        assert analysis_fingerprint(*args) != fingerprint
+
+
+@pytest.fixture
+def analysis_env(monkeypatch, session_factory, mock_summoner_data, mock_ranked_entries, mock_match_data):
+    """Wire the analysis endpoint to a fresh database and a fake Riot API."""
+    match_repository = MatchRepository(session_factory)
+    service = MatchService(repository=match_repository)
+    env = {"match_ids": [f"NA1_{i}" for i in range(5, 0, -1)], "fetched": []}
+
+    async def get_summoner_by_puuid(puuid):
+        return SummonerData.model_validate({**mock_summoner_data, "puuid": puuid})
+
+    async def get_ranked_entries(puuid):
+        return [RankedEntry.model_validate(entry) for entry in mock_ranked_entries]
+
+    async def get_match_ids(puuid, count, queue, start=0, start_time=None):
+        return env["match_ids"][start:start + count]
+
+    async def get_match_record(match_id):
+        env["fetched"].append(match_id)
+        data = {**mock_match_data, "metadata": {**mock_match_data["metadata"], "matchId": match_id}}
+        return MatchRecord(data)
+
+    riot_api = match_service_module.riot_api
+    monkeypatch.setattr(riot_api, "get_summoner_by_puuid", get_summoner_by_puuid)
+    monkeypatch.setattr(riot_api, "get_ranked_entries", get_ranked_entries)
+    monkeypatch.setattr(riot_api, "get_match_ids", get_match_ids)
+    monkeypatch.setattr(riot_api, "get_match_record", get_match_record)
+    monkeypatch.setattr(analysis_module, "match_service", service)
+    monkeypatch.setattr(
+        analysis_module, "analysis_repository", AnalysisRepository(session_factory, match_repository)
+    )
+    monkeypatch.setattr(
+        analysis_module,
+        "indicator_state_repository",
+        IndicatorStateRepository(session_factory, match_repository),
+    )
+    return env
+
+
+@pytest.mark.asyncio
+async def test_repeat_analysis_served_from_store(monkeypatch, analysis_env):
+    """Test that an unchanged player is not re-analyzed."""
+    first = await analysis_module.analyze_player_by_puuid("test-puuid-1")
+    assert len(analysis_env["fetched"]) == 5
+
+    async def no_stats(*args, **kwargs):
+        raise AssertionError("match stats loaded for a stored analysis")
+
+    monkeypatch.setattr(analysis_module.match_service, "load_player_stats", no_stats)
+    analysis_env["fetched"].clear()
+    second = await analysis_module.analyze_player_by_puuid("test-puuid-1", riot_id_name="Player1")
+
+    assert analysis_env["fetched"] == []
+    assert second.riot_id_name == "Player1"
+    assert second.model_dump(exclude={"riot_id_name", "analyzed_at"}) == first.model_dump(
+        exclude={"riot_id_name", "analyzed_at"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_analysis_records_summoner_tier(session_factory, analysis_env):
+    """Test that an analysis stores the player's tier on their summoner row for calibration."""
+    await analysis_module.analyze_player_by_puuid("test-puuid-1")
+
+    async with session_factory() as session:
+        row = (await session.execute(select(Summoner).where(Summoner.puuid == "test-puuid-1"))).scalar_one()
+    assert (row.solo_tier, row.solo_rank) == ("GOLD", "II")
+
+
+@pytest.mark.asyncio
+async def test_new_match_invalidates_stored_analysis(analysis_env):
+    """Test that a new match leads to a fresh analysis."""
+    await analysis_module.analyze_player_by_puuid("test-puuid-1")
+
+    analysis_env["match_ids"].insert(0, "NA1_6")
+    analysis_env["fetched"].clear()
+    result = await analysis_module.analyze_player_by_puuid("test-puuid-1")
+
+    assert analysis_env["fetched"] == ["NA1_6"]
+    assert result.raw_metrics.games_analyzed == 5
+
+
+@pytest.mark.asyncio
+async def test_scoring_code_change_invalidates_stored_analysis(monkeypatch, analysis_env):
+    """Test that results scored by older code are recomputed, then replaced."""
+    await analysis_module.analyze_player_by_puuid("test-puuid-1")
+    monkeypatch.setattr(analysis_repository_module, "SCORING_CODE_HASH", "edited")
+
+    analysis_env["fetched"].clear()
+    result = await analysis_module.analyze_player_by_puuid("test-puuid-1")
+    stored = await analysis_module.analysis_repository.get_analysis(
+        "test-puuid-1",
+        analysis_fingerprint("NA1_5", result.summoner_level, "GOLD", "II", 5, 420),
+    )
+
+    assert stored is not None
+    assert stored.scoring_hash == "edited"
+    assert stored.solo_tier == "GOLD"
+
+
+@pytest.mark.asyncio
+async def test_rescoring_reads_only_new_match_stats(monkeypatch, analysis_env):
+    """Test that stored running totals are caught up instead of re-aggregated."""
+    await analysis_module.analyze_player_by_puuid("test-puuid-1")
+
+    loaded = []
+    load_player_stats = analysis_module.match_service.load_player_stats
+
+    async def recording_load(summoners, match_ids_by_puuid, queue_id):
+        loaded.append(match_ids_by_puuid["test-puuid-1"])
+        return await load_player_stats(summoners, match_ids_by_puuid, queue_id=queue_id)
+
+    monkeypatch.setattr(analysis_module.match_service, "load_player_stats", recording_load)
+    # Re-scoring with no new matches needs no match stats
+    monkeypatch.setattr(analysis_repository_module, "SCORING_CODE_HASH", "edited")
+    await analysis_module.analyze_player_by_puuid("test-puuid-1")
+
+    analysis_env["match_ids"].insert(0, "NA1_6")
+    result = await analysis_module.analyze_player_by_puuid("test-puuid-1")
+
+    assert loaded == [["NA1_6"]]
+    assert result.raw_metrics.games_analyzed == 5
+
+
+@pytest.mark.asyncio
+async def test_lobby_loads_stats_only_for_unmemoized_players(monkeypatch, analysis_env):
+    """Test that a lobby player with a stored analysis loads no match stats."""
+    await analysis_module.analyze_player_by_puuid("test-puuid-1")
+
+    loaded = []
+    load_player_stats = analysis_module.match_service.load_player_stats
+
+    async def recording_load(summoners, match_ids_by_puuid, queue_id):
+        loaded.append(dict(match_ids_by_puuid))
+        return await load_player_stats(summoners, match_ids_by_puuid, queue_id=queue_id)
+
+    monkeypatch.setattr(analysis_module.match_service, "load_player_stats", recording_load)
+    lobby = LobbySkeleton(
+        game_id=1,
+        game_mode="Ranked Solo/Duo",
+        blue_team=[LobbyPlayer(puuid="test-puuid-1", riot_id_name="Player1", riot_id_tag="NA1", team_id=100)],
+        red_team=[LobbyPlayer(puuid="test-puuid-2", riot_id_name="Player2", riot_id_tag="NA1", team_id=200)],
+    )
+    response = await analysis_module._analyze_lobby(lobby)
+
+    assert loaded == [{"test-puuid-2": analysis_env["match_ids"]}]
+    assert response.player_statuses["test-puuid-1"] == AnalysisStatus.COMPLETE
+    assert "test-puuid-2" in response.player_statuses
+
+
+@pytest.mark.asyncio
+async def test_lobby_loads_only_new_match_stats(monkeypatch, analysis_env):
+    """Test that a lobby player with stored running totals loads only their new matches."""
+    await analysis_module.analyze_player_by_puuid("test-puuid-1")
+    analysis_env["match_ids"].insert(0, "NA1_6")
+
+    loaded = []
+    load_player_stats = analysis_module.match_service.load_player_stats
+
+    async def recording_load(summoners, match_ids_by_puuid, queue_id):
+        loaded.append(dict(match_ids_by_puuid))
+        return await load_player_stats(summoners, match_ids_by_puuid, queue_id=queue_id)
+
+    monkeypatch.setattr(analysis_module.match_service, "load_player_stats", recording_load)
+    lobby = LobbySkeleton(
+        game_id=1,
+        game_mode="Ranked Solo/Duo",
+        blue_team=[LobbyPlayer(puuid="test-puuid-1", riot_id_name="Player1", riot_id_tag="NA1", team_id=100)],
+        red_team=[],
+    )
+    response = await analysis_module._analyze_lobby(lobby)
+
+    assert loaded == [{"test-puuid-1": ["NA1_6"]}]
+    assert response.player_statuses == {"test-puuid-1": AnalysisStatus.COMPLETE}
+    assert response.blue_team[0].raw_metrics.games_analyzed == 5
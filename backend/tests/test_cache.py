@@ -0,0 +1,130 @@
+"""Unit tests for the Riot response cache."""
+
+import time
+
+import pytest
+from app.core.cache import MISSING, NOT_FOUND, LRUCache, ResponseCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test that the LRU drops the oldest untouched entry when full."""
+    cache = LRUCache(max_entries=2)
+    now = time.time()
+    cache.set("a", 1, now + 60)
+    cache.set("b", 2, now + 60)
+
+    # Touch "a" so "b" becomes least recently used
+    assert cache.get("a", now) == 1
+    cache.set("c", 3, now + 60)
+
+    assert cache.get("b", now) is MISSING
+    assert cache.get("a", now) == 1
+    assert cache.get("c", now) == 3
+
+
+def test_lru_cache_expires_entries():
+    """Test that expired entries are misses."""
+    cache = LRUCache(max_entries=10)
+    cache.set("a", 1, expires_at=100.0)
+
+    assert cache.get("a", 99.0) == 1
+    assert cache.get("a", 100.0) is MISSING
+    assert len(cache) == 0
+
+
+def test_lru_cache_evicts_by_size():
+    """Test that the LRU drops the oldest entries once over its byte cap."""
+    cache = LRUCache(max_entries=10, max_bytes=100)
+    now = time.time()
+    cache.set("a", 1, now + 60, size=40)
+    cache.set("b", 2, now + 60, size=40)
+    cache.set("c", 3, now + 60, size=40)
+
+    assert cache.get("a", now) is MISSING
+    assert cache.get("b", now) == 2
+    assert cache.size == 80
+
+    # Replacing an entry swaps its size rather than adding to it
+    cache.set("b", 2, now + 60, size=10)
+    assert cache.size == 50
+
+
+@pytest.mark.asyncio
+async def test_response_cache_caps_memory_by_payload_size():
+    """Test that large responses push older ones out of memory."""
+    cache = ResponseCache(max_entries=10, max_bytes=1000, ttls={"match-v5.getMatch": 60})
+    await cache.set("match-v5.getMatch", "k1", {"blob": "x" * 600})
+    await cache.set("match-v5.getMatch", "k2", {"blob": "y" * 600})
+
+    assert await cache.get("match-v5.getMatch", "k1") is MISSING
+    assert await cache.get("match-v5.getMatch", "k2") == {"blob": "y" * 600}
+    assert cache.stats()["memory_bytes"] < 1000
+
+
+@pytest.mark.asyncio
+async def test_response_cache_per_endpoint_ttl():
+    """Test that only endpoints with a TTL are cached."""
+    cache = ResponseCache(max_entries=10, ttls={"match-v5.getMatch": 60, "spectator": 0})
+
+    await cache.set("match-v5.getMatch", "k1", {"id": 1})
+    await cache.set("spectator", "k2", {"id": 2})
+
+    assert cache.is_cacheable("match-v5.getMatch")
+    assert not cache.is_cacheable("spectator")
+    assert await cache.get("match-v5.getMatch", "k1") == {"id": 1}
+    assert await cache.get("spectator", "k2") is MISSING
+
+
+@pytest.mark.asyncio
+async def test_response_cache_disk_tier_shared(tmp_path):
+    """Test that a second cache (another worker or a restart) hits the disk tier."""
+    path = str(tmp_path / "cache.sqlite3")
+    ttls = {"match-v5.getMatch": 60}
+    first = ResponseCache(max_entries=10, db_path=path, ttls=ttls)
+    await first.set("match-v5.getMatch", "k1", {"id": 1})
+
+    second = ResponseCache(max_entries=10, db_path=path, ttls=ttls)
+    assert await second.get("match-v5.getMatch", "k1") == {"id": 1}
+    # Promoted to memory: the next lookup doesn't touch the disk
+    assert await second.get("match-v5.getMatch", "k1") == {"id": 1}
+
+    stats = second.stats()
+    assert stats["hits"] == 2
+    assert stats["disk_hits"] == 1
+    assert stats["misses"] == 0
+
+    first.close()
+    second.close()
+
+
+@pytest.mark.asyncio
+async def test_response_cache_counts_misses():
+    """Test that misses are counted per endpoint."""
+    cache = ResponseCache(max_entries=10, ttls={"match-v5.getMatch": 60})
+
+    assert await cache.get("match-v5.getMatch", "nope") is MISSING
+
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0
+    assert stats["endpoints"] == {"match-v5.getMatch": {"hits": 0, "misses": 1}}
+
+
+@pytest.mark.asyncio
+async def test_response_cache_not_found_jittered_ttl(monkeypatch):
+    """Test that 404s are kept for their TTL plus up to the jitter, only where configured."""
+    cache = ResponseCache(max_entries=10, ttls={}, not_found_ttls={"spectator": (15, 5)})
+    now = time.time()
+    monkeypatch.setattr("app.core.cache.time.time", lambda: now)
+
+    assert cache.is_cacheable("spectator")
+    await cache.set_not_found("spectator", "k1")
+    await cache.set_not_found("match-v5.getMatch", "k2")
+    # Not-found TTLs don't make successful responses cacheable
+    await cache.set("spectator", "k3", {"id": 3})
+
+    assert await cache.get("spectator", "k1") == NOT_FOUND
+    assert await cache.get("match-v5.getMatch", "k2") is MISSING
+    assert await cache.get("spectator", "k3") is MISSING
+    expires_at, _, _ = cache._memory._entries["k1"]
+    assert now + 15 <= expires_at <= now + 20
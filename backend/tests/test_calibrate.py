@@ -0,0 +1,131 @@
+"""Unit tests for the tier benchmark calibration job."""
+
+import json
+
+import numpy as np
+import pytest
+from app.algorithms.smurf_detector import SmurfDetector, load_tier_benchmarks
+from app.algorithms.thresholds import TIER_BENCHMARKS
+from app.jobs.calibrate import calibrate, load_sketches
+from app.models.database import PlayerMatchStats, Summoner
+from app.schemas.summoner import SummonerData
+from app.services.match_repository import MatchRepository
+from sqlalchemy import select
+
+
+@pytest.fixture
+async def stored_stats(session_factory):
+    """Stored games for a Gold and a Diamond player, plus an unranked one."""
+    rng = np.random.default_rng(0)
+    async with session_factory() as session:
+        for puuid, tier, cs in (("gold", "GOLD", 6.0), ("diamond", "DIAMOND", 8.0), ("unranked", None, 1.0)):
+            summoner = Summoner(puuid=puuid, summoner_level=100, profile_icon_id=1, solo_tier=tier)
+            session.add(summoner)
+            await session.flush()
+            for i in range(200):
+                session.add(
+                    PlayerMatchStats(
+                        summoner_id=summoner.id,
+                        match_id=f"{puuid}_{i}",
+                        # Every 10th game is a remake
+                        game_duration_seconds=200 if i % 10 == 0 else 1800,
+                        game_creation=i,
+                        queue_id=420,
+                        champion_id=1,
+                        champion_name="Annie",
+                        kills=0,
+                        deaths=0,
+                        assists=0,
+                        total_minions_killed=0,
+                        gold_earned=0,
+                        total_damage_dealt=0,
+                        vision_score=20,
+                        win=1,
+                        kda=float(rng.normal(3.0, 0.5)),
+                        cs_per_min=0.0 if i % 10 == 0 else float(rng.normal(cs, 0.5)),
+                        gold_per_min=0.0,
+                    )
+                )
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_calibrate_writes_benchmarks_per_tier(session_factory, stored_stats, tmp_path):
+    """Test that benchmarks are the median of each tier's games."""
+    output = tmp_path / "benchmarks.json"
+
+    await calibrate(output, session_factory, chunk_size=64, min_samples=100)
+
+    tiers = json.loads(output.read_text())["tiers"]
+    assert set(tiers) == {"GOLD", "DIAMOND"}
+    # Remakes are left out
+    assert tiers["GOLD"]["games"] == 180
+    assert tiers["GOLD"]["cs"] == pytest.approx(6.0, abs=0.15)
+    assert tiers["DIAMOND"]["cs"] == pytest.approx(8.0, abs=0.15)
+    assert tiers["DIAMOND"]["vision"] == 20
+
+
+@pytest.mark.asyncio
+async def test_calibrate_merges_shard_sketches(session_factory, stored_stats, tmp_path):
+    """Test that saved shard sketches are merged into the calibration."""
+    shard = tmp_path / "shard.json"
+    await calibrate(tmp_path / "a.json", session_factory, min_samples=100, sketches_out=shard)
+
+    benchmarks = await calibrate(
+        tmp_path / "b.json", session_factory, min_samples=100, merge=[shard, shard], read_db=False
+    )
+
+    assert benchmarks["tiers"]["GOLD"]["games"] == 360
+    assert load_sketches(shard)["GOLD"]["cs"].count == 180
+
+
+@pytest.mark.asyncio
+async def test_detector_uses_calibrated_benchmarks(session_factory, stored_stats, tmp_path):
+    """Test that the detector scores against a calibrated file."""
+    output = tmp_path / "benchmarks.json"
+    await calibrate(output, session_factory, min_samples=100)
+
+    benchmarks = load_tier_benchmarks(output)
+    detector = SmurfDetector(benchmarks)
+
+    # Uncalibrated tiers keep their built-in values
+    assert benchmarks["SILVER"] == TIER_BENCHMARKS["SILVER"]
+    assert benchmarks["DIAMOND"]["cs"] != TIER_BENCHMARKS["DIAMOND"]["cs"]
+    assert detector._score_cs_per_min(benchmarks["DIAMOND"]["cs"] + 2.5, "DIAMOND") == 100
+    assert detector._score_cs_per_min(benchmarks["DIAMOND"]["cs"] + 0.4, "DIAMOND") == 0
+
+
+def test_missing_benchmarks_file_uses_defaults(tmp_path):
+    """Test that the built-in benchmarks are used without a calibration."""
+    assert load_tier_benchmarks(tmp_path / "missing.json") == TIER_BENCHMARKS
+
+
+@pytest.mark.parametrize("content", ["{not json", '{"benchmarks": {}}', '{"tiers": []}', '{"tiers": {"GOLD": {"cs": "fast"}}}'])
+def test_malformed_benchmarks_file_uses_defaults(tmp_path, content):
+    """Test that an unreadable calibration falls back to the built-in benchmarks."""
+    path = tmp_path / "benchmarks.json"
+    path.write_text(content)
+
+    assert load_tier_benchmarks(path) == TIER_BENCHMARKS
+
+
+@pytest.mark.asyncio
+async def test_summoner_tier_recorded(session_factory, mock_summoner_data):
+    """Test that the tier calibration buckets by is stored with ranked data and kept without it."""
+    match_repository = MatchRepository(session_factory)
+    summoner = SummonerData.model_validate({**mock_summoner_data, "puuid": "test-puuid-1"})
+
+    async def stored_tier() -> str | None:
+        async with session_factory() as session:
+            row = (await session.execute(select(Summoner).where(Summoner.puuid == "test-puuid-1"))).scalar_one()
+            return row.solo_tier
+
+    async with session_factory() as session:
+        await match_repository.upsert_summoner(session, summoner, solo_rank=("GOLD", "II"))
+        await session.commit()
+    assert await stored_tier() == "GOLD"
+
+    async with session_factory() as session:
+        await match_repository.upsert_summoner(session, summoner)
+        await session.commit()
+    assert await stored_tier() == "GOLD"
@@ -0,0 +1,120 @@
+"""Unit tests for running indicator state."""
+
+import random
+
+import pytest
+from app.schemas.summoner import SummonerData
+from app.services.indicator_state import IndicatorState, IndicatorStateRepository
+from app.services.match_repository import MatchRepository
+from app.services.match_service import MatchService
+
+AVERAGES = ("avg_kda", "avg_cs_per_min", "avg_gold_per_min")
+
+
+def random_history(rng: random.Random, games: int) -> list[dict]:
+    """Random per-match stats, oldest first, with match IDs."""
+    creation = 1_700_000_000_000
+    history = []
+    for i in range(games):
+        creation += rng.randint(10 * 60_000, 3 * 86_400_000)
+        history.append({
+            "match_id": f"NA1_{i}",
+            "game_creation": creation,
+            "champion_id": rng.randint(1, 8),
+            "kills": rng.randint(0, 20),
+            "deaths": rng.randint(0, 15),
+            "assists": rng.randint(0, 25),
+            "win": rng.randint(0, 1),
+            "kda": round(rng.uniform(0, 15), 2),
+            "cs_per_min": round(rng.uniform(0, 12), 2),
+            "gold_per_min": round(rng.uniform(200, 700), 2),
+        })
+    return history
+
+
+@pytest.mark.parametrize("window", [5, 20])
+def test_sliding_state_matches_full_aggregation(window):
+    """Test that one update per match gives the aggregate of the newest matches."""
+    rng = random.Random(window)
+    history = random_history(rng, 300)
+    state = IndicatorState(window)
+
+    for i, stats in enumerate(history):
+        state.add(stats)
+
+        newest = history[max(i + 1 - window, 0) : i + 1][::-1]
+        expected = MatchService().calculate_aggregate_stats(newest)
+        aggregate = state.aggregate()
+        assert state.match_ids == [s["match_id"] for s in newest]
+        assert {k: v for k, v in aggregate.items() if k not in AVERAGES} == {
+            k: v for k, v in expected.items() if k not in AVERAGES
+        }
+        for name in AVERAGES:
+            # Only exact halfway averages (even game counts) may round differently
+            if aggregate["games_analyzed"] % 2:
+                assert aggregate[name] == expected[name]
+            else:
+                assert aggregate[name] == pytest.approx(expected[name], abs=0.0100001)
+
+
+def test_halfway_average_rounds_to_even():
+    """Test that averages on exact halves don't depend on float error."""
+    history = random_history(random.Random(0), 2)
+    history[0]["kda"], history[1]["kda"] = 1.0, 1.69  # Average 1.345
+
+    state = IndicatorState(5)
+    for stats in history:
+        state.add(stats)
+
+    assert state.aggregate()["avg_kda"] == 1.34
+
+
+def test_new_match_ids():
+    """Test working out which matches a state is missing."""
+    state = IndicatorState(3)
+    for stats in random_history(random.Random(0), 3):
+        state.add(stats)
+    assert state.match_ids == ["NA1_2", "NA1_1", "NA1_0"]
+
+    assert state.new_match_ids(["NA1_2", "NA1_1", "NA1_0"]) == []
+    assert state.new_match_ids(["NA1_4", "NA1_3", "NA1_2"]) == ["NA1_4", "NA1_3"]
+    assert state.new_match_ids(["NA1_5", "NA1_4", "NA1_3"]) == ["NA1_5", "NA1_4", "NA1_3"]
+    # A covered match vanished from the listing: rebuild
+    assert state.new_match_ids(["NA1_3", "NA1_2", "NA1_0"]) is None
+
+
+def test_retain_drops_matches():
+    """Test dropping covered matches that are no longer listed."""
+    history = random_history(random.Random(0), 4)
+    state = IndicatorState(4)
+    for stats in history:
+        state.add(stats)
+
+    state.retain(["NA1_3", "NA1_1"])
+
+    expected = MatchService().calculate_aggregate_stats([history[3], history[1]])
+    assert state.match_ids == ["NA1_3", "NA1_1"]
+    assert state.aggregate()["unique_champions"] == expected["unique_champions"]
+    assert state.aggregate()["total_kills"] == expected["total_kills"]
+
+
+@pytest.mark.asyncio
+async def test_state_round_trips_through_store(session_factory, mock_summoner_data):
+    """Test that a stored state is restored as it was saved."""
+    repository = IndicatorStateRepository(session_factory, MatchRepository(session_factory))
+    summoner = SummonerData.model_validate(mock_summoner_data)
+    state = IndicatorState(5, 420)
+    for stats in random_history(random.Random(1), 8):
+        state.add(stats)
+
+    await repository.save_state(summoner, state)
+    state.add(random_history(random.Random(2), 9)[-1])
+    await repository.save_state(summoner, state)
+    restored = await repository.get_state(summoner.puuid, 420, 5)
+
+    assert restored.match_ids == state.match_ids
+    assert restored.champion_counts == state.champion_counts
+    assert restored.aggregate() == state.aggregate()
+    # Another window size or queue has no state
+    assert await repository.get_state(summoner.puuid, 420, 10) is None
+    assert await repository.get_state(summoner.puuid, 440, 5) is None
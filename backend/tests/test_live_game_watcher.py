@@ -0,0 +1,133 @@
+"""Unit tests for long-polling a player's live game."""
+
+import asyncio
+
+import httpx
+import pytest
+from app.api.v1 import analysis as analysis_module
+from app.api.v1 import match as match_module
+from app.core.exceptions import SummonerNotFound
+from app.main import app
+from app.schemas.match import LiveGameResponse
+from app.services.live_game_watcher import LiveGameWatcher
+from app.services.riot_api import riot_api
+
+
+@pytest.fixture
+def live_games(monkeypatch, mock_live_game):
+    """Fake spectator API: players in `started` are in a game; returns the call log."""
+    state = {"started": set(), "calls": []}
+
+    async def get_live_game(puuid, fresh=False):
+        state["calls"].append((puuid, fresh))
+        if puuid not in state["started"]:
+            raise SummonerNotFound(puuid)
+        return LiveGameResponse.model_validate(mock_live_game)
+
+    monkeypatch.setattr(riot_api, "get_live_game", get_live_game)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_waiters_share_one_poller(live_games):
+    """Test concurrent waiters for a player share a poller and all wake on the game."""
+    watcher = LiveGameWatcher(poll_interval=0.02)
+
+    waits = [asyncio.ensure_future(watcher.wait_for_game("test-puuid-1", 5)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    assert watcher.stats()["watched"] == 1
+    assert watcher.stats()["waiting"] == 3
+    live_games["started"].add("test-puuid-1")
+    games = await asyncio.gather(*waits)
+
+    assert all(game.game_id == games[0].game_id for game in games)
+    # One check per waiter up front, then scheduled checks by the single poller
+    polls = [call for call in live_games["calls"] if call[1]]
+    assert len(live_games["calls"]) == 3 + len(polls)
+    assert len(polls) <= 4
+    assert watcher.stats() == {"watched": 0, "waiting": 0, "found": 3, "timed_out": 0}
+
+
+@pytest.mark.asyncio
+async def test_in_game_player_answered_at_once(live_games):
+    """Test a player already in a game is answered without starting a poller."""
+    live_games["started"].add("test-puuid-1")
+    watcher = LiveGameWatcher(poll_interval=10)
+
+    game = await watcher.wait_for_game("test-puuid-1", 5)
+
+    assert game is not None
+    assert live_games["calls"] == [("test-puuid-1", False)]
+    assert watcher.stats()["watched"] == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out_and_stops_poller(live_games):
+    """Test a wait with no game returns None and the poller stops with its last waiter."""
+    watcher = LiveGameWatcher(poll_interval=0.01)
+
+    assert await watcher.wait_for_game("test-puuid-1", 0.05) is None
+    calls = len(live_games["calls"])
+    await asyncio.sleep(0.05)
+
+    assert len(live_games["calls"]) == calls
+    assert watcher.stats() == {"watched": 0, "waiting": 0, "found": 0, "timed_out": 1}
+
+
+@pytest.mark.asyncio
+async def test_short_wait_checks_riot(live_games):
+    """Test a wait shorter than the poll interval still gets a fresh check."""
+    watcher = LiveGameWatcher(poll_interval=10)
+
+    assert await watcher.wait_for_game("test-puuid-1", 0.01) is None
+
+    assert live_games["calls"] == [("test-puuid-1", False), ("test-puuid-1", True)]
+
+
+@pytest.mark.asyncio
+async def test_poller_survives_unexpected_error(live_games, monkeypatch, mock_live_game):
+    """Test an unexpected error in one check doesn't stop the polling."""
+    watcher = LiveGameWatcher(poll_interval=0.01)
+    checks = []
+
+    async def get_live_game(puuid, fresh=False):
+        checks.append(fresh)
+        if len(checks) == 2:
+            raise RuntimeError("boom")
+        if len(checks) < 4:
+            raise SummonerNotFound(puuid)
+        return LiveGameResponse.model_validate(mock_live_game)
+
+    monkeypatch.setattr(riot_api, "get_live_game", get_live_game)
+
+    assert await watcher.wait_for_game("test-puuid-1", 5) is not None
+    assert checks == [False, True, True, True]
+
+
+@pytest.mark.asyncio
+async def test_live_match_endpoint_waits(live_games, monkeypatch):
+    """Test ?wait= answers once the game starts, and 404s if it doesn't start in time."""
+    watcher = LiveGameWatcher(poll_interval=0.02)
+    monkeypatch.setattr(match_module, "live_game_watcher", watcher)
+    monkeypatch.setattr(analysis_module, "live_game_watcher", watcher)
+
+    async def start_game():
+        await asyncio.sleep(0.05)
+        live_games["started"].add("test-puuid-1")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/v1/match/live/test-puuid-2?wait=0.05")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Player is not currently in a game"
+
+        starter = asyncio.ensure_future(start_game())
+        response = await client.get("/api/v1/match/live/test-puuid-1?wait=5")
+        await starter
+        assert response.status_code == 200
+        assert response.json()["participants"]
+
+        response = await client.get("/api/v1/match/live/test-puuid-1?wait=600")
+        assert response.status_code == 422
+
+        response = await client.post("/api/v1/analysis/match?puuid=test-puuid-2&wait=0.05")
+        assert response.status_code == 404
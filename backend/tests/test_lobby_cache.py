@@ -0,0 +1,285 @@
+"""Unit tests for the lobby-level analysis cache."""
+
+import asyncio
+import time
+from datetime import datetime
+
+import httpx
+import pytest
+from app.api.v1 import analysis as analysis_module
+from app.core.exceptions import DeadlineExceeded
+from app.core.scheduler import (
+    RequestPriority,
+    request_context,
+    request_deadline,
+    request_priority,
+)
+from app.main import app
+from app.schemas.analysis import (
+    AnalysisStatus,
+    IndicatorScores,
+    LobbyPlayer,
+    LobbySkeleton,
+    MatchAnalysisResponse,
+    RawMetrics,
+    SmurfAnalysisResponse,
+    SmurfClassification,
+)
+from app.schemas.match import LiveGameResponse
+from app.schemas.summoner import SummonerData
+from app.services import lobby_cache as lobby_cache_module
+from app.services.lobby_cache import LobbyCache
+
+
+def make_lobby(game_id: int = 1) -> LobbySkeleton:
+    return LobbySkeleton(
+        game_id=game_id,
+        game_mode="Ranked Solo/Duo",
+        blue_team=[LobbyPlayer(puuid="test-puuid-1", riot_id_name="Player1", riot_id_tag="NA1", team_id=100)],
+        red_team=[LobbyPlayer(puuid="test-puuid-2", riot_id_name="Player2", riot_id_tag="NA1", team_id=200)],
+    )
+
+
+def make_response(game_id: int = 1, status: AnalysisStatus = AnalysisStatus.COMPLETE) -> MatchAnalysisResponse:
+    return MatchAnalysisResponse(
+        game_id=game_id,
+        game_mode="Ranked Solo/Duo",
+        blue_team=[],
+        red_team=[],
+        player_statuses={"test-puuid-1": AnalysisStatus.COMPLETE, "test-puuid-2": status},
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_analysis():
+    """Test concurrent lookups of a game compute it once, and later ones hit the cache."""
+    cache = LobbyCache()
+    computed = []
+
+    async def compute(progress):
+        computed.append(1)
+        await asyncio.sleep(0.02)
+        return make_response()
+
+    first, second = await asyncio.gather(
+        cache.get_or_compute(make_lobby(), compute),
+        cache.get_or_compute(make_lobby(), compute),
+    )
+    third = await cache.lookup(cache.game_of("test-puuid-2"))
+
+    assert len(computed) == 1
+    assert first is second is third
+    assert cache.stats() == {"hits": 1, "misses": 1, "coalesced": 1, "in_flight": 0, "lobbies": 1}
+
+
+@pytest.mark.asyncio
+async def test_incomplete_analysis_not_cached():
+    """Test a lobby with timed out players is recomputed on the next lookup."""
+    cache = LobbyCache()
+
+    async def compute(progress):
+        return make_response(status=AnalysisStatus.TIMED_OUT)
+
+    await cache.get_or_compute(make_lobby(), compute)
+
+    assert await cache.lookup(1) is None
+    # The players are still mapped to the game, to coalesce with its next analysis
+    assert cache.game_of("test-puuid-1") == 1
+
+
+@pytest.mark.asyncio
+async def test_partial_analysis_cached_briefly(monkeypatch):
+    """Test a lobby with partially analyzed players expires well before the game ends."""
+    monkeypatch.setattr(lobby_cache_module, "PARTIAL_TTL", 0.05)
+    cache = LobbyCache()
+
+    async def compute(progress):
+        return make_response(status=AnalysisStatus.PARTIAL)
+
+    response = await cache.get_or_compute(make_lobby(), compute)
+    assert await cache.lookup(1) is response
+
+    await asyncio.sleep(0.06)
+    assert await cache.lookup(1) is None
+
+
+@pytest.mark.asyncio
+async def test_analysis_drops_callers_deadline():
+    """Test the shared analysis keeps the first caller's priority but not its deadline."""
+    cache = LobbyCache()
+    seen = []
+
+    async def compute(progress):
+        seen.append((request_priority.get(), request_deadline.get()))
+        return make_response()
+
+    with request_context(priority=RequestPriority.PREFETCH, deadline=time.monotonic() + 10):
+        await cache.get_or_compute(make_lobby(), compute)
+
+    assert seen == [(RequestPriority.PREFETCH, None)]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_analysis_keeps_starters_priority():
+    """Test callers joining an analysis in progress don't change its priority."""
+    cache = LobbyCache()
+    seen = []
+
+    async def compute(progress):
+        await asyncio.sleep(0.01)
+        seen.append(request_priority.get())
+        return make_response()
+
+    async def background():
+        with request_context(priority=RequestPriority.BACKGROUND):
+            return await cache.get_or_compute(make_lobby(), compute)
+
+    first, second = await asyncio.gather(background(), cache.get_or_compute(make_lobby(), compute))
+
+    assert first is second
+    assert seen == [RequestPriority.BACKGROUND]
+    assert cache.stats()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_every_caller_gets_progress():
+    """Test callers joining an analysis in progress get its progress from where it is."""
+    cache = LobbyCache()
+    reports = {"first": [], "second": []}
+    joined = asyncio.Event()
+
+    async def compute(progress):
+        await progress(0, 2)
+        await progress(1, 2)
+        await joined.wait()
+        await progress(2, 2)
+        return make_response()
+
+    def recorder(name):
+        async def progress(done, total):
+            reports[name].append((done, total))
+
+        return progress
+
+    async def failing(done, total):
+        raise RuntimeError("database down")
+
+    first = asyncio.ensure_future(cache.get_or_compute(make_lobby(), compute, progress=recorder("first")))
+    await asyncio.sleep(0.01)
+    second = asyncio.ensure_future(cache.get_or_compute(make_lobby(), compute, progress=recorder("second")))
+    third = asyncio.ensure_future(cache.lookup(1, progress=failing))
+    await asyncio.sleep(0.01)
+    joined.set()
+
+    assert await first is await second is await third
+    assert reports == {"first": [(0, 2), (1, 2), (2, 2)], "second": [(1, 2), (2, 2)]}
+
+
+@pytest.mark.asyncio
+async def test_waiter_gives_up_at_its_deadline():
+    """Test a caller past its deadline stops waiting while others still get the analysis."""
+    cache = LobbyCache()
+
+    async def compute(progress):
+        await asyncio.sleep(0.05)
+        return make_response()
+
+    async def impatient():
+        with request_context(deadline=time.monotonic() + 0.01):
+            return await cache.get_or_compute(make_lobby(), compute)
+
+    short, patient = await asyncio.gather(
+        impatient(), cache.get_or_compute(make_lobby(), compute), return_exceptions=True
+    )
+
+    assert isinstance(short, DeadlineExceeded)
+    assert patient.game_id == 1
+    assert await cache.lookup(1) is patient
+
+
+@pytest.mark.asyncio
+async def test_waiter_past_deadline_gets_snapshot():
+    """Test a caller out of time gets the analysis so far when there is one."""
+    cache = LobbyCache()
+    partial = make_response(status=AnalysisStatus.TIMED_OUT)
+
+    async def compute(progress):
+        await asyncio.sleep(1)
+
+    with request_context(deadline=time.monotonic() + 0.01):
+        response = await cache.get_or_compute(make_lobby(), compute, snapshot=lambda: partial)
+
+    assert response is partial
+    assert cache.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_analysis_cancelled_when_every_caller_leaves():
+    """Test a shared analysis nobody waits for any more is cancelled."""
+    cache = LobbyCache()
+    cancelled = []
+
+    async def compute(progress):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    caller = asyncio.create_task(cache.get_or_compute(make_lobby(), compute))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    await asyncio.gather(caller, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert cancelled == [1]
+    assert cache.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_match_endpoint_served_from_lobby_cache(monkeypatch, mock_live_game, mock_summoner_data):
+    """Test a second player of an analyzed lobby is answered without Riot calls."""
+    calls = []
+
+    async def get_live_game(puuid):
+        calls.append(("live_game", puuid))
+        return LiveGameResponse.model_validate(mock_live_game)
+
+    async def get_summoner_by_puuid(puuid):
+        calls.append(("summoner", puuid))
+        return SummonerData.model_validate({**mock_summoner_data, "puuid": puuid})
+
+    async def get_lobby_match_ids(summoners, count, queue_id):
+        return {s.puuid: [] for s in summoners}
+
+    async def analyze_player_by_puuid(puuid, **kwargs):
+        calls.append(("analyze", puuid))
+        return SmurfAnalysisResponse(
+            puuid=puuid,
+            riot_id_name=kwargs["riot_id_name"],
+            riot_id_tag=kwargs["riot_id_tag"],
+            summoner_level=kwargs["summoner"].summoner_level,
+            total_score=10,
+            classification=SmurfClassification.UNLIKELY,
+            confidence="high",
+            indicator_scores=IndicatorScores(),
+            raw_metrics=RawMetrics(games_analyzed=5),
+            analyzed_at=datetime(2024, 1, 1),
+        )
+
+    riot_api = analysis_module.riot_api
+    monkeypatch.setattr(riot_api, "get_live_game", get_live_game)
+    monkeypatch.setattr(riot_api, "get_summoner_by_puuid", get_summoner_by_puuid)
+    monkeypatch.setattr(analysis_module.match_service, "get_lobby_match_ids", get_lobby_match_ids)
+    monkeypatch.setattr(analysis_module, "analyze_player_by_puuid", analyze_player_by_puuid)
+    monkeypatch.setattr(analysis_module, "lobby_cache", LobbyCache())
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        first = await client.post("/api/v1/analysis/match?puuid=test-puuid-1")
+        calls_after_first = len(calls)
+        second = await client.post("/api/v1/analysis/match?puuid=test-puuid-2")
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert calls_after_first == 5  # Live game, then 2 summoners and 2 analyses
+    assert len(calls) == calls_after_first
@@ -0,0 +1,44 @@
+"""Unit tests for match payload projection."""
+
+import json
+
+import pytest
+from app.schemas.match import MatchResponse
+from app.services.match_parser import MatchRecord, decode_match
+
+
+def test_decode_match_matches_validated_fields(mock_match_data):
+    """Test that the projection agrees with full schema validation."""
+    record = decode_match(json.dumps(mock_match_data).encode())
+    full = MatchResponse.model_validate(mock_match_data)
+
+    assert record.match_id == full.metadata["matchId"]
+    assert record.game_duration == full.info.game_duration
+    assert record.game_creation == full.info.game_creation
+    assert record.queue_id == full.info.queue_id
+
+    participant = record.get_participant("test-puuid-1")
+    expected = full.info.participants[0]
+    assert participant.champion_name == expected.champion_name
+    assert participant.total_minions_killed == expected.total_minions_killed
+    assert participant.total_damage_dealt_to_champions == expected.total_damage_dealt_to_champions
+    assert participant.win is True
+
+
+def test_match_record_ignores_unused_fields(mock_match_data):
+    """Test that extra payload fields are dropped, not stored."""
+    mock_match_data["info"]["participants"][0]["challenges"] = {"kda": 6.0}
+    record = MatchRecord(mock_match_data)
+
+    participant = record.get_participant("test-puuid-1")
+    assert not hasattr(participant, "__dict__")
+    assert not hasattr(participant, "challenges")
+    assert record.get_participant("unknown") is None
+
+
+def test_match_record_missing_required_field(mock_match_data):
+    """Test that a payload missing a stat is rejected."""
+    del mock_match_data["info"]["participants"][0]["goldEarned"]
+
+    with pytest.raises(KeyError):
+        MatchRecord(mock_match_data)
@@ -0,0 +1,249 @@
+"""Unit tests for the match store."""
+
+import pytest
+from app.schemas.summoner import SummonerData
+from app.services import match_service as match_service_module
+from app.services.match_parser import MatchRecord
+from app.services.match_repository import MatchRepository
+from app.services.match_service import MatchService
+
+
+@pytest.fixture
+def summoner(mock_summoner_data):
+    """Summoner whose stats are stored."""
+    return SummonerData.model_validate({**mock_summoner_data, "puuid": "test-puuid-1"})
+
+
+@pytest.fixture
+def repository(session_factory):
+    """Match repository on a fresh database."""
+    return MatchRepository(session_factory)
+
+
+def make_match(mock_match_data: dict, match_id: str) -> MatchRecord:
+    """Build a MatchRecord with the given match ID."""
+    data = {**mock_match_data, "metadata": {**mock_match_data["metadata"], "matchId": match_id}}
+    return MatchRecord(data)
+
+
+@pytest.mark.asyncio
+async def test_save_and_load_player_stats(repository, summoner, mock_match_data):
+    """Test that stored stats round-trip to the extract_player_stats format."""
+    stats = MatchService().extract_player_stats(
+        [make_match(mock_match_data, "NA1_1"), make_match(mock_match_data, "NA1_2")],
+        "test-puuid-1",
+    )
+
+    await repository.save_player_stats(summoner, stats)
+    loaded = await repository.get_player_stats("test-puuid-1", ["NA1_1", "NA1_2", "NA1_3"])
+
+    assert set(loaded) == {"NA1_1", "NA1_2"}
+    assert loaded["NA1_1"] == stats[0]
+
+
+@pytest.mark.asyncio
+async def test_save_player_stats_ignores_duplicates(repository, summoner, mock_match_data):
+    """Test that saving an already stored match is a no-op."""
+    stats = MatchService().extract_player_stats([make_match(mock_match_data, "NA1_1")], "test-puuid-1")
+
+    await repository.save_player_stats(summoner, stats)
+    await repository.save_player_stats(summoner, stats)
+
+    assert len(await repository.get_player_stats("test-puuid-1", ["NA1_1"])) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_player_stats_other_player(repository, summoner, mock_match_data):
+    """Test that stats are scoped to the player they were stored for."""
+    stats = MatchService().extract_player_stats([make_match(mock_match_data, "NA1_1")], "test-puuid-1")
+    await repository.save_player_stats(summoner, stats)
+
+    assert await repository.get_player_stats("test-puuid-2", ["NA1_1"]) == {}
+
+
+@pytest.mark.asyncio
+async def test_recent_player_stats_only_fetches_missing(monkeypatch, repository, summoner, mock_match_data):
+    """Test that a repeat analysis costs only the match ID call."""
+    service = MatchService(repository=repository)
+    match_ids = ["NA1_1", "NA1_2"]
+    fetched = []
+
+    async def fake_get_match_ids(puuid, count, queue):
+        return match_ids
+
+    async def fake_get_match(match_id):
+        fetched.append(match_id)
+        return make_match(mock_match_data, match_id)
+
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_ids", fake_get_match_ids)
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_record", fake_get_match)
+
+    first = await service.get_recent_player_stats(summoner, count=2)
+    assert fetched == ["NA1_1", "NA1_2"]
+
+    # A new game shows up: only it is fetched
+    match_ids = ["NA1_3", "NA1_1", "NA1_2"]
+    fetched.clear()
+    second = await service.get_recent_player_stats(summoner, count=3)
+
+    assert fetched == ["NA1_3"]
+    assert [s["match_id"] for s in second] == ["NA1_3", "NA1_1", "NA1_2"]
+    assert second[1:] == first
+
+
+@pytest.mark.asyncio
+async def test_lobby_player_stats_fetches_shared_matches_once(
+    monkeypatch, repository, mock_summoner_data, mock_match_data
+):
+    """Test that matches shared by players in a lobby are fetched once."""
+    service = MatchService(repository=repository)
+    summoners = [
+        SummonerData.model_validate({**mock_summoner_data, "puuid": puuid})
+        for puuid in ("test-puuid-1", "test-puuid-2")
+    ]
+    match_ids = {"test-puuid-1": ["NA1_1", "NA1_2"], "test-puuid-2": ["NA1_2", "NA1_3"]}
+    fetched = []
+
+    # Both players appear in every match
+    match_data = {**mock_match_data, "info": {**mock_match_data["info"]}}
+    second_player = {**match_data["info"]["participants"][0], "puuid": "test-puuid-2", "kills": 1}
+    match_data["info"]["participants"] = [*match_data["info"]["participants"], second_player]
+
+    async def fake_get_match_ids(puuid, count, queue):
+        return match_ids[puuid]
+
+    async def fake_get_match(match_id):
+        fetched.append(match_id)
+        return make_match(match_data, match_id)
+
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_ids", fake_get_match_ids)
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_record", fake_get_match)
+
+    stats = await service.get_lobby_player_stats(summoners, count=2)
+
+    assert sorted(fetched) == ["NA1_1", "NA1_2", "NA1_3"]
+    assert [s["match_id"] for s in stats["test-puuid-1"]] == ["NA1_1", "NA1_2"]
+    assert [s["match_id"] for s in stats["test-puuid-2"]] == ["NA1_2", "NA1_3"]
+    assert all(s["kills"] == 1 for s in stats["test-puuid-2"])
+
+
+def make_timed_match(mock_match_data: dict, match_id: str, game_creation: int) -> MatchRecord:
+    """Build a MatchRecord with the given match ID and creation time."""
+    data = {
+        "metadata": {**mock_match_data["metadata"], "matchId": match_id},
+        "info": {**mock_match_data["info"], "gameCreation": game_creation},
+    }
+    return MatchRecord(data)
+
+
+@pytest.mark.asyncio
+async def test_sync_lists_only_new_matches(monkeypatch, repository, summoner, mock_match_data):
+    """Test that re-syncs ask Riot only for matches since the cursor."""
+    service = MatchService(repository=repository)
+    creation = {"NA1_1": 1_000_000, "NA1_2": 2_000_000, "NA1_3": 3_000_000}
+    history = ["NA1_2", "NA1_1"]
+    listings = []
+    fetched = []
+
+    async def fake_get_match_ids(puuid, count, queue, start=0, start_time=None):
+        listings.append(start_time)
+        if start_time is None:
+            return history[:count]
+        return [m for m in history if creation[m] // 1000 >= start_time][start:start + count]
+
+    async def fake_get_match(match_id):
+        fetched.append(match_id)
+        return make_timed_match(mock_match_data, match_id, creation[match_id])
+
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_ids", fake_get_match_ids)
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_record", fake_get_match)
+
+    await service.get_recent_player_stats(summoner, count=2)
+    assert listings == [None]
+    assert await repository.get_sync_cursor("test-puuid-1", 420) == 2_000_000
+
+    # A new game: listed from the cursor, only it is fetched
+    history.insert(0, "NA1_3")
+    listings.clear()
+    fetched.clear()
+    stats = await service.get_recent_player_stats(summoner, count=2)
+
+    assert listings == [2_000]
+    assert fetched == ["NA1_3"]
+    assert [s["match_id"] for s in stats] == ["NA1_3", "NA1_2"]
+    assert await repository.get_sync_cursor("test-puuid-1", 420) == 3_000_000
+
+    # Nothing new: no match fetches at all
+    fetched.clear()
+    stats = await service.get_recent_player_stats(summoner, count=2)
+
+    assert fetched == []
+    assert [s["match_id"] for s in stats] == ["NA1_3", "NA1_2"]
+
+
+@pytest.mark.asyncio
+async def test_sync_cursor_held_back_on_fetch_failure(monkeypatch, repository, summoner, mock_match_data):
+    """Test that a match that failed to fetch keeps the cursor where it was."""
+    service = MatchService(repository=repository)
+    creation = {"NA1_1": 1_000_000, "NA1_2": 2_000_000}
+    failing = {"NA1_2"}
+
+    async def fake_get_match_ids(puuid, count, queue, start=0, start_time=None):
+        return ["NA1_2", "NA1_1"][:count]
+
+    async def fake_get_match(match_id):
+        if match_id in failing:
+            raise RuntimeError("boom")
+        return make_timed_match(mock_match_data, match_id, creation[match_id])
+
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_ids", fake_get_match_ids)
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_record", fake_get_match)
+
+    await service.get_recent_player_stats(summoner, count=2)
+    assert await repository.get_sync_cursor("test-puuid-1", 420) is None
+
+    failing.clear()
+    await service.get_recent_player_stats(summoner, count=2)
+    assert await repository.get_sync_cursor("test-puuid-1", 420) == 2_000_000
+
+
+@pytest.mark.asyncio
+async def test_match_missed_mid_list_fetched_on_next_sync(monkeypatch, repository, summoner, mock_match_data):
+    """Test that a match that failed to fetch behind a stored newer one is fetched later."""
+    service = MatchService(repository=repository)
+    creation = {f"NA1_{i}": i * 1_000_000 for i in range(1, 7)}
+    history = ["NA1_3", "NA1_2", "NA1_1"]
+    failing = set()
+    fetched = []
+
+    async def fake_get_match_ids(puuid, count, queue, start=0, start_time=None):
+        listed = [m for m in history if start_time is None or creation[m] // 1000 >= start_time]
+        return listed[start:start + count]
+
+    async def fake_get_match(match_id):
+        fetched.append(match_id)
+        if match_id in failing:
+            raise RuntimeError("boom")
+        return make_timed_match(mock_match_data, match_id, creation[match_id])
+
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_ids", fake_get_match_ids)
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_record", fake_get_match)
+
+    await service.get_recent_player_stats(summoner, count=3)
+    assert await repository.get_sync_cursor("test-puuid-1", 420) == 3_000_000
+
+    # Two new games, the older of which fails
+    history[:0] = ["NA1_5", "NA1_4"]
+    failing.add("NA1_4")
+    await service.get_recent_player_stats(summoner, count=3)
+    assert await repository.get_sync_cursor("test-puuid-1", 420) == 3_000_000
+
+    # Another game later: the stored newer match doesn't hide the missing one
+    history.insert(0, "NA1_6")
+    failing.clear()
+    fetched.clear()
+    stats = await service.get_recent_player_stats(summoner, count=3)
+
+    assert sorted(fetched) == ["NA1_4", "NA1_6"]
+    assert [s["match_id"] for s in stats] == ["NA1_6", "NA1_5", "NA1_4"]
+    assert await repository.get_sync_cursor("test-puuid-1", 420) == 6_000_000
@@ -0,0 +1,77 @@
+"""Unit tests for match service."""
+
+import asyncio
+
+import pytest
+from app.services import match_service as match_service_module
+from app.services.match_parser import MatchRecord
+from app.services.match_service import MatchService
+
+
+def make_match(mock_match_data: dict, match_id: str) -> MatchRecord:
+    """Build a MatchRecord with the given match ID."""
+    data = {**mock_match_data, "metadata": {**mock_match_data["metadata"], "matchId": match_id}}
+    return MatchRecord(data)
+
+
+@pytest.mark.asyncio
+async def test_get_recent_matches_fetches_concurrently(monkeypatch, mock_match_data):
+    """Test that match details are fetched in parallel up to the cap, in order."""
+    service = MatchService(max_concurrency=3)
+    in_flight = 0
+    peak = 0
+
+    async def fake_get_match_ids(puuid, count, queue):
+        return [f"NA1_{i}" for i in range(8)]
+
+    async def fake_get_match(match_id):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # Finish out of order
+        await asyncio.sleep(0.01 * (8 - int(match_id.split("_")[1])))
+        in_flight -= 1
+        return make_match(mock_match_data, match_id)
+
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_ids", fake_get_match_ids)
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_record", fake_get_match)
+
+    matches = await service.get_recent_matches("test-puuid-1", count=8)
+
+    assert peak == 3
+    assert [m.match_id for m in matches] == [f"NA1_{i}" for i in range(8)]
+
+
+@pytest.mark.asyncio
+async def test_get_recent_matches_skips_failed_matches(monkeypatch, mock_match_data):
+    """Test that a failed match is skipped without cancelling the others."""
+    service = MatchService()
+
+    async def fake_get_match_ids(puuid, count, queue):
+        return ["NA1_1", "NA1_2", "NA1_3"]
+
+    async def fake_get_match(match_id):
+        if match_id == "NA1_2":
+            raise RuntimeError("boom")
+        await asyncio.sleep(0.01)
+        return make_match(mock_match_data, match_id)
+
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_ids", fake_get_match_ids)
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_record", fake_get_match)
+
+    matches = await service.get_recent_matches("test-puuid-1", count=3)
+
+    assert [m.match_id for m in matches] == ["NA1_1", "NA1_3"]
+
+
+@pytest.mark.asyncio
+async def test_get_recent_matches_id_failure_returns_empty(monkeypatch):
+    """Test that a failed match ID lookup returns no matches."""
+    service = MatchService()
+
+    async def fake_get_match_ids(puuid, count, queue):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(match_service_module.riot_api, "get_match_ids", fake_get_match_ids)
+
+    assert await service.get_recent_matches("test-puuid-1") == []
@@ -0,0 +1,260 @@
+"""Unit tests for the streaming live match analysis."""
+
+import asyncio
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+from app.api.v1 import analysis as analysis_module
+from app.core.exceptions import SummonerNotFound
+from app.main import app
+from app.schemas.analysis import (
+    IndicatorScores,
+    RawMetrics,
+    SmurfAnalysisResponse,
+    SmurfClassification,
+)
+from app.schemas.match import LiveGameResponse
+from app.schemas.summoner import SummonerData
+from app.services.lobby_cache import LobbyCache
+
+# Seconds each player's analysis takes (None = fails)
+DELAYS = {"test-puuid-1": 0.2, "test-puuid-2": 0.0, "test-puuid-3": None}
+
+
+def parse_events(body: str) -> list[tuple[str, dict]]:
+    """Split an SSE body into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def live_match(monkeypatch, mock_live_game, mock_summoner_data):
+    """A live game of three visible players and one in streamer mode.
+
+    Returns the PUUIDs whose analysis got cancelled.
+    """
+    participants = mock_live_game["participants"]
+    game = {
+        **mock_live_game,
+        "participants": [
+            *participants,
+            {**participants[0], "puuid": "test-puuid-3", "riotId": "Player3#NA1", "championId": 3},
+            {**participants[1], "puuid": None, "riotId": "", "championId": 4},
+        ],
+    }
+
+    async def get_live_game(puuid):
+        if puuid != "test-puuid-1":
+            raise SummonerNotFound(puuid)
+        return LiveGameResponse.model_validate(game)
+
+    async def get_summoner_by_puuid(puuid):
+        return SummonerData.model_validate({**mock_summoner_data, "puuid": puuid})
+
+    cancelled = []
+
+    async def analyze_player_by_puuid(puuid, **kwargs):
+        delay = DELAYS[puuid]
+        if delay is None:
+            await asyncio.sleep(0.05)
+            raise RuntimeError("Riot API unavailable")
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(puuid)
+            raise
+        return SmurfAnalysisResponse(
+            puuid=puuid,
+            riot_id_name=kwargs["riot_id_name"],
+            riot_id_tag=kwargs["riot_id_tag"],
+            summoner_level=kwargs["summoner"].summoner_level,
+            champion_id=kwargs["champion_id"],
+            position=kwargs["position"],
+            total_score=10,
+            classification=SmurfClassification.UNLIKELY,
+            confidence="high",
+            indicator_scores=IndicatorScores(),
+            raw_metrics=RawMetrics(games_analyzed=5),
+            analyzed_at=datetime(2024, 1, 1),
+        )
+
+    riot_api = analysis_module.riot_api
+    monkeypatch.setattr(riot_api, "get_live_game", get_live_game)
+    monkeypatch.setattr(riot_api, "get_summoner_by_puuid", get_summoner_by_puuid)
+    monkeypatch.setattr(analysis_module, "analyze_player_by_puuid", analyze_player_by_puuid)
+    monkeypatch.setattr(analysis_module, "lobby_cache", LobbyCache())
+    return cancelled
+
+
+@pytest.fixture
+def lobby_history(monkeypatch):
+    """Empty match histories for the batch endpoint's lobby-wide fetch."""
+
+    async def get_lobby_match_ids(summoners, count, queue_id):
+        return {s.puuid: [] for s in summoners}
+
+    monkeypatch.setattr(analysis_module.match_service, "get_lobby_match_ids", get_lobby_match_ids)
+
+
+async def post(path: str) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.post(path)
+
+
+async def post_then_disconnect(path: str, after: float) -> list[dict]:
+    """POST to the app and hang up after `after` seconds.
+
+    Returns:
+        The ASGI messages the app sent
+    """
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"test")],
+        "server": ("test", 80),
+        "client": ("test", 1234),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(after)
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_lobby_then_players_as_they_finish(live_match):
+    """Test the skeleton comes first and players arrive fastest first."""
+    response = await post("/api/v1/analysis/match/stream?puuid=test-puuid-1")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+
+    assert [event for event, _ in events] == ["lobby", "player", "player_error", "player", "done"]
+    lobby = events[0][1]
+    assert lobby["game_id"] == 1234567890
+    assert [p["puuid"] for p in lobby["blue_team"]] == ["test-puuid-1", "test-puuid-3"]
+    assert [p["riot_id_name"] for p in lobby["red_team"]] == ["Player2"]
+    assert len(lobby["hidden_players"]) == 1 + 3 + 3  # Streamer mode + missing from each team
+    assert events[1][1]["puuid"] == "test-puuid-2"
+    assert events[2][1] == {"puuid": "test-puuid-3", "detail": "Riot API unavailable", "status": "FAILED"}
+    assert events[3][1]["puuid"] == "test-puuid-1"
+    assert events[3][1]["champion_id"] == 1
+    assert events[4][1] == {"analyzed": 2, "failed": 1}
+
+
+@pytest.mark.asyncio
+async def test_stream_not_in_game(live_match):
+    """Test a player outside a game gets a 404 instead of a stream."""
+    response = await post("/api/v1/analysis/match/stream?puuid=test-puuid-2")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_uses_same_lobby(live_match, lobby_history):
+    """Test the non-streaming endpoint still returns every analysis at once."""
+    response = await post("/api/v1/analysis/match?puuid=test-puuid-1")
+
+    body = response.json()
+    assert [p["puuid"] for p in body["blue_team"]] == ["test-puuid-1"]
+    assert [p["puuid"] for p in body["red_team"]] == ["test-puuid-2"]
+    assert len(body["hidden_players"]) == 7
+
+
+@pytest.mark.asyncio
+async def test_stream_deadline_times_out_slow_players(live_match):
+    """Test players still running at the deadline are reported as timed out."""
+    response = await post("/api/v1/analysis/match/stream?puuid=test-puuid-1&deadline=0.1")
+
+    events = parse_events(response.text)
+    assert [event for event, _ in events] == ["lobby", "player", "player_error", "player_error", "done"]
+    assert events[2][1]["status"] == "FAILED"
+    assert events[3][1]["puuid"] == "test-puuid-1"
+    assert events[3][1]["status"] == "TIMED_OUT"
+    assert events[4][1] == {"analyzed": 1, "failed": 2}
+
+
+@pytest.mark.asyncio
+async def test_batch_deadline_returns_partial_lobby(live_match, lobby_history):
+    """Test the batch endpoint returns the players finished by the deadline."""
+    response = await post("/api/v1/analysis/match?puuid=test-puuid-1&deadline=0.1")
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["blue_team"] == []
+    assert [p["puuid"] for p in body["red_team"]] == ["test-puuid-2"]
+    assert body["player_statuses"] == {
+        "test-puuid-1": "TIMED_OUT",
+        "test-puuid-2": "COMPLETE",
+        "test-puuid-3": "FAILED",
+    }
+
+
+@pytest.mark.asyncio
+async def test_deadline_must_be_positive(live_match):
+    """Test a non-positive deadline is rejected."""
+    response = await post("/api/v1/analysis/match?puuid=test-puuid-1&deadline=0")
+
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_disconnect_cancels_analyses(live_match, lobby_history):
+    """Test hanging up on the batch endpoint cancels the analyses still running."""
+    sent = await post_then_disconnect("/api/v1/analysis/match?puuid=test-puuid-1", after=0.1)
+
+    assert sent[0]["status"] == 499
+    assert live_match == ["test-puuid-1"]
+
+
+@pytest.mark.asyncio
+async def test_stream_disconnect_cancels_analyses(live_match):
+    """Test hanging up on the stream stops it and cancels the analyses still running."""
+    sent = await post_then_disconnect("/api/v1/analysis/match/stream?puuid=test-puuid-1", after=0.1)
+
+    body = "".join(m.get("body", b"").decode() for m in sent if m["type"] == "http.response.body")
+    assert [event for event, _ in parse_events(body)] == ["lobby", "player", "player_error"]
+    assert live_match == ["test-puuid-1"]
+
+
+@pytest.mark.asyncio
+async def test_player_disconnect_cancels_analysis(monkeypatch):
+    """Test hanging up on the player endpoint cancels its analysis."""
+    cancelled = []
+
+    async def analyze_player_by_puuid(puuid):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(puuid)
+            raise
+
+    monkeypatch.setattr(analysis_module, "analyze_player_by_puuid", analyze_player_by_puuid)
+    sent = await post_then_disconnect("/api/v1/analysis/player?puuid=test-puuid-1", after=0.05)
+
+    assert sent[0]["status"] == 499
+    assert cancelled == ["test-puuid-1"]
@@ -0,0 +1,63 @@
+"""Unit tests for the Alembic migrations."""
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.command import downgrade
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from app.db.session import ALEMBIC_INI, upgrade_schema
+from app.models.database import Base
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+
+def schema_diff(connection) -> list:
+    """Differences between the database and the models."""
+    return compare_metadata(MigrationContext.configure(connection), Base.metadata)
+
+
+@pytest.mark.asyncio
+async def test_migrations_match_models(tmp_path):
+    """Test migrating an empty database yields exactly the models' schema."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(upgrade_schema)
+        assert await conn.run_sync(schema_diff) == []
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_untracked_database_upgraded(tmp_path):
+    """Test a database created before migrations were tracked is stamped and upgraded."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    def to_baseline(connection):
+        # The tables create_all used to leave, with no revision recorded
+        config = Config(str(ALEMBIC_INI))
+        config.attributes["connection"] = connection
+        downgrade(config, "0001")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(upgrade_schema)
+        await conn.run_sync(to_baseline)
+        await conn.execute(text("DROP TABLE alembic_version"))
+        await conn.execute(
+            text(
+                "INSERT INTO summoners (puuid, summoner_id, riot_id_name, riot_id_tag, summoner_level, "
+                "profile_icon_id) VALUES ('p1', 's1', 'Name', 'NA1', 30, 1)"
+            )
+        )
+        for _ in range(2):
+            await conn.execute(
+                text(
+                    "INSERT INTO smurf_analyses (summoner_id, total_score, classification, games_analyzed) "
+                    "VALUES (1, 10, 'UNLIKELY', 5)"
+                )
+            )
+
+    async with engine.begin() as conn:
+        await conn.run_sync(upgrade_schema)
+        assert await conn.run_sync(schema_diff) == []
+        rows = (await conn.execute(text("SELECT fingerprint, scoring_hash, confidence FROM smurf_analyses"))).all()
+    assert rows == [("legacy-1", "", "low"), ("legacy-2", "", "low")]
+    await engine.dispose()
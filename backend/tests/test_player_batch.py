@@ -0,0 +1,106 @@
+"""Unit tests for the batch player analysis endpoint."""
+
+import asyncio
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+from app.api.v1 import analysis as analysis_module
+from app.main import app
+from app.schemas.analysis import (
+    IndicatorScores,
+    RawMetrics,
+    SmurfAnalysisResponse,
+    SmurfClassification,
+)
+
+# Seconds each player's analysis takes (None = fails)
+DELAYS = {"test-puuid-1": 0.1, "test-puuid-2": 0.0, "test-puuid-3": None, "test-puuid-4": 0.05}
+
+
+@pytest.fixture
+def batch_players(monkeypatch):
+    """Fake player analyses; returns the number of analyses run at once at most."""
+    running = {"now": 0, "peak": 0, "calls": []}
+
+    async def analyze_player_by_puuid(puuid):
+        running["calls"].append(puuid)
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        try:
+            delay = DELAYS[puuid]
+            await asyncio.sleep(0.02 if delay is None else delay)
+            if delay is None:
+                raise RuntimeError("Riot API unavailable")
+            return SmurfAnalysisResponse(
+                puuid=puuid,
+                riot_id_name="Player",
+                riot_id_tag="NA1",
+                summoner_level=100,
+                total_score=10,
+                classification=SmurfClassification.UNLIKELY,
+                confidence="high",
+                indicator_scores=IndicatorScores(),
+                raw_metrics=RawMetrics(games_analyzed=5),
+                analyzed_at=datetime(2024, 1, 1),
+            )
+        finally:
+            running["now"] -= 1
+
+    monkeypatch.setattr(analysis_module, "analyze_player_by_puuid", analyze_player_by_puuid)
+    return running
+
+
+async def post_batch(puuids: list[str], query: str = "") -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.post(f"/api/v1/analysis/players{query}", json={"puuids": puuids})
+
+
+def parse_lines(body: str) -> list[dict]:
+    return [json.loads(line) for line in body.splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_batch_streams_players_as_they_finish(batch_players):
+    """Test one line per distinct player arrives, fastest first."""
+    response = await post_batch(["test-puuid-1", "test-puuid-2", "test-puuid-3", "test-puuid-1"])
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = parse_lines(response.text)
+    assert [line["puuid"] for line in lines] == ["test-puuid-2", "test-puuid-3", "test-puuid-1"]
+    assert [line["status"] for line in lines] == ["COMPLETE", "FAILED", "COMPLETE"]
+    assert lines[1]["detail"] == "Riot API unavailable"
+    assert sorted(batch_players["calls"]) == ["test-puuid-1", "test-puuid-2", "test-puuid-3"]
+
+
+@pytest.mark.asyncio
+async def test_batch_deadline(batch_players):
+    """Test players still running at the deadline get a TIMED_OUT line."""
+    response = await post_batch(["test-puuid-1", "test-puuid-2"], "?deadline=0.05")
+
+    lines = parse_lines(response.text)
+    assert [(line["puuid"], line["status"]) for line in lines] == [
+        ("test-puuid-2", "COMPLETE"),
+        ("test-puuid-1", "TIMED_OUT"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_concurrency_capped(batch_players, monkeypatch):
+    """Test no more players are analyzed at once than the configured cap."""
+    monkeypatch.setattr(analysis_module.settings, "BATCH_ANALYSIS_CONCURRENCY", 2)
+
+    response = await post_batch(list(DELAYS))
+
+    assert len(parse_lines(response.text)) == 4
+    assert batch_players["peak"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_requires_players(batch_players):
+    """Test an empty batch is rejected."""
+    response = await post_batch([])
+
+    assert response.status_code == 422
@@ -0,0 +1,244 @@
+"""Unit tests for background live-game detection of watched players."""
+
+import asyncio
+from datetime import UTC, datetime
+
+import httpx
+import pytest
+from app.api.v1 import match as match_module
+from app.core.cache import ResponseCache
+from app.core.exceptions import SummonerNotFound
+from app.core.rate_limit_store import MemoryRateLimitStore
+from app.core.rate_limiter import RateLimiter, rate_limiter
+from app.core.scheduler import RequestPriority, request_budget, request_priority
+from app.main import app
+from app.models.database import WatchedPlayer
+from app.schemas.analysis import LobbySkeleton, MatchAnalysisResponse
+from app.schemas.match import LiveGameResponse
+from app.services.lobby_cache import LobbyCache
+from app.services.player_watcher import IDLE_DOUBLING_SECONDS, PlayerWatcher, WatchState
+from app.services.riot_api import RiotAPIClient, riot_api
+
+# 2024-01-01 20:00 UTC
+EVENING = datetime(2024, 1, 1, 20, tzinfo=UTC).timestamp()
+MORNING = datetime(2024, 1, 1, 8, tzinfo=UTC).timestamp()
+
+
+@pytest.fixture
+def live_games(monkeypatch, mock_live_game):
+    """Fake spectator API: players in `games` are in that game; returns the call log."""
+    state = {"games": {}, "calls": []}
+
+    async def get_live_game(puuid, fresh=False):
+        state["calls"].append((puuid, request_priority.get(), request_budget.get()))
+        if puuid not in state["games"]:
+            raise SummonerNotFound(puuid)
+        return LiveGameResponse.model_validate({**mock_live_game, "gameId": state["games"][puuid]})
+
+    monkeypatch.setattr(riot_api, "get_live_game", get_live_game)
+    return state
+
+
+def make_watcher(session_factory, lease_seconds: float = 60) -> PlayerWatcher:
+    return PlayerWatcher(
+        session_factory,
+        min_interval=0.02,
+        max_interval=1,
+        in_game_interval=0.02,
+        rate_share=1,
+        lease_seconds=lease_seconds,
+        store=MemoryRateLimitStore(),
+    )
+
+
+@pytest.fixture
+async def watcher(session_factory):
+    """A watcher checking every 20ms that records prefetched players."""
+    player_watcher = make_watcher(session_factory)
+    player_watcher.prefetched = []
+
+    async def prefetch(puuid):
+        player_watcher.prefetched.append((puuid, request_priority.get()))
+
+    player_watcher.set_prefetch(prefetch)
+    yield player_watcher
+    await player_watcher.stop()
+
+
+def test_poll_interval_adapts():
+    """Test checks are less frequent at unusual hours, after idle days and while in game."""
+    watcher = PlayerWatcher(min_interval=30, max_interval=900, in_game_interval=180)
+    evening_player = [0] * 24
+    evening_player[20] = 10
+
+    # No history yet: every hour is checked alike
+    assert watcher.poll_interval(WatchState("p", created_at=EVENING), EVENING) == 30
+    recent = WatchState("p", hour_counts=evening_player, last_game_at=EVENING - 60)
+    assert watcher.poll_interval(recent, EVENING) == 30
+    recent.last_game_at = MORNING - 60
+    assert watcher.poll_interval(recent, MORNING) == 120
+
+    idle = WatchState("p", hour_counts=evening_player, last_game_at=EVENING - 2 * IDLE_DOUBLING_SECONDS)
+    assert watcher.poll_interval(idle, EVENING) == 120
+    idle.last_game_at = EVENING - 30 * IDLE_DOUBLING_SECONDS
+    assert watcher.poll_interval(idle, EVENING) == 900
+
+    assert watcher.poll_interval(WatchState("p", game_id=1), EVENING) == 180
+
+
+@pytest.mark.asyncio
+async def test_new_game_found_and_prefetched(watcher, live_games, session_factory):
+    """Test a watched player's new game is recorded and prefetched once."""
+    await watcher.start()
+    await watcher.watch("test-puuid-1", label="streamer")
+    await asyncio.sleep(0.05)
+    assert watcher.prefetched == []
+
+    live_games["games"]["test-puuid-1"] = 42
+    await asyncio.sleep(0.1)
+
+    assert watcher.prefetched == [("test-puuid-1", RequestPriority.PREFETCH)]
+    for _, priority, budget in live_games["calls"]:
+        assert priority == RequestPriority.PREFETCH
+        assert budget is not None
+    async with session_factory() as session:
+        row = await session.get(WatchedPlayer, "test-puuid-1")
+    assert row.game_id == 42
+    assert row.label == "streamer"
+    assert row.last_game_at is not None
+    assert sum(row.hour_counts) == 1
+
+    # The game ending clears it
+    del live_games["games"]["test-puuid-1"]
+    await asyncio.sleep(0.1)
+    assert watcher.stats()["in_game"] == 0
+    assert watcher.stats()["games_found"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unwatch_stops_checks(watcher, live_games):
+    """Test an unwatched player is no longer checked."""
+    await watcher.start()
+    await watcher.watch("test-puuid-1")
+    await asyncio.sleep(0.05)
+
+    assert await watcher.unwatch("test-puuid-1")
+    calls = len(live_games["calls"])
+    await asyncio.sleep(0.05)
+
+    assert len(live_games["calls"]) == calls
+    assert not await watcher.unwatch("test-puuid-1")
+    assert await watcher.players() == []
+
+
+@pytest.mark.asyncio
+async def test_checks_skipped_over_budget(watcher, live_games):
+    """Test checks are skipped rather than queued while the budget is spent."""
+    while watcher._budget.get_wait_time() <= 0:
+        await watcher._budget.acquire()
+
+    await watcher.start()
+    await watcher.watch("test-puuid-1")
+    await asyncio.sleep(0.05)
+
+    assert live_games["calls"] == []
+    assert watcher.stats()["skipped_over_budget"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_registered_players_resumed_on_start(watcher, live_games, session_factory):
+    """Test players registered by an earlier process are watched on start."""
+    async with session_factory() as session:
+        session.add(WatchedPlayer(puuid="test-puuid-2", hour_counts=[0] * 24))
+        await session.commit()
+    live_games["games"]["test-puuid-2"] = 7
+
+    await watcher.start()
+    await asyncio.sleep(0.1)
+
+    assert watcher.prefetched == [("test-puuid-2", RequestPriority.PREFETCH)]
+
+
+@pytest.mark.asyncio
+async def test_prefetch_draws_from_watch_budget(session_factory, live_games, httpx_mock, mock_match_ids):
+    """Test a prefetch's Riot calls, made through the lobby cache, take watch budget tokens."""
+    watcher = make_watcher(session_factory)
+    await watcher._budget.update_limits([(1, 60.0)])
+    client = RiotAPIClient(RateLimiter(), ResponseCache(max_entries=100))
+    cache = LobbyCache()
+    lobby = LobbySkeleton(game_id=42, game_mode="Ranked Solo/Duo", blue_team=[], red_team=[])
+    httpx_mock.add_response(
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/test-puuid-1/ids?start=0&count=20",
+        json=mock_match_ids,
+    )
+    seen = []
+
+    async def compute(progress):
+        seen.append(request_priority.get())
+        await client.get_match_ids("test-puuid-1")
+        return MatchAnalysisResponse(game_id=42, game_mode="Ranked Solo/Duo", blue_team=[], red_team=[])
+
+    async def prefetch(puuid):
+        await cache.get_or_compute(lobby, compute)
+
+    watcher.set_prefetch(prefetch)
+    live_games["games"]["test-puuid-1"] = 42
+    await watcher.start()
+    try:
+        await watcher.watch("test-puuid-1")
+        await asyncio.sleep(0.1)
+    finally:
+        await watcher.stop()
+
+    assert seen == [RequestPriority.PREFETCH]
+    assert watcher._budget.get_wait_time() > 0
+    assert await cache.lookup(42) is not None
+
+
+def test_budget_shares_app_store():
+    """Test the budget is kept with the app limit, so both are taken in one transaction."""
+    assert PlayerWatcher()._budget.store is rate_limiter.store
+
+
+@pytest.mark.asyncio
+async def test_one_process_watches(live_games, session_factory):
+    """Test only the lease holder checks players, and another takes over when it stops."""
+    first = make_watcher(session_factory, lease_seconds=0.15)
+    second = make_watcher(session_factory, lease_seconds=0.15)
+    await first.start()
+    await second.start()
+    assert first.stats()["leading"]
+    assert not second.stats()["leading"]
+
+    # Registered through the other process, picked up at the next renewal
+    await second.watch("test-puuid-1")
+    await asyncio.sleep(0.1)
+    assert first.stats()["watched"] == 1
+    assert second.stats()["watched"] == 0
+    assert live_games["calls"]
+
+    await first.stop()
+    await asyncio.sleep(0.1)
+    assert second.stats()["leading"]
+    assert second.stats()["watched"] == 1
+    assert second.stats()["checks"] >= 1
+    await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_watch_endpoints(watcher, live_games, monkeypatch):
+    """Test registering, listing and unregistering watched players."""
+    monkeypatch.setattr(match_module, "player_watcher", watcher)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.put("/api/v1/match/watched/test-puuid-1?label=streamer")
+        assert response.status_code == 200
+        assert response.json()["label"] == "streamer"
+
+        response = await client.get("/api/v1/match/watched")
+        assert [player["puuid"] for player in response.json()] == ["test-puuid-1"]
+
+        response = await client.delete("/api/v1/match/watched/test-puuid-1")
+        assert response.status_code == 204
+        response = await client.delete("/api/v1/match/watched/test-puuid-1")
+        assert response.status_code == 404
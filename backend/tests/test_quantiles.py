@@ -0,0 +1,88 @@
+"""Unit tests for the KLL quantile sketch."""
+
+import numpy as np
+import pytest
+from app.algorithms.quantiles import KLLSketch
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+def rank_error(values: np.ndarray, sketch: KLLSketch, q: float) -> float:
+    """Distance between q and the true rank of the sketch's q estimate."""
+    return abs(np.searchsorted(np.sort(values), sketch.quantile(q)) / len(values) - q)
+
+
+@pytest.fixture
+def values():
+    """A skewed stream, like per-game KDA."""
+    return np.random.default_rng(1).lognormal(mean=1.0, sigma=0.6, size=200_000)
+
+
+def test_quantiles_within_rank_error(values):
+    """Test quantile estimates stay within the sketch's rank error."""
+    sketch = KLLSketch(seed=1)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+
+    assert sketch.count == len(values)
+    assert sketch.mean == pytest.approx(values.mean())
+    assert sketch.quantile(0) == values.min()
+    assert sketch.quantile(1) == values.max()
+    for q in QUANTILES:
+        assert rank_error(values, sketch, q) < 0.02
+
+
+def test_memory_stays_bounded(values):
+    """Test the sketch keeps a small fraction of the stream."""
+    sketch = KLLSketch(seed=1)
+    sketch.update(values)
+
+    assert sum(len(level) for level in sketch.to_dict()["levels"]) < 1000
+
+
+def test_merged_shards_match_whole_stream(values):
+    """Test merging shard sketches estimates the combined stream."""
+    shards = []
+    for i, shard in enumerate(np.array_split(values, 4)):
+        sketch = KLLSketch(seed=i)
+        sketch.update(shard)
+        shards.append(sketch)
+
+    merged = KLLSketch(seed=0)
+    for sketch in shards:
+        merged.merge(sketch)
+
+    assert merged.count == len(values)
+    for q in QUANTILES:
+        assert rank_error(values, merged, q) < 0.02
+
+
+def test_serialization_round_trip(values):
+    """Test a restored sketch answers like the original."""
+    sketch = KLLSketch(seed=1)
+    sketch.update(values[:5000])
+
+    restored = KLLSketch.from_dict(sketch.to_dict())
+
+    assert restored.count == sketch.count
+    for q in QUANTILES:
+        assert restored.quantile(q) == sketch.quantile(q)
+
+
+def test_empty_and_nan():
+    """Test empty sketches and NaN input."""
+    sketch = KLLSketch()
+    assert sketch.quantile(0.5) is None
+    assert sketch.mean is None
+
+    sketch.update([1.0, float("nan"), 3.0])
+    assert sketch.count == 2
+    assert sketch.quantile(0.5) in (1.0, 3.0)
+
+
+def test_merge_requires_same_k():
+    """Test sketches with different accuracy can't be merged."""
+    other = KLLSketch(k=100)
+    other.update([1.0])
+    with pytest.raises(ValueError):
+        KLLSketch(k=200).merge(other)
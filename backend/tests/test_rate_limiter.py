@@ -5,13 +5,55 @@ import time
 
 import pytest
 
-from app.core.rate_limiter import RateLimiter
+from app.core.rate_limit_store import (
+    DatabaseRateLimitStore,
+    FileRateLimitStore,
+    MemoryRateLimitStore,
+    TokenBucket,
+    create_rate_limit_store,
+)
+from app.core.rate_limiter import RateLimiter, parse_rate_limit_header
+
+
+def test_default_limits_from_settings():
+    """Test that the default windows come from the rate limit settings."""
+    limiter = RateLimiter()
+
+    assert limiter.limits == [(20, 1.0), (100, 120.0)]
+
+
+def test_token_bucket_allows_burst_up_to_limit():
+    """Test that a full bucket admits `limit` tokens immediately."""
+    bucket = TokenBucket(limit=3, window=10)
+
+    for _ in range(3):
+        assert bucket.next_available(100.0) == 100.0
+        bucket.spend(100.0)
+
+    # Fourth token only frees up once the first one returns
+    assert bucket.next_available(100.0) == 110.0
+    assert bucket.available_tokens(100.0) == 0
+    assert bucket.available_tokens(110.0) == 3
+
+
+def test_token_bucket_refund():
+    """Test that a refund returns a token to the window it was spent in."""
+    bucket = TokenBucket(limit=2, window=10)
+    bucket.spend(100.0)
+    bucket.spend(101.0)
+
+    bucket.refund(101.0)
+    assert bucket.available_tokens(105.0) == 1
+
+    # Tokens of a window that already ended can't be refunded
+    bucket.refund(115.0)
+    assert bucket.available_tokens(105.0) == 1
 
 
 @pytest.mark.asyncio
 async def test_rate_limiter_first_request_no_wait():
     """Test that first request has no wait time."""
-    limiter = RateLimiter()
+    limiter = RateLimiter([(5, 1.0)])
 
     wait_time = await limiter.acquire()
 
@@ -20,66 +62,249 @@ async def test_rate_limiter_first_request_no_wait():
 
 
 @pytest.mark.asyncio
-async def test_rate_limiter_adds_delay_between_requests():
-    """Test that subsequent requests have delays."""
-    limiter = RateLimiter()
+async def test_rate_limiter_burst_not_serialized():
+    """Test that concurrent requests within capacity all go through at once."""
+    limiter = RateLimiter([(10, 1.0), (100, 120.0)])
+
+    start = time.monotonic()
+    wait_times = await asyncio.gather(*[limiter.acquire() for _ in range(10)])
+    elapsed = time.monotonic() - start
+
+    assert all(w == 0 for w in wait_times)
+    assert elapsed < 0.05
 
-    # First request - no wait
-    await limiter.acquire()
 
-    # Immediate second request should wait
+@pytest.mark.asyncio
+async def test_rate_limiter_waits_when_window_exhausted():
+    """Test that requests beyond a window's capacity wait for tokens."""
+    limiter = RateLimiter([(3, 0.2)])
+
+    for _ in range(3):
+        assert await limiter.acquire() == 0
+
+    start = time.monotonic()
     wait_time = await limiter.acquire()
+    elapsed = time.monotonic() - start
 
-    # Should have waited approximately min_interval (50ms)
-    assert wait_time > 0
-    assert wait_time <= 0.1  # Should be around 50ms
+    assert 0.15 <= wait_time <= 0.2
+    assert elapsed >= 0.15
 
 
 @pytest.mark.asyncio
-async def test_rate_limiter_no_wait_after_interval():
-    """Test that no wait needed after interval has passed."""
-    limiter = RateLimiter()
+async def test_rate_limiter_enforces_strictest_window():
+    """Test that the long window limits throughput even when the short one has tokens."""
+    limiter = RateLimiter([(10, 0.1), (4, 0.3)])
 
+    for _ in range(4):
+        await limiter.acquire()
+
+    # Short window has spare tokens, but the long window is exhausted
+    assert limiter.get_wait_time() == pytest.approx(0.3, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_get_wait_time_does_not_reserve():
+    """Test that get_wait_time reports waits without consuming tokens."""
+    limiter = RateLimiter([(2, 1.0)])
+
+    assert limiter.get_wait_time() == 0
+    assert limiter.get_wait_time() == 0
+
+    await limiter.acquire()
     await limiter.acquire()
 
-    # Wait longer than min_interval
-    await asyncio.sleep(0.1)
+    assert limiter.get_wait_time() > 0.9
 
-    wait_time = await limiter.acquire()
 
-    # Should not need to wait since interval passed
-    assert wait_time == 0
+@pytest.mark.asyncio
+async def test_rate_limiter_concurrent_requests_scheduled_in_windows():
+    """Test that an oversized burst is spread across windows."""
+    limiter = RateLimiter([(2, 0.1)])
+
+    start = time.monotonic()
+    wait_times = await asyncio.gather(*[limiter.acquire() for _ in range(6)])
+    elapsed = time.monotonic() - start
+
+    # Two per window: 0, 0, ~0.1, ~0.1, ~0.2, ~0.2
+    assert sorted(wait_times)[:2] == [0, 0]
+    assert elapsed >= 0.18
 
 
 @pytest.mark.asyncio
-async def test_rate_limiter_concurrent_requests():
-    """Test that concurrent requests are serialized."""
-    limiter = RateLimiter()
+async def test_rate_limiter_set_backoff():
+    """Test that set_backoff blocks all requests until it expires."""
+    limiter = RateLimiter([(100, 1.0)])
+
+    await limiter.set_backoff(0.1)
+
+    assert limiter.get_wait_time() > 0.05
 
     start = time.monotonic()
+    await asyncio.gather(limiter.acquire(), limiter.acquire())
+    elapsed = time.monotonic() - start
 
-    # Acquire multiple times concurrently
-    tasks = [limiter.acquire() for _ in range(5)]
-    wait_times = await asyncio.gather(*tasks)
+    assert elapsed >= 0.09
 
+
+@pytest.mark.asyncio
+async def test_rate_limiter_backoff_during_wait():
+    """Test that a backoff set while a request is queued is still honored."""
+    limiter = RateLimiter([(1, 0.05)])
+    await limiter.acquire()
+
+    async def trigger_backoff():
+        await asyncio.sleep(0.01)
+        await limiter.set_backoff(0.15)
+
+    start = time.monotonic()
+    await asyncio.gather(limiter.acquire(), trigger_backoff())
     elapsed = time.monotonic() - start
 
-    # Total time should be at least 4 * min_interval (first request is instant)
-    # 4 * 0.05 = 0.2 seconds minimum
-    assert elapsed >= 0.15  # Allow some tolerance
+    assert elapsed >= 0.15
 
-    # At least some requests should have waited
-    assert sum(wait_times) > 0
+
+@pytest.mark.asyncio
+async def test_rate_limiter_cancelled_wait_refunds_slot():
+    """Test that a caller cancelled while waiting gives its slot back."""
+    limiter = RateLimiter([(1, 0.1)])
+    await limiter.acquire()
+
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    # Next slot is the one the cancelled caller had reserved, not the one after
+    assert limiter.get_wait_time() < 0.1
+
+
+def test_parse_rate_limit_header():
+    """Test parsing of Riot's X-*-Rate-Limit(-Count) headers."""
+    assert parse_rate_limit_header("20:1,100:120") == [(20, 1.0), (100, 120.0)]
+    assert parse_rate_limit_header("2000:10") == [(2000, 10.0)]
+    assert parse_rate_limit_header("bad,5:10") == [(5, 10.0)]
+    assert parse_rate_limit_header(None) == []
 
 
 @pytest.mark.asyncio
-async def test_rate_limiter_set_backoff():
-    """Test that set_backoff is a no-op but doesn't error."""
-    limiter = RateLimiter()
+async def test_rate_limiter_update_limits_keeps_spent_tokens():
+    """Test that resizing a window keeps tokens already spent in it."""
+    limiter = RateLimiter([(5, 10.0)])
+    for _ in range(3):
+        await limiter.acquire()
 
-    # Should not raise
-    limiter.set_backoff(120)
+    await limiter.update_limits([(3, 10.0), (100, 60.0)])
 
-    # Should still work normally
-    wait_time = await limiter.acquire()
-    assert wait_time == 0
+    assert limiter.limits == [(3, 10.0), (100, 60.0)]
+    assert limiter.get_wait_time() > 9
+
+
+def test_rate_limiter_without_limits_never_waits():
+    """Test that a limiter with no known limits admits everything."""
+    limiter = RateLimiter([])
+
+    assert limiter.get_wait_time() == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_sync_counts():
+    """Test that server counts above our own use up local tokens."""
+    limiter = RateLimiter([(10, 10.0), (100, 120.0)])
+
+    await limiter.sync_counts([(4, 10.0), (100, 120.0)])
+
+    # 2-minute window is exhausted by requests made elsewhere
+    assert limiter.get_wait_time() > 100
+
+
+@pytest.mark.asyncio
+async def test_file_store_shared_between_limiters(tmp_path):
+    """Test that limiters in different workers share windows through the file store."""
+    path = str(tmp_path / "rate_limits.json")
+    worker_a = RateLimiter([(4, 10.0)], store=FileRateLimitStore(path))
+    worker_b = RateLimiter([(4, 10.0)], store=FileRateLimitStore(path))
+
+    await worker_a.acquire()
+    await worker_a.acquire()
+    await worker_b.acquire()
+    await worker_b.acquire()
+
+    # Both workers together used the whole window
+    await worker_a.refresh()
+    assert worker_a.get_wait_time() > 9
+
+
+@pytest.mark.asyncio
+async def test_file_store_persists_across_restarts(tmp_path):
+    """Test that a fresh process picks up window counts and learned limits."""
+    path = str(tmp_path / "rate_limits.json")
+    before_restart = RateLimiter([(20, 1.0), (100, 120.0)], store=FileRateLimitStore(path))
+    await before_restart.update_from_server([(20, 1.0), (100, 120.0)], [(1, 1.0), (100, 120.0)])
+
+    after_restart = RateLimiter([(20, 1.0), (100, 120.0)], store=FileRateLimitStore(path))
+    start = time.monotonic()
+    task = asyncio.create_task(after_restart.acquire())
+    await asyncio.sleep(0.05)
+
+    assert not task.done()
+    assert after_restart.get_wait_time() > 100
+    task.cancel()
+    assert time.monotonic() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_database_store_shared_between_limiters(session_factory):
+    """Test that limiters on different hosts share windows through the database."""
+    host_a = RateLimiter([(3, 10.0), (50, 60.0)], store=DatabaseRateLimitStore(session_factory))
+    host_b = RateLimiter([(3, 10.0), (50, 60.0)], store=DatabaseRateLimitStore(session_factory))
+
+    await host_a.acquire()
+    await host_b.acquire()
+    await host_b.acquire()
+
+    await host_a.refresh()
+    assert host_a.get_wait_time() > 9
+
+    # Learned limits are shared too, and removed windows are dropped
+    await host_b.update_limits([(500, 10.0)])
+    await host_a.refresh()
+    assert host_a.limits == [(500, 10.0)]
+
+
+@pytest.mark.asyncio
+async def test_database_store_shares_backoff(session_factory):
+    """Test that a 429 backoff on one host blocks the others."""
+    host_a = RateLimiter([(100, 10.0)], store=DatabaseRateLimitStore(session_factory))
+    host_b = RateLimiter([(100, 10.0)], store=DatabaseRateLimitStore(session_factory))
+
+    await host_a.set_backoff(30)
+    await host_b.refresh()
+
+    assert host_b.get_wait_time() > 29
+
+
+@pytest.mark.asyncio
+async def test_backoff_from_other_host_honored_after_wait(session_factory):
+    """Test a request queued for a slot also waits out a backoff another host set meanwhile."""
+    host_a = RateLimiter([(1, 0.3)], store=DatabaseRateLimitStore(session_factory))
+    host_b = RateLimiter([(1, 0.3)], store=DatabaseRateLimitStore(session_factory))
+    await host_a.acquire()
+
+    start = time.monotonic()
+    task = asyncio.create_task(host_a.acquire())
+    await asyncio.sleep(0.02)
+    await host_b.set_backoff(0.5)
+    await task
+
+    # The slot alone would have come after 0.3s
+    assert time.monotonic() - start > 0.45
+
+
+def test_create_rate_limit_store():
+    """Test that the backend setting selects the store."""
+    assert isinstance(create_rate_limit_store("memory"), MemoryRateLimitStore)
+    assert isinstance(create_rate_limit_store("file"), FileRateLimitStore)
+    assert isinstance(create_rate_limit_store("database"), DatabaseRateLimitStore)
+    with pytest.raises(ValueError):
+        create_rate_limit_store("redis")
@@ -0,0 +1,192 @@
+"""Unit tests for the offline re-scoring job."""
+
+from datetime import UTC, datetime
+
+import pytest
+from app.algorithms.smurf_detector import smurf_detector
+from app.jobs.rescore import format_shift_summary, rescore
+from app.models.database import (
+    PlayerMatchStats,
+    SmurfAnalysis,
+    SmurfClassification,
+    Summoner,
+)
+from app.services.analysis_repository import SCORING_CODE_HASH
+from app.services.match_service import MatchService
+from sqlalchemy import select
+
+# Aggregates of an obvious smurf and of an average player
+SMURF = {
+    "games_analyzed": 20,
+    "winrate": 80.0,
+    "unique_champions": 1,
+    "avg_cs_per_min": 9.0,
+    "avg_kda": 6.0,
+    "games_per_day": 12.0,
+}
+AVERAGE = {
+    "games_analyzed": 20,
+    "winrate": 50.0,
+    "unique_champions": 8,
+    "avg_cs_per_min": 5.5,
+    "avg_kda": 2.0,
+    "games_per_day": 2.0,
+}
+
+
+@pytest.fixture
+async def stored_analyses(session_factory):
+    """Analyses whose stored classification is out of date."""
+    async with session_factory() as session:
+        rows = []
+        for i, (stats, stored_class) in enumerate(
+            [
+                (SMURF, SmurfClassification.UNLIKELY),
+                (AVERAGE, SmurfClassification.LIKELY_SMURF),
+                (AVERAGE, SmurfClassification.UNLIKELY),
+                ({**AVERAGE, "games_analyzed": 3}, SmurfClassification.UNKNOWN),
+                (SMURF, SmurfClassification.UNLIKELY),
+            ]
+        ):
+            summoner = Summoner(puuid=f"puuid-{i}", summoner_level=40, profile_icon_id=1)
+            session.add(summoner)
+            await session.flush()
+            rows.append(
+                SmurfAnalysis(
+                    summoner_id=summoner.id,
+                    fingerprint=f"fp-{i}",
+                    scoring_hash="old-code",
+                    solo_tier="DIAMOND",
+                    total_score=0,
+                    classification=stored_class,
+                    confidence="high",
+                    winrate=stats["winrate"],
+                    unique_champions=stats["unique_champions"],
+                    avg_cs_per_min=stats["avg_cs_per_min"],
+                    avg_kda=stats["avg_kda"],
+                    games_per_day=stats["games_per_day"],
+                    games_analyzed=stats["games_analyzed"],
+                )
+            )
+        session.add_all(rows)
+        await session.commit()
+
+
+async def load(session_factory) -> list[SmurfAnalysis]:
+    async with session_factory() as session:
+        result = await session.execute(select(SmurfAnalysis).order_by(SmurfAnalysis.id))
+        return list(result.scalars())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [0, 2])
+async def test_rescore_updates_rows_and_counts_shifts(session_factory, stored_analyses, workers):
+    """Test that every row is re-scored in chunks and shifts are counted."""
+    shifts = await rescore(session_factory, chunk_size=2, workers=workers)
+
+    assert shifts[("UNLIKELY", "LIKELY_SMURF")] == 2
+    assert shifts[("LIKELY_SMURF", "UNLIKELY")] == 1
+    assert shifts[("UNLIKELY", "UNLIKELY")] == 1
+    assert shifts[("UNKNOWN", "UNKNOWN")] == 1
+
+    rows = await load(session_factory)
+    assert all(row.scoring_hash == SCORING_CODE_HASH for row in rows)
+
+    expected = smurf_detector.analyze(SMURF, 40, "DIAMOND", None, None, None)
+    assert rows[0].classification == SmurfClassification.LIKELY_SMURF
+    assert rows[0].total_score == expected.total_score
+    assert rows[0].winrate_score == expected.indicator_scores.winrate
+    # Too few games: no indicator scores
+    assert rows[3].classification == SmurfClassification.UNKNOWN
+    assert rows[3].kda_score is None
+
+
+@pytest.mark.asyncio
+async def test_rescore_dry_run_leaves_rows(session_factory, stored_analyses):
+    """Test that a dry run only reports."""
+    shifts = await rescore(session_factory, chunk_size=10, workers=0, dry_run=True)
+
+    assert sum(shifts.values()) == 5
+    rows = await load(session_factory)
+    assert all(row.scoring_hash == "old-code" for row in rows)
+    assert rows[0].classification == SmurfClassification.UNLIKELY
+
+
+def match_stats(summoner_id: int, i: int, ended: datetime, queue_id: int = 420) -> dict:
+    """Stored stats of a 30-minute match ending at `ended`."""
+    return {
+        "summoner_id": summoner_id,
+        "match_id": f"NA1_{i}",
+        "game_duration_seconds": 1800,
+        "game_creation": int(ended.timestamp() * 1000) - 1_800_000,
+        "queue_id": queue_id,
+        "champion_id": i % 3,
+        "champion_name": "Champ",
+        "kills": i,
+        "deaths": 2,
+        "assists": 3,
+        "total_minions_killed": 200,
+        "gold_earned": 10_000,
+        "total_damage_dealt": 20_000,
+        "vision_score": 20,
+        "win": i % 2,
+        "kda": round((i + 3) / 2, 2),
+        "cs_per_min": 6.0 + i / 10,
+        "gold_per_min": 350.5 + i,
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [0, 2])
+async def test_reaggregate_rebuilds_from_stored_matches(session_factory, workers):
+    """Test that aggregates are rebuilt from the matches each analysis covered."""
+    analyzed_at = datetime(2024, 1, 10, tzinfo=UTC)
+    async with session_factory() as session:
+        player = Summoner(puuid="puuid-0", summoner_level=40, profile_icon_id=1)
+        unknown = Summoner(puuid="puuid-1", summoner_level=40, profile_icon_id=1)
+        session.add_all([player, unknown])
+        await session.flush()
+        stats = [match_stats(player.id, i, datetime(2024, 1, 1 + i, tzinfo=UTC)) for i in range(5)]
+        # Played after the analysis, and in another queue
+        stats.append(match_stats(player.id, 5, datetime(2024, 1, 11, tzinfo=UTC)))
+        stats.append(match_stats(player.id, 6, datetime(2024, 1, 9, tzinfo=UTC), queue_id=440))
+        session.add_all(PlayerMatchStats(**row) for row in stats)
+        session.add_all(
+            SmurfAnalysis(
+                summoner_id=summoner.id,
+                fingerprint="fp",
+                scoring_hash="old-code",
+                solo_tier="DIAMOND",
+                total_score=0,
+                classification=SmurfClassification.UNLIKELY,
+                confidence="high",
+                created_at=analyzed_at,
+                **{**SMURF, "games_analyzed": 3},
+            )
+            for summoner in (player, unknown)
+        )
+        await session.commit()
+
+    await rescore(session_factory, chunk_size=10, workers=workers, reaggregate=True)
+
+    expected = MatchService().calculate_aggregate_stats([stats[4], stats[3], stats[2]])
+    rows = await load(session_factory)
+    assert rows[0].games_analyzed == 3
+    assert rows[0].winrate == expected["winrate"]
+    assert rows[0].avg_kda == expected["avg_kda"]
+    assert rows[0].avg_cs_per_min == expected["avg_cs_per_min"]
+    assert rows[0].unique_champions == expected["unique_champions"]
+    assert rows[0].games_per_day == expected["games_per_day"]
+    assert rows[0].total_score == smurf_detector.analyze(expected, 40, "DIAMOND", None, None, None).total_score
+    # No stored matches: nothing left to score
+    assert rows[1].games_analyzed == 0
+    assert rows[1].winrate is None
+    assert rows[1].classification == SmurfClassification.UNKNOWN
+
+
+def test_format_shift_summary():
+    """Test the summary counts moved analyses."""
+    summary = format_shift_summary({("UNLIKELY", "LIKELY_SMURF"): 1, ("UNLIKELY", "UNLIKELY"): 3})
+
+    assert "Rescored 4 analyses" in summary
+    assert "Moved: 1 (25.0%)" in summary
@@ -1,16 +1,23 @@
 """Unit tests for Riot API client."""
 
+import asyncio
+import time
+
 import pytest
 from httpx import Response
 
-from app.core.exceptions import RateLimitExceeded, RiotAPIError, SummonerNotFound
+from app.core.cache import ResponseCache
+from app.core.exceptions import DeadlineExceeded, RateLimitExceeded, RiotAPIError, SummonerNotFound
+from app.core.rate_limit_store import MemoryRateLimitStore
+from app.core.rate_limiter import RateLimiter
+from app.core.scheduler import request_context
 from app.services.riot_api import RiotAPIClient
 
 
 @pytest.fixture
 def riot_client():
-    """Create a fresh Riot API client for each test."""
-    return RiotAPIClient()
+    """Create a fresh Riot API client (own rate limiter, memory-only cache) for each test."""
+    return RiotAPIClient(RateLimiter(), ResponseCache(max_entries=100))
 
 
 @pytest.mark.asyncio
@@ -101,6 +108,22 @@ async def test_get_live_game_not_in_game(httpx_mock, riot_client):
         await riot_client.get_live_game("test-puuid-1")
 
 
+@pytest.mark.asyncio
+async def test_get_live_game_not_in_game_cached(httpx_mock, riot_client):
+    """Test a repeat not-in-game lookup is answered from the cache unless fresh."""
+    url = "https://na1.api.riotgames.com/lol/spectator/v5/active-games/by-summoner/test-puuid-1"
+    httpx_mock.add_response(url=url, status_code=404, is_reusable=True)
+
+    for _ in range(2):
+        with pytest.raises(SummonerNotFound):
+            await riot_client.get_live_game("test-puuid-1")
+    assert len(httpx_mock.get_requests()) == 1
+
+    with pytest.raises(SummonerNotFound):
+        await riot_client.get_live_game("test-puuid-1", fresh=True)
+    assert len(httpx_mock.get_requests()) == 2
+
+
 @pytest.mark.asyncio
 async def test_get_match_ids_success(httpx_mock, riot_client, mock_match_ids):
     """Test successful match IDs lookup."""
@@ -128,6 +151,19 @@ async def test_get_match_ids_with_queue_filter(httpx_mock, riot_client, mock_mat
     assert len(result) == 3
 
 
+@pytest.mark.asyncio
+async def test_get_match_ids_with_start_time(httpx_mock, riot_client, mock_match_ids):
+    """Test match IDs lookup limited to games since a start time."""
+    httpx_mock.add_response(
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/test-puuid-1/ids?start=0&count=100&queue=420&startTime=1703299200",
+        json=mock_match_ids,
+    )
+
+    result = await riot_client.get_match_ids("test-puuid-1", count=100, queue=420, start_time=1703299200)
+
+    assert len(result) == 3
+
+
 @pytest.mark.asyncio
 async def test_get_match_success(httpx_mock, riot_client, mock_match_data):
     """Test successful match lookup."""
@@ -144,6 +180,22 @@ async def test_get_match_success(httpx_mock, riot_client, mock_match_data):
     assert result.info.participants[0].kills == 10
 
 
+@pytest.mark.asyncio
+async def test_get_match_record_shares_cache(httpx_mock, riot_client, mock_match_data):
+    """Test that the projected lookup reuses the cached full match."""
+    httpx_mock.add_response(
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/NA1_1234567890",
+        json=mock_match_data,
+    )
+
+    await riot_client.get_match("NA1_1234567890")
+    record = await riot_client.get_match_record("NA1_1234567890")
+
+    assert record.match_id == "NA1_1234567890"
+    assert record.get_participant("test-puuid-1").kills == 10
+    assert len(httpx_mock.get_requests()) == 1
+
+
 @pytest.mark.asyncio
 @pytest.mark.httpx_mock(can_send_already_matched_responses=True)
 async def test_rate_limit_exceeded(httpx_mock, riot_client):
@@ -162,6 +214,281 @@ async def test_rate_limit_exceeded(httpx_mock, riot_client):
     assert exc_info.value.status_code == 429
 
 
+@pytest.mark.asyncio
+async def test_rate_limits_learned_from_headers(httpx_mock, riot_client, mock_match_data):
+    """Test that app and method limits are resized from response headers."""
+    httpx_mock.add_response(
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/NA1_1234567890",
+        json=mock_match_data,
+        headers={
+            "X-App-Rate-Limit": "500:10,30000:600",
+            "X-App-Rate-Limit-Count": "1:10,1:600",
+            "X-Method-Rate-Limit": "2000:10",
+            "X-Method-Rate-Limit-Count": "1:10",
+        },
+    )
+
+    await riot_client.get_match("NA1_1234567890")
+
+    assert riot_client._rate_limiter.limits == [(500, 10.0), (30000, 600.0)]
+    assert riot_client._method_limiters["match-v5.getMatch"].limits == [(2000, 10.0)]
+    # Other methods keep their own (still unknown) limits
+    assert riot_client._get_method_limiter("league-v4.getLeagueEntriesByPUUID").limits == []
+
+
+@pytest.mark.asyncio
+async def test_request_makes_two_store_transactions(httpx_mock, mock_match_data):
+    """Test a request takes its tokens in one store transaction and applies headers in another."""
+    store = MemoryRateLimitStore()
+    transactions = []
+    transact_many = store.transact_many
+
+    async def counting_transact_many(default_limits, update):
+        transactions.append(sorted(default_limits))
+        return await transact_many(default_limits, update)
+
+    store.transact_many = counting_transact_many
+    riot_client = RiotAPIClient(RateLimiter(store=store), ResponseCache(max_entries=100))
+    httpx_mock.add_response(
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/NA1_1234567890",
+        json=mock_match_data,
+        headers={
+            "X-App-Rate-Limit": "500:10",
+            "X-App-Rate-Limit-Count": "1:10",
+            "X-Method-Rate-Limit": "2000:10",
+            "X-Method-Rate-Limit-Count": "1:10",
+        },
+    )
+
+    await riot_client.get_match("NA1_1234567890")
+
+    assert transactions == [["app", "match-v5.getMatch"]] * 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_counts_synced_from_headers(httpx_mock, riot_client, mock_match_ids):
+    """Test that server-side counts we did not make ourselves use up tokens."""
+    httpx_mock.add_response(
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/test-puuid-1/ids?start=0&count=20",
+        json=mock_match_ids,
+        headers={
+            "X-Method-Rate-Limit": "5:10",
+            "X-Method-Rate-Limit-Count": "5:10",
+        },
+    )
+
+    await riot_client.get_match_ids("test-puuid-1")
+
+    method_limiter = riot_client._method_limiters["match-v5.getMatchIdsByPUUID"]
+    assert method_limiter.get_wait_time() > 9
+
+
+@pytest.mark.asyncio
+@pytest.mark.httpx_mock(can_send_already_matched_responses=True)
+async def test_method_rate_limit_does_not_block_app(httpx_mock, riot_client):
+    """Test that a method 429 backs off only that method."""
+    httpx_mock.add_response(
+        url="https://americas.api.riotgames.com/riot/account/v1/accounts/by-riot-id/TestPlayer/NA1",
+        status_code=429,
+        headers={"Retry-After": "5", "X-Rate-Limit-Type": "method"},
+    )
+
+    with pytest.raises(RateLimitExceeded):
+        await riot_client._request(
+            "GET",
+            "https://americas.api.riotgames.com/riot/account/v1/accounts/by-riot-id/TestPlayer/NA1",
+            retries=0,
+            endpoint="account-v1.getByRiotId",
+        )
+
+    assert riot_client._method_limiters["account-v1.getByRiotId"].get_wait_time() > 4
+    assert riot_client._rate_limiter.get_wait_time() == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_coalesced(httpx_mock, riot_client, mock_match_data):
+    """Test that concurrent callers for the same resource share one request."""
+    httpx_mock.add_response(
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/NA1_1234567890",
+        json=mock_match_data,
+    )
+
+    results = await asyncio.gather(*[riot_client.get_match("NA1_1234567890") for _ in range(5)])
+
+    assert len(httpx_mock.get_requests()) == 1
+    assert all(r.info.game_id == 1234567890 for r in results)
+    assert riot_client._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_coalesced_request_error_sent_to_all(httpx_mock, riot_client):
+    """Test that every waiter on a shared request receives its error."""
+    httpx_mock.add_response(
+        url="https://na1.api.riotgames.com/lol/spectator/v5/active-games/by-summoner/test-puuid-1",
+        status_code=404,
+    )
+
+    results = await asyncio.gather(
+        riot_client.get_live_game("test-puuid-1"),
+        riot_client.get_live_game("test-puuid-1"),
+        return_exceptions=True,
+    )
+
+    assert len(httpx_mock.get_requests()) == 1
+    assert all(isinstance(r, SummonerNotFound) for r in results)
+    assert riot_client._inflight == {}
+
+
+def slow_response(json: dict, delay: float):
+    """Build an httpx_mock callback that answers after `delay` seconds."""
+
+    async def respond(request):
+        await asyncio.sleep(delay)
+        return Response(200, json=json)
+
+    return respond
+
+
+@pytest.mark.asyncio
+async def test_request_after_deadline_not_sent(httpx_mock, riot_client):
+    """Test that nothing is requested once the deadline has passed."""
+    with request_context(deadline=time.monotonic() - 1), pytest.raises(DeadlineExceeded) as exc_info:
+        await riot_client.get_match_ids("test-puuid")
+
+    assert exc_info.value.status_code == 504
+    assert httpx_mock.get_requests() == []
+
+
+@pytest.mark.asyncio
+async def test_request_not_queued_past_deadline(httpx_mock):
+    """Test that a request fails fast when no token frees up before the deadline."""
+    limiter = RateLimiter([(1, 10.0)])
+    await limiter.acquire()
+    riot_client = RiotAPIClient(limiter, ResponseCache(max_entries=100))
+
+    start = time.monotonic()
+    with request_context(deadline=time.monotonic() + 1), pytest.raises(DeadlineExceeded):
+        await riot_client.get_match_ids("test-puuid")
+
+    assert time.monotonic() - start < 0.5
+    assert httpx_mock.get_requests() == []
+
+
+@pytest.mark.asyncio
+async def test_request_cancelled_when_sole_caller_times_out(httpx_mock, riot_client, mock_match_ids):
+    """Test that a request nobody waits for any more is cancelled."""
+    httpx_mock.add_callback(
+        slow_response(mock_match_ids, 1.0),
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/test-puuid/ids?start=0&count=20",
+    )
+
+    start = time.monotonic()
+    with request_context(deadline=time.monotonic() + 0.1), pytest.raises(DeadlineExceeded):
+        await riot_client.get_match_ids("test-puuid")
+
+    assert time.monotonic() - start < 0.5
+    assert riot_client._inflight == {}
+    assert riot_client._waiters == {}
+
+
+@pytest.mark.asyncio
+async def test_shared_request_outlives_caller_deadline(httpx_mock, riot_client, mock_match_ids):
+    """Test that one caller timing out doesn't cancel a request others still await."""
+    httpx_mock.add_callback(
+        slow_response(mock_match_ids, 0.2),
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/test-puuid/ids?start=0&count=20",
+    )
+
+    async def impatient():
+        with request_context(deadline=time.monotonic() + 0.05):
+            return await riot_client.get_match_ids("test-puuid")
+
+    timed_out, result = await asyncio.gather(
+        impatient(), riot_client.get_match_ids("test-puuid"), return_exceptions=True
+    )
+
+    assert isinstance(timed_out, DeadlineExceeded)
+    assert result == mock_match_ids
+    assert len(httpx_mock.get_requests()) == 1
+    assert riot_client._waiters == {}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_queued_request_counts_saved_call(httpx_mock):
+    """Test that cancelling a request queued for a token saves the call."""
+    limiter = RateLimiter([(1, 10.0)])
+    await limiter.acquire()
+    riot_client = RiotAPIClient(limiter, ResponseCache(max_entries=100))
+
+    caller = asyncio.create_task(riot_client.get_match_ids("test-puuid"))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+    await asyncio.sleep(0.01)
+
+    stats = riot_client.stats()
+    assert stats["calls_saved"] == 1
+    assert stats["calls_abandoned"] == 0
+    assert stats["queued"]["interactive"] == 0
+    assert httpx_mock.get_requests() == []
+
+
+@pytest.mark.asyncio
+async def test_request_budget_caps_requests(httpx_mock, riot_client):
+    """Test requests in a budgeted context wait for a budget token, refunded if cancelled."""
+    budget = RateLimiter([(1, 10.0)])
+    await budget.acquire()
+
+    with request_context(budget=budget):
+        caller = asyncio.create_task(riot_client.get_match_ids("test-puuid"))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+
+    assert riot_client.stats()["calls_saved"] == 1
+    assert httpx_mock.get_requests() == []
+    # The app limiter's token wasn't taken
+    assert riot_client._rate_limiter.get_wait_time() == 0
+
+
+@pytest.mark.asyncio
+async def test_different_params_not_coalesced(httpx_mock, riot_client, mock_match_ids):
+    """Test that requests differing only in params are sent separately."""
+    httpx_mock.add_response(
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/test-puuid-1/ids?start=0&count=20",
+        json=mock_match_ids,
+    )
+    httpx_mock.add_response(
+        url="https://americas.api.riotgames.com/lol/match/v5/matches/by-puuid/test-puuid-1/ids?start=0&count=20&queue=420",
+        json=mock_match_ids,
+    )
+
+    await asyncio.gather(
+        riot_client.get_match_ids("test-puuid-1"),
+        riot_client.get_match_ids("test-puuid-1", queue=420),
+    )
+
+    assert len(httpx_mock.get_requests()) == 2
+
+
+@pytest.mark.asyncio
+async def test_responses_served_from_cache(httpx_mock, riot_client, mock_summoner_data):
+    """Test that a fresh cached response skips the Riot request."""
+    httpx_mock.add_response(
+        url="https://na1.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/test-puuid-12345",
+        json=mock_summoner_data,
+    )
+
+    first = await riot_client.get_summoner_by_puuid("test-puuid-12345")
+    second = await riot_client.get_summoner_by_puuid("test-puuid-12345")
+
+    assert len(httpx_mock.get_requests()) == 1
+    assert first == second
+    assert riot_client._cache.stats()["endpoints"]["summoner-v4.getByPUUID"] == {"hits": 1, "misses": 1}
+
+
 @pytest.mark.asyncio
 async def test_api_error(httpx_mock, riot_client):
     """Test handling of generic API error."""
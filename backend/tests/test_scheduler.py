@@ -0,0 +1,125 @@
+"""Unit tests for the priority-aware request scheduler."""
+
+import asyncio
+import time
+
+import pytest
+from app.core.rate_limiter import RateLimiter
+from app.core.scheduler import RequestPriority, RequestScheduler, request_context
+
+
+async def exhaust(limiter: RateLimiter) -> None:
+    """Use up the limiter's current window."""
+    while limiter.get_wait_time() <= 0:
+        await limiter.acquire()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_fast_path_when_tokens_free():
+    """Test that requests go straight through when nothing is queued."""
+    scheduler = RequestScheduler(RateLimiter([(10, 1.0)]))
+
+    wait_times = await asyncio.gather(*[scheduler.acquire() for _ in range(5)])
+
+    assert wait_times == [0] * 5
+    assert scheduler.queued() == {"interactive": 0, "prefetch": 0, "background": 0}
+
+
+@pytest.mark.asyncio
+async def test_scheduler_serves_higher_priority_first():
+    """Test that interactive requests jump ahead of queued background work."""
+    limiter = RateLimiter([(1, 0.05)])
+    scheduler = RequestScheduler(limiter)
+    await exhaust(limiter)
+    order = []
+
+    async def request(name: str, priority: RequestPriority):
+        await scheduler.acquire(priority=priority, origin=name)
+        order.append(name)
+
+    background = [asyncio.create_task(request(f"bg{i}", RequestPriority.BACKGROUND)) for i in range(3)]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(request("user", RequestPriority.INTERACTIVE))
+
+    await asyncio.gather(*background, interactive)
+
+    assert order[0] == "user"
+
+
+@pytest.mark.asyncio
+async def test_scheduler_fair_share_within_class():
+    """Test that each origin gets a turn instead of first-come first-served."""
+    limiter = RateLimiter([(1, 0.03)])
+    scheduler = RequestScheduler(limiter)
+    await exhaust(limiter)
+    order = []
+
+    async def request(origin: str):
+        with request_context(priority=RequestPriority.INTERACTIVE, origin=origin):
+            await scheduler.acquire()
+        order.append(origin)
+
+    lobby = [asyncio.create_task(request("lobby")) for _ in range(4)]
+    await asyncio.sleep(0)
+    single = asyncio.create_task(request("single"))
+
+    await asyncio.gather(*lobby, single)
+
+    assert order.index("single") <= 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_skips_cancelled_waiters():
+    """Test that a cancelled waiter doesn't consume a token."""
+    limiter = RateLimiter([(1, 0.05)])
+    scheduler = RequestScheduler(limiter)
+    await exhaust(limiter)
+
+    cancelled = asyncio.create_task(scheduler.acquire(origin="gone"))
+    await asyncio.sleep(0)
+    kept = asyncio.create_task(scheduler.acquire(origin="kept"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    wait_time = await kept
+
+    # Served in the first window that frees up, not the second
+    assert wait_time < 0.09
+
+
+@pytest.mark.asyncio
+async def test_scheduler_refunds_token_of_cancelled_waiter():
+    """Test that a token acquired for a waiter that gave up goes back to the limiter."""
+    limiter = RateLimiter([(1, 0.05)])
+    scheduler = RequestScheduler(limiter)
+    await exhaust(limiter)
+
+    cancelled = asyncio.create_task(scheduler.acquire(origin="gone"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.sleep(0.08)
+
+    # The dispatcher's token for the next window was refunded
+    assert limiter.get_wait_time() == 0
+
+
+def test_request_context_restores_previous_values():
+    """Test that request_context only applies inside the block."""
+    from app.core.scheduler import request_origin, request_priority
+
+    with request_context(priority=RequestPriority.BACKGROUND, origin="crawl"):
+        assert request_priority.get() == RequestPriority.BACKGROUND
+        assert request_origin.get() == "crawl"
+
+    assert request_priority.get() == RequestPriority.INTERACTIVE
+    assert request_origin.get() == ""
+
+
+def test_request_context_sets_deadline():
+    """Test that time_remaining counts down to the context's deadline."""
+    from app.core.scheduler import time_remaining
+
+    assert time_remaining() is None
+    with request_context(deadline=time.monotonic() + 10):
+        assert 9 < time_remaining() <= 10
+    assert time_remaining() is None
@@ -1,11 +1,17 @@
 """Unit tests for smurf detection algorithm."""
 
+import random
+
+import numpy as np
 import pytest
 
 from app.algorithms.smurf_detector import (
     SmurfClassification,
     SmurfDetector,
+    encode_tiers,
 )
+from app.algorithms.thresholds import EXPECTED_LEVEL_FOR_TIER, TIER_BENCHMARKS
+from app.services.stats_block import StatsBlock
 
 
 @pytest.fixture
@@ -291,3 +297,102 @@ class TestIndividualScorers:
         assert detector._score_game_frequency(5) == 40
         assert detector._score_game_frequency(3.5) == 20
         assert detector._score_game_frequency(2) == 0
+
+
+    def test_step_boundaries(self, detector):
+        """Test values exactly on a threshold score the step above it."""
+        assert detector._score_winrate(75) == 100
+        assert detector._score_winrate(55) == 30
+        # Level ratio exactly 0.5 in Diamond (expected 350) is no longer below 0.5
+        assert detector._score_account_age(175, "DIAMOND") == 60
+        assert detector._score_game_frequency(10) == 100
+        assert detector._score_game_frequency(3) == 20
+        assert detector._score_champion_pool(4, 5) == 0
+        assert detector._score_champion_pool(1, 5) == 100
+
+def random_player(rng: random.Random) -> tuple[dict, int, str | None]:
+    """Random aggregate stats, level and tier, biased towards step boundaries."""
+    tier = rng.choice([*TIER_BENCHMARKS, None, "UNRANKED"])
+    benchmark = TIER_BENCHMARKS.get(tier or "SILVER", TIER_BENCHMARKS["SILVER"])
+    games = rng.choice([0, 3, 4, 5, 6, 9, 10, 19, 20, 50])
+
+    def near(base: float, steps: list[float], digits: int) -> float:
+        if rng.random() < 0.5:
+            return round(base + rng.choice(steps), digits)
+        return round(base + rng.uniform(-1, steps[-1] + 1), digits)
+
+    stats = {
+        "games_analyzed": games,
+        "winrate": near(0, [50, 55, 60, 65, 70, 75], 1),
+        "unique_champions": rng.randint(0, 6),
+        "avg_cs_per_min": near(benchmark["cs"], [0, 0.5, 1.0, 1.5, 2.0, 2.5], 2),
+        "avg_kda": near(benchmark["kda"], [0, 0.25, 0.5, 1.0, 1.5, 2.0], 2),
+        "games_per_day": near(0, [2, 3, 4, 6, 8, 10], 2),
+    }
+    expected = EXPECTED_LEVEL_FOR_TIER.get(tier, 100)
+    if rng.random() < 0.5:
+        level = round(expected * rng.choice([0.3, 0.5, 0.7, 0.9, 1.1]))
+    else:
+        level = rng.randint(1, 1000)
+    return stats, level, tier
+
+
+class TestAnalyzeBatch:
+    """Tests for vectorized batch scoring."""
+
+    def test_batch_matches_analyze(self, detector):
+        """Property test: batch results equal per-player analyze results."""
+        rng = random.Random(1234)
+        players = [random_player(rng) for _ in range(5000)]
+        aggregates = {
+            name: np.array([stats[name] for stats, _, _ in players])
+            for name in players[0][0]
+        }
+
+        batch = detector.analyze_batch(
+            aggregates,
+            [level for _, level, _ in players],
+            [tier for _, _, tier in players],
+        )
+
+        assert len(batch) == len(players)
+        for i, (stats, level, tier) in enumerate(players):
+            assert batch[i] == detector.analyze(stats, level, tier, None, None, None), i
+
+        # Pre-encoded tiers give the same results
+        encoded = detector.analyze_batch(
+            aggregates,
+            np.array([level for _, level, _ in players]),
+            encode_tiers([tier for _, _, tier in players]),
+        )
+        assert np.array_equal(encoded.total_score, batch.total_score)
+        assert list(encoded.classification) == list(batch.classification)
+
+    def test_batch_from_stats_block(self, detector):
+        """Test batch scoring straight from a StatsBlock of match histories."""
+        rng = random.Random(99)
+        histories = [
+            [
+                {
+                    "champion_id": rng.randint(1, 4),
+                    "kills": rng.randint(0, 15),
+                    "deaths": rng.randint(0, 10),
+                    "assists": rng.randint(0, 20),
+                    "win": rng.randint(0, 1),
+                    "kda": round(rng.uniform(0, 10), 2),
+                    "cs_per_min": round(rng.uniform(3, 11), 2),
+                    "gold_per_min": round(rng.uniform(250, 600), 2),
+                    "game_creation": rng.randint(1_700_000_000_000, 1_700_500_000_000),
+                }
+                for _ in range(rng.choice([0, 2, 5, 12, 25]))
+            ]
+            for _ in range(300)
+        ]
+        levels = [rng.randint(30, 600) for _ in histories]
+        tiers = [rng.choice([*TIER_BENCHMARKS, None]) for _ in histories]
+        block = StatsBlock.from_player_stats(histories)
+
+        batch = detector.analyze_batch(block.aggregate_columns(rounded=True), levels, tiers)
+
+        for i, aggregate in enumerate(block.aggregate()):
+            assert batch[i] == detector.analyze(aggregate, levels[i], tiers[i], None, None, None)
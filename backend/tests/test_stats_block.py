@@ -0,0 +1,87 @@
+"""Unit tests for the columnar stats block."""
+
+import random
+
+import numpy as np
+import pytest
+from app.services.match_service import MatchService
+from app.services.stats_block import EMPTY_AGGREGATE, FIELDS, StatsBlock
+
+
+def reference_aggregate(player_stats: list[dict]) -> dict:
+    """Per-dict aggregation the vectorized version must reproduce."""
+    if not player_stats:
+        return dict(EMPTY_AGGREGATE)
+
+    games = len(player_stats)
+    timestamps = [s["game_creation"] for s in player_stats]
+    if games >= 2:
+        games_per_day = games / max((max(timestamps) - min(timestamps)) / (1000 * 60 * 60 * 24), 1)
+    else:
+        games_per_day = 0
+
+    return {
+        "games_analyzed": games,
+        "winrate": round(sum(s["win"] for s in player_stats) / games * 100, 1),
+        "avg_kda": round(sum(s["kda"] for s in player_stats) / games, 2),
+        "avg_cs_per_min": round(sum(s["cs_per_min"] for s in player_stats) / games, 2),
+        "avg_gold_per_min": round(sum(s["gold_per_min"] for s in player_stats) / games, 2),
+        "unique_champions": len({s["champion_id"] for s in player_stats}),
+        "total_kills": sum(s["kills"] for s in player_stats),
+        "total_deaths": sum(s["deaths"] for s in player_stats),
+        "total_assists": sum(s["assists"] for s in player_stats),
+        "games_per_day": round(games_per_day, 2),
+    }
+
+
+def random_stats(rng: random.Random, games: int) -> list[dict]:
+    """Random per-match stats in the extract_player_stats format."""
+    return [
+        {
+            "champion_id": rng.randint(1, 30),
+            "kills": rng.randint(0, 20),
+            "deaths": rng.randint(0, 15),
+            "assists": rng.randint(0, 25),
+            "win": rng.randint(0, 1),
+            "kda": round(rng.uniform(0, 15), 2),
+            "cs_per_min": round(rng.uniform(0, 12), 2),
+            "gold_per_min": round(rng.uniform(200, 700), 2),
+            "game_creation": rng.randint(1_700_000_000_000, 1_710_000_000_000),
+        }
+        for _ in range(games)
+    ]
+
+
+def test_aggregate_matches_reference_across_players():
+    """Test that vectorized aggregates equal the per-dict ones for every player."""
+    rng = random.Random(42)
+    # Include empty players at the start, middle and end
+    players = [random_stats(rng, rng.choice([0, 1, 2, 5, 20, 100])) for _ in range(200)]
+    players = [[], *players, [], []]
+
+    results = StatsBlock.from_player_stats(players).aggregate()
+
+    assert results == [reference_aggregate(stats) for stats in players]
+
+
+def test_aggregate_all_empty():
+    """Test a block with no matches at all."""
+    assert StatsBlock.from_player_stats([[], []]).aggregate() == [EMPTY_AGGREGATE] * 2
+    assert StatsBlock.from_player_stats([]).aggregate() == []
+
+
+def test_calculate_aggregate_stats_uses_block():
+    """Test the single-player entry point on a known history."""
+    stats = random_stats(random.Random(7), 10)
+
+    assert MatchService().calculate_aggregate_stats(stats) == reference_aggregate(stats)
+
+
+def test_block_rejects_mismatched_columns():
+    """Test that columns must cover every field with one row per match."""
+    columns = {name: np.zeros(3, dtype=dtype) for name, dtype in FIELDS.items()}
+
+    with pytest.raises(ValueError):
+        StatsBlock(columns, np.array([0, 2]))
+    with pytest.raises(ValueError):
+        StatsBlock({"kills": columns["kills"]}, np.array([0, 3]))